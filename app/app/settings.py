@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,13 +51,18 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ServerTimingMiddleware',
+    'core.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.nplusone.NPlusOneMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -83,16 +89,74 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
+# Connections persist for DB_CONN_MAX_AGE seconds and are pinged before
+# reuse. Setting DB_POOL_SIZE instead shares a bounded pool of connections
+# between the threads of each worker; requests queue for up to
+# DB_POOL_TIMEOUT seconds when it is exhausted.
+
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 0))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.backends.postgresql',
         'HOST': os.environ.get('DB_HOST'),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'CONN_MAX_AGE': 0 if DB_POOL_SIZE else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MAX_SIZE': DB_POOL_SIZE,
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        } if DB_POOL_SIZE else None,
     }
 }
 
+# Read replicas, e.g. DB_REPLICA_HOSTS=replica1,replica2. Safe-method requests
+# read from a healthy replica; clients that just wrote are pinned to the
+# primary for DB_REPLICA_PIN_SECONDS, and replicas that are unreachable or
+# lag more than DB_REPLICA_MAX_LAG seconds are skipped. Each request reads
+# from one replica; lag is probed every DB_REPLICA_CHECK_INTERVAL seconds
+# with a DB_REPLICA_PROBE_TIMEOUT second connect timeout.
+
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DB_REPLICA_STRATEGY = os.environ.get('DB_REPLICA_STRATEGY', 'round_robin')
+DB_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 5))
+DB_REPLICA_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 5))
+DB_REPLICA_PROBE_TIMEOUT = int(os.environ.get('DB_REPLICA_PROBE_TIMEOUT', 2))
+DB_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 10))
+
+
+# Cache
+# Throttle buckets and replica pins must be shared by every worker, so set
+# REDIS_URL in production; the local-memory fallback is per process.
+
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+THROTTLE_CACHE_ALIAS = 'default'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
@@ -143,8 +207,128 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # JSON goes through orjson when installed; MessagePack is offered when
+    # msgpack is.
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.JSONRenderer',
+        *(['core.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+        'core.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_THROTTLE_CLASSES': [
+        'core.throttling.TokenBucketThrottle',
+    ],
+    # Anonymous clients are throttled per IP. X-Forwarded-For is only
+    # trusted for the NUM_PROXIES proxies in front of the app; with none,
+    # the client can't pick its own IP.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    'DEFAULT_THROTTLE_RATES': {
+        'read': os.environ.get('THROTTLE_RATE_READ', '600/min'),
+        'write': os.environ.get('THROTTLE_RATE_WRITE', '120/min'),
+        'upload': os.environ.get('THROTTLE_RATE_UPLOAD', '20/min'),
+        'token': os.environ.get('THROTTLE_RATE_TOKEN', '10/min'),
+        'export': os.environ.get('THROTTLE_RATE_EXPORT', '5/hour'),
+    },
 }
 
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
+
+# Rendered schemas are cached in memory and in SCHEMA_CACHE_DIR, keyed by
+# APP_VERSION (or a fingerprint of the sources when unset). Pre-generate them
+# at build time with `python manage.py generate_schema`.
+
+APP_VERSION = os.environ.get('APP_VERSION')
+SCHEMA_CACHE_DIR = os.environ.get('SCHEMA_CACHE_DIR', '/vol/web/schema')
+
+# Request instrumentation
+# Fraction of requests that get a Server-Timing header and timing log line;
+# requests carrying SERVER_TIMING_FORCE_HEADER are always sampled.
+
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get('SERVER_TIMING_SAMPLE_RATE', 1.0 if DEBUG else 0.01))
+SERVER_TIMING_FORCE_HEADER = os.environ.get('SERVER_TIMING_FORCE_HEADER', 'X-Server-Timing')
+
+
+# Metrics
+# Workers snapshot their samples into METRICS_DIR (shared by all gunicorn
+# workers on a host) at most every METRICS_FLUSH_INTERVAL seconds; /metrics
+# merges the snapshots. Leave METRICS_DIR unset for single-process servers.
+
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+
+# N+1 query detection
+# Requests repeating one query shape more than NPLUSONE_THRESHOLD times are
+# reported; NPLUSONE_MODE is 'raise' (tests), 'log' (dev/staging) or 'off'.
+
+NPLUSONE_MODE = os.environ.get('NPLUSONE_MODE', 'log' if DEBUG else 'off')
+NPLUSONE_THRESHOLD = int(os.environ.get('NPLUSONE_THRESHOLD', 5))
+
+
+# Health checks
+# /health/ready/ reuses its database probe result for this many seconds.
+
+HEALTH_CHECK_CACHE_SECONDS = float(os.environ.get('HEALTH_CHECK_CACHE_SECONDS', 5))
+
+
+# Similar recipes
+# Number of per-user similarity indexes each worker keeps in memory.
+
+SIMILARITY_INDEX_CACHE_SIZE = int(os.environ.get('SIMILARITY_INDEX_CACHE_SIZE', 64))
+
+
+# Row counts
+# Admin changelists (and other counts exposed by the API) use planner
+# estimates or stop counting once a result set reaches this many rows.
+
+COUNT_ESTIMATE_THRESHOLD = int(os.environ.get('COUNT_ESTIMATE_THRESHOLD', 10000))
+
+
+# Delta sync
+# Tombstones of deleted recipes, tags and ingredients are purged after this
+# many days (manage.py purge_tombstones); older sync tokens get a full sync.
+
+SYNC_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('SYNC_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+# User deletion
+# Deleting an account deactivates it at once; a background job (or `manage.py
+# process_user_deletions`) removes its data this many rows per transaction.
+
+USER_DELETION_BATCH_SIZE = int(os.environ.get('USER_DELETION_BATCH_SIZE', 1000))
+
+
+# Background jobs
+# `manage.py run_worker` runs JOB_CONCURRENCY jobs at a time. A running job
+# is requeued if its worker stops renewing the lease for JOB_LEASE_SECONDS;
+# failures retry after a jittered backoff from JOB_RETRY_DELAY doubling up
+# to JOB_RETRY_MAX_DELAY, at most JOB_MAX_ATTEMPTS times.
+
+JOB_CONCURRENCY = int(os.environ.get('JOB_CONCURRENCY', 4))
+JOB_LEASE_SECONDS = float(os.environ.get('JOB_LEASE_SECONDS', 300))
+JOB_RETRY_DELAY = float(os.environ.get('JOB_RETRY_DELAY', 5))
+JOB_RETRY_MAX_DELAY = float(os.environ.get('JOB_RETRY_MAX_DELAY', 3600))
+JOB_MAX_ATTEMPTS = int(os.environ.get('JOB_MAX_ATTEMPTS', 5))
+
+
+# Response compression
+# Compressible responses of at least COMPRESSION_MIN_SIZE bytes are sent
+# with gzip, or Brotli/Zstandard when installed and accepted by the client.
+
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+
+
+# Recipe popularity
+# Recipe views are counted per process and written every
+# POPULARITY_FLUSH_INTERVAL seconds (0: only when POPULARITY_FLUSH_SIZE
+# recipes are pending), decaying with a POPULARITY_HALF_LIFE_DAYS half-life.
+
+POPULARITY_FLUSH_INTERVAL = float(os.environ.get('POPULARITY_FLUSH_INTERVAL', 10))
+POPULARITY_FLUSH_SIZE = int(os.environ.get('POPULARITY_FLUSH_SIZE', 1000))
+POPULARITY_HALF_LIFE_DAYS = float(os.environ.get('POPULARITY_HALF_LIFE_DAYS', 7))
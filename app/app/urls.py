@@ -14,19 +14,21 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-)
 from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from django.conf import settings
 
+from core.lazy import lazy_view
+from core.views import liveness_view, metrics_view, readiness_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema/', SpectacularAPIView.as_view(), name='api-schema'),
-    path('api/docs/', SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'),
+    path('metrics', metrics_view, name='metrics'),
+    path('health/live/', liveness_view, name='health-live'),
+    path('health/ready/', readiness_view, name='health-ready'),
+    path('api/schema/', lazy_view('core.schema.CachedSpectacularAPIView'), name='api-schema'),
+    path('api/docs/', lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='api-schema'), name='api-docs'),
     path('api/user/', include('user.urls')),
     path('api/recipe/', include('recipe.urls')),
 ]
@@ -0,0 +1,67 @@
+"""
+Benchmark admin changelists, searches and the recipe change form on a large dataset.
+
+Run from the app directory with the usual DB_* environment (seeds a
+benchmark user on first run):
+
+    python -m benchmarks.admin [--recipes 100000] [--runs 5]
+"""
+import argparse
+import os
+import statistics
+import time
+
+import django
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=100_000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    django.setup()
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import CaptureQueriesContext
+    from django.urls import reverse
+
+    from core.models import Recipe
+    from benchmarks.seed import seed_user
+
+    user = seed_user('bench-recipes@example.com', recipes=args.recipes)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE core_recipe, core_tag, core_ingredient')
+    admin_user, _ = get_user_model().objects.get_or_create(
+        email='bench-admin@example.com', defaults={'is_staff': True, 'is_superuser': True},
+    )
+    client = Client(SERVER_NAME='localhost')
+    client.force_login(admin_user)
+    recipe = Recipe.objects.filter(user=user).order_by('-id').first()
+
+    pages = {
+        'recipe changelist': (reverse('admin:core_recipe_changelist'), {}),
+        'recipe changelist, last page': (reverse('admin:core_recipe_changelist'), {'p': 150}),
+        'recipe search': (reverse('admin:core_recipe_changelist'), {'q': 'Recipe 9999'}),
+        'recipe change form': (reverse('admin:core_recipe_change', args=[recipe.id]), {}),
+        'tag changelist': (reverse('admin:core_tag_changelist'), {}),
+        'tag autocomplete': (reverse('admin:autocomplete'), {
+            'app_label': 'core', 'model_name': 'recipe', 'field_name': 'tags', 'term': 'Tag 1',
+        }),
+    }
+    for label, (url, params) in pages.items():
+        timings = []
+        for _ in range(args.runs):
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                res = client.get(url, params)
+                timings.append((time.perf_counter() - started) * 1000)
+        print(f'{label:30} {res.status_code} {statistics.median(timings):8.1f} ms median, '
+              f'{len(queries)} queries, {len(res.content) // 1024} KiB')
+
+
+if __name__ == '__main__':
+    main()
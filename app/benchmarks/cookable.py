@@ -0,0 +1,64 @@
+"""
+Benchmark the cookable_with recipe filter against any-match plus client-side filtering.
+
+Run from the app directory with the usual DB_* environment (seeds a
+benchmark user on first run):
+
+    python -m benchmarks.cookable [--recipes 100000] [--pantry 40] [--max-missing 0]
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+import django
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=100_000)
+    parser.add_argument('--pantry', type=int, default=40, help='Ingredients at hand')
+    parser.add_argument('--max-missing', type=int, default=0)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    django.setup()
+
+    from core.models import Ingredient, Recipe
+    from recipe.filters import cookable_with
+    from benchmarks.seed import seed_user
+
+    user = seed_user('bench-recipes@example.com', recipes=args.recipes)
+    ingredient_ids = list(Ingredient.objects.filter(user=user).values_list('id', flat=True))
+    pantry = random.Random(1).sample(ingredient_ids, args.pantry)
+    recipes = Recipe.objects.filter(user=user)
+
+    def sql_filter():
+        return set(cookable_with(recipes, pantry, args.max_missing).values_list('id', flat=True))
+
+    def any_match_then_filter():
+        have = set(pantry)
+        links = Recipe.ingredients.through.objects.filter(
+            recipe__in=recipes.filter(ingredients__id__in=pantry).distinct(),
+        ).values_list('recipe_id', 'ingredient_id')
+        by_recipe = {}
+        for recipe_id, ingredient_id in links.iterator():
+            by_recipe.setdefault(recipe_id, set()).add(ingredient_id)
+        return {rid for rid, needed in by_recipe.items() if len(needed - have) <= args.max_missing}
+
+    print(f'{recipes.count()} recipes, pantry of {args.pantry} ingredients, max_missing={args.max_missing}')
+    results = {}
+    for label, func in (('cookable_with (SQL)', sql_filter), ('any-match + Python', any_match_then_filter)):
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            results[label] = func()
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f'{label:22} {statistics.median(timings):9.1f} ms median, {len(results[label])} recipes')
+    assert len(set(map(frozenset, results.values()))) == 1, 'implementations disagree'
+
+
+if __name__ == '__main__':
+    main()
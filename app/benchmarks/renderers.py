@@ -0,0 +1,73 @@
+"""
+Benchmark response encoding of serialized recipes: DRF's JSON, orjson and MessagePack.
+
+Run from the app directory with the usual DB_* environment (seeds a
+benchmark user on first run):
+
+    python -m benchmarks.renderers [--recipes 1000] [--runs 20]
+"""
+import argparse
+import io
+import os
+import statistics
+import time
+from unittest.mock import patch
+
+import django
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--recipes', type=int, default=1000, help='Recipes per response')
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+    django.setup()
+
+    from rest_framework import parsers, renderers
+
+    from core import renderers as fast_renderers
+    from core.models import Recipe
+    from core.parsers import JSONParser
+    from recipe.serializers import RecipeDetailSerializer
+    from benchmarks.seed import seed_user
+
+    user = seed_user('bench-recipes@example.com')
+    recipes = Recipe.objects.filter(user=user).order_by('-id').prefetch_related('tags', 'ingredients')
+    data = RecipeDetailSerializer(recipes[:args.recipes], many=True).data
+
+    def measure(func):
+        timings = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        return result, statistics.median(timings) * 1e6 / args.recipes
+
+    def stdlib_json():
+        with patch.object(fast_renderers, 'orjson', None):
+            return fast_renderers.JSONRenderer().render(data)
+
+    encoders = [
+        ('DRF JSONRenderer', lambda: renderers.JSONRenderer().render(data)),
+        ('JSONRenderer (stdlib)', stdlib_json),
+    ]
+    if fast_renderers.orjson is not None:
+        encoders.append(('JSONRenderer (orjson)', lambda: fast_renderers.JSONRenderer().render(data)))
+    if fast_renderers.msgpack is not None:
+        encoders.append(('MessagePackRenderer', lambda: fast_renderers.MessagePackRenderer().render(data)))
+
+    print(f'{args.recipes} recipes per response, median of {args.runs} runs')
+    for label, func in encoders:
+        body, per_recipe = measure(func)
+        print(f'render {label:24} {per_recipe:7.2f} µs/recipe {len(body) / args.recipes:8.1f} bytes/recipe')
+
+    body = renderers.JSONRenderer().render(data)
+    for label, json_parser in (('DRF JSONParser', parsers.JSONParser()), ('JSONParser (orjson)', JSONParser())):
+        _, per_recipe = measure(lambda: json_parser.parse(io.BytesIO(body), 'application/json', {}))
+        print(f'parse  {label:24} {per_recipe:7.2f} µs/recipe')
+
+
+if __name__ == '__main__':
+    main()
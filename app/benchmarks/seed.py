@@ -0,0 +1,57 @@
+"""
+Seed a benchmark user with a large synthetic recipe collection.
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from core.models import Ingredient, Recipe, Tag
+
+
+BATCH_SIZE = 5000
+
+
+def seed_user(email, recipes=100_000, tags=200, ingredients=500, per_recipe=(3, 10), seed=0):
+    """Create (or reuse) `email` with `recipes` recipes linked to random tags and ingredients."""
+    rng = random.Random(seed)
+    user, _ = get_user_model().objects.get_or_create(email=email)
+    existing = Recipe.objects.filter(user=user).count()
+    if existing >= recipes:
+        return user
+
+    with transaction.atomic():
+        tag_ids = _ensure(Tag, user, 'Tag', tags)
+        ingredient_ids = _ensure(Ingredient, user, 'Ingredient', ingredients)
+        for start in range(existing, recipes, BATCH_SIZE):
+            batch = Recipe.objects.bulk_create([
+                Recipe(
+                    user=user,
+                    title=f'Recipe {i}',
+                    time_minutes=rng.randint(5, 240),
+                    price=Decimal(rng.randint(100, 9999)) / 100,
+                )
+                for i in range(start, min(start + BATCH_SIZE, recipes))
+            ])
+            Recipe.tags.through.objects.bulk_create([
+                Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+                for recipe in batch
+                for tag_id in rng.sample(tag_ids, rng.randint(1, 3))
+            ])
+            Recipe.ingredients.through.objects.bulk_create([
+                Recipe.ingredients.through(recipe_id=recipe.id, ingredient_id=ingredient_id)
+                for recipe in batch
+                for ingredient_id in rng.sample(ingredient_ids, rng.randint(*per_recipe))
+            ])
+    return user
+
+
+def _ensure(model, user, prefix, count):
+    ids = list(model.objects.filter(user=user).order_by('id').values_list('id', flat=True))
+    if len(ids) < count:
+        created = model.objects.bulk_create([
+            model(user=user, name=f'{prefix} {i}') for i in range(len(ids), count)
+        ])
+        ids += [obj.id for obj in created]
+    return ids[:count]
@@ -0,0 +1,24 @@
+import pytest
+
+from django.core.cache import cache
+
+from core import popularity
+from core.throttling import local_state
+
+
+@pytest.fixture(autouse=True)
+def raise_on_n_plus_one(settings):
+    settings.NPLUSONE_MODE = 'raise'
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    local_state.clear()
+
+
+@pytest.fixture(autouse=True)
+def flush_popularity_inline(settings):
+    # No background flush thread racing the test's transaction.
+    settings.POPULARITY_FLUSH_INTERVAL = 0
+    popularity.counter.take()
@@ -1,14 +1,38 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 
-from core import models
+from core import deletion, models, stats
+from core.pagination import EstimatedCountPaginator
 
 
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+    ordering = ['-id']
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
+
+    def get_search_results(self, request, queryset, search_term):
+        # search_fields are indexed prefix lookups, matched against the whole
+        # term rather than the default per-word search.
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        query = Q()
+        for field in self.search_fields:
+            query |= Q(**{field: search_term})
+        return queryset.filter(query), False
+
 
 class UserAdmin(BaseUserAdmin):
     ordering = ['id']
     list_display = ['email', 'name']
+    search_fields = ['email__startswith']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     fieldsets = (
         (_("Primary Information"), {'fields': ('email', 'password', 'name',)}),
         (_('Permissions'), {'fields': ('is_active', 'is_staff', 'is_superuser',)}),
@@ -19,9 +43,83 @@ class UserAdmin(BaseUserAdmin):
         (_('Basic Information'), {'classes': ('wide',), 'fields': ('email', 'password1', 'password2', 'name', 'is_active', 'is_staff', 'is_superuser',)}),
     )
 
+    # Deleting a user schedules a background deletion (core.deletion)
+    # instead of collecting and cascading their whole recipe graph here.
+    def get_deleted_objects(self, objs, request):
+        return [str(obj) for obj in objs], {}, set(), []
+
+    def delete_model(self, request, obj):
+        deletion.schedule(obj)
+
+    def delete_queryset(self, request, queryset):
+        for user in queryset:
+            deletion.schedule(user)
+
+
+class RecipeAdmin(LargeTableAdmin):
+    list_display = ['title', 'user', 'time_minutes', 'price']
+    search_fields = ['title__startswith']
+    autocomplete_fields = ['user', 'tags', 'ingredients']
+
+    # Admin edits keep the stats summary (core.stats) current like API
+    # writes: the stored recipe leaves its owner's summary before the save
+    # and the saved one, with its tags and ingredients, joins after them.
+    def save_model(self, request, obj, form, change):
+        stored = models.Recipe.objects.get(pk=obj.pk) if change else None
+        owners = {obj.user_id} if stored is None else {obj.user_id, stored.user_id}
+        for user_id in sorted(owners):
+            with stats.tracking(user_id) as recipe_stats:
+                if stored is not None and stored.user_id == user_id:
+                    stats.apply(recipe_stats, stats.snapshot(stored), -1)
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipe = form.instance
+        with stats.tracking(recipe.user_id) as recipe_stats:
+            stats.apply(recipe_stats, stats.snapshot(recipe), 1)
+
+    def delete_model(self, request, obj):
+        with stats.tracking(obj.user_id) as recipe_stats:
+            stats.apply(recipe_stats, stats.snapshot(obj), -1)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for user_id in sorted(set(queryset.values_list('user_id', flat=True))):
+            with stats.tracking(user_id) as recipe_stats:
+                recipes = queryset.filter(user_id=user_id)
+                stats.apply_summary(recipe_stats, stats.summarize(recipes), -1)
+                recipes.delete()
+
+
+class RecipeAttrAdmin(LargeTableAdmin):
+    list_display = ['name', 'user']
+    search_fields = ['name__startswith']
+    stats_field = None
+
+    def delete_model(self, request, obj):
+        with stats.tracking(obj.user_id) as recipe_stats:
+            stats.forget(recipe_stats, self.stats_field, obj.id)
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for user_id in sorted(set(queryset.values_list('user_id', flat=True))):
+            with stats.tracking(user_id) as recipe_stats:
+                attrs = queryset.filter(user_id=user_id)
+                for pk in attrs.values_list('id', flat=True):
+                    stats.forget(recipe_stats, self.stats_field, pk)
+                attrs.delete()
+
+
+class TagAdmin(RecipeAttrAdmin):
+    stats_field = 'tag_counts'
+
+
+class IngredientAdmin(RecipeAttrAdmin):
+    stats_field = 'ingredient_counts'
 
 
 admin.site.register(models.User, UserAdmin)
-admin.site.register(models.Recipe)
-admin.site.register(models.Tag)
-admin.site.register(models.Ingredient)
+admin.site.register(models.Recipe, RecipeAdmin)
+admin.site.register(models.Tag, TagAdmin)
+admin.site.register(models.Ingredient, IngredientAdmin)
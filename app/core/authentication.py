@@ -0,0 +1,10 @@
+from rest_framework import authentication
+
+from core.timing import timer
+
+
+class TokenAuthentication(authentication.TokenAuthentication):
+
+    def authenticate(self, request):
+        with timer('auth'):
+            return super().authenticate(request)
@@ -0,0 +1,199 @@
+"""
+PostgreSQL backend adding connection health checks and an optional
+per-process connection pool.
+
+Extra DATABASES keys:
+    CONN_HEALTH_CHECKS  ping a reused connection before its first query in a request
+    POOL                {'MAX_SIZE': int, 'TIMEOUT': seconds} to share a bounded pool
+                        between the threads of a worker; use with CONN_MAX_AGE = 0
+"""
+import threading
+import time
+from collections import deque
+
+import psycopg2
+import psycopg2.extras
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+from django.db.backends.postgresql import base
+from django.db.utils import OperationalError
+
+from core import metrics
+
+
+POOL_WAIT = metrics.registry.histogram(
+    'db_pool_wait_seconds', 'Time spent waiting for a pooled database connection.', ['alias'],
+)
+POOL_CONNECTIONS = metrics.registry.gauge(
+    'db_pool_connections', 'Pooled database connections by state.', ['alias', 'state'],
+)
+
+
+class ConnectionPool:
+
+    def __init__(self, alias, connect, max_size, timeout=30, health_checks=True):
+        self.alias = alias
+        self.connect = connect
+        self.max_size = max_size
+        self.timeout = timeout
+        self.health_checks = health_checks
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.lock = threading.Lock()
+        self.idle = deque()
+        self.in_use = 0
+
+    def acquire(self):
+        started = time.perf_counter()
+        if not self.slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                f'Connection pool for {self.alias!r} exhausted ({self.max_size} in use '
+                f'after waiting {self.timeout}s)'
+            )
+        POOL_WAIT.observe(time.perf_counter() - started, alias=self.alias)
+        try:
+            conn = self._checkout()
+        except Exception:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.in_use += 1
+        return conn
+
+    def _checkout(self):
+        while True:
+            with self.lock:
+                conn = self.idle.pop() if self.idle else None
+            if conn is None:
+                return self.connect()
+            if not conn.closed and (not self.health_checks or self._ping(conn)):
+                return conn
+            self._discard(conn)
+
+    def release(self, conn):
+        try:
+            if not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except psycopg2.Error:
+            self._discard(conn)
+        with self.lock:
+            self.in_use -= 1
+            if not conn.closed:
+                self.idle.append(conn)
+        self.slots.release()
+
+    def close_idle(self):
+        with self.lock:
+            idle, self.idle = list(self.idle), deque()
+        for conn in idle:
+            self._discard(conn)
+
+    @staticmethod
+    def _ping(conn):
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _discard(conn):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+
+
+def connection_factory(settings_dict, conn_params):
+    """
+    Return a callable opening connections the way the stock backend's
+    get_new_connection() does, built from the alias settings so a shared
+    pool holds no reference to the DatabaseWrapper that created it.
+    """
+    isolation_level = settings_dict['OPTIONS'].get('isolation_level')
+    conn_params = dict(conn_params)
+
+    def connect():
+        conn = psycopg2.connect(**conn_params)
+        if isolation_level is not None and conn.isolation_level != isolation_level:
+            conn.set_session(isolation_level=isolation_level)
+        psycopg2.extras.register_default_jsonb(conn_or_curs=conn, loads=lambda x: x)
+        return conn
+
+    return connect
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+@metrics.registry.add_collector
+def _collect_pool_connections():
+    for pool in list(_pools.values()):
+        POOL_CONNECTIONS.set(pool.in_use, alias=pool.alias, state='in_use')
+        POOL_CONNECTIONS.set(len(pool.idle), alias=pool.alias, state='idle')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+        self.pool = None
+
+    def _get_pool(self, conn_params):
+        options = self.settings_dict.get('POOL')
+        if not options:
+            return None
+        key = (self.alias, repr(sorted(conn_params.items())))
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = ConnectionPool(
+                    self.alias,
+                    connection_factory(self.settings_dict, conn_params),
+                    max_size=options.get('MAX_SIZE', 10),
+                    timeout=options.get('TIMEOUT', 30),
+                    health_checks=self.settings_dict.get('CONN_HEALTH_CHECKS', False),
+                )
+        return pool
+
+    def get_new_connection(self, conn_params):
+        self.pool = self._get_pool(conn_params)
+        if self.pool is None:
+            return super().get_new_connection(conn_params)
+        conn = self.pool.acquire()
+        # Set per wrapper, as the stock backend does before autocommit.
+        self.isolation_level = self.settings_dict['OPTIONS'].get('isolation_level', conn.isolation_level)
+        return conn
+
+    def connect(self):
+        # A fresh connection needs no check, and set_autocommit() during
+        # connect() must not trigger one.
+        self.health_check_done = True
+        super().connect()
+
+    def _close(self):
+        if self.connection is not None:
+            metrics.DB_CONNECTIONS.dec(alias=self.alias)
+        if self.connection is not None and self.pool is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
+            return
+        super()._close()
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (
+            self.connection is not None
+            and not self.health_check_done
+            and self.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not self.in_atomic_block
+        ):
+            self.health_check_done = True
+            if not self.is_usable():
+                self.close()
+        super().ensure_connection()
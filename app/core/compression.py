@@ -0,0 +1,133 @@
+"""
+Response compression: negotiation, encoders and the middleware.
+
+gzip is always available; Brotli and Zstandard are used when their
+packages are installed. Dynamic responses are compressed per request at a
+fast level. Payloads that are cached anyway (the OpenAPI schema, for
+the versions and languages it is cached for) keep precomputed variants
+at the highest level next to the plain bytes (`encode_all`), and the
+view picks one with `negotiate`, so a cache hit never compresses again. Every compressible response varies only on
+Accept-Encoding, so shared caches hold at most one copy per coding.
+"""
+import gzip
+import re
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from core.timing import timer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# Codings in order of preference when the client accepts several equally.
+ENCODERS = {}
+if brotli is not None:
+    ENCODERS['br'] = lambda content, best: brotli.compress(content, quality=11 if best else 4)
+if zstandard is not None:
+    ENCODERS['zstd'] = lambda content, best: zstandard.ZstdCompressor(level=19 if best else 3).compress(content)
+ENCODERS['gzip'] = lambda content, best: gzip.compress(content, compresslevel=9 if best else 6, mtime=0)
+
+COMPRESSIBLE_TYPES = re.compile(
+    r'^(text/|application/(json|javascript|xml|yaml|msgpack|vnd\.oai\.openapi)|application/[\w.+-]*\+(json|xml))'
+)
+
+
+def min_size():
+    return getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+
+def compressible(content_type):
+    return bool(COMPRESSIBLE_TYPES.match(content_type or ''))
+
+
+def accepted_codings(header):
+    """Map each coding in an Accept-Encoding header to its q-value."""
+    codings = {}
+    for part in (header or '').lower().split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        q = 1.0
+        match = re.search(r'q\s*=\s*([0-9.]+)', params)
+        if match:
+            try:
+                q = float(match.group(1))
+            except ValueError:
+                q = 0.0
+        codings[coding.strip()] = q
+    return codings
+
+
+def negotiate(header, available=None):
+    """Pick the preferred coding among `available` (default: all) that the header accepts, or None."""
+    codings = accepted_codings(header)
+    best, best_q = None, 0.0
+    for coding in available if available is not None else ENCODERS:
+        q = codings.get(coding, codings.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def encode(content, coding, best=False):
+    return ENCODERS[coding](content, best)
+
+
+def encode_all(content):
+    """Every coding of `content` at the highest level, skipping those that don't make it smaller."""
+    if len(content) < min_size():
+        return {}
+    variants = {coding: encode(content, coding, best=True) for coding in ENCODERS}
+    return {coding: data for coding, data in variants.items() if len(data) < len(content)}
+
+
+def set_encoding(response, coding):
+    """Mark `response` as carrying the `coding` variant of its representation."""
+    response['Content-Encoding'] = coding
+    response['Content-Length'] = str(len(response.content))
+    etag = response.get('ETag')
+    # Each coding is a different representation: its ETag can at most be weak.
+    if etag and not etag.startswith('W/'):
+        response['ETag'] = f'W/{etag}'
+
+
+class CompressionMiddleware:
+    """
+    Compress compressible responses of at least COMPRESSION_MIN_SIZE bytes
+    with the client's preferred coding; responses that already carry a
+    Content-Encoding (precomputed variants) and streams pass through.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (
+            response.streaming
+            or response.has_header('Content-Encoding')
+            or not compressible(response.get('Content-Type'))
+        ):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < min_size():
+            return response
+        coding = negotiate(request.headers.get('Accept-Encoding'))
+        if coding is None:
+            return response
+        with timer('compress'):
+            compressed = encode(response.content, coding)
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        set_encoding(response, coding)
+        return response
@@ -0,0 +1,66 @@
+"""
+Row counts that stay cheap on large tables.
+
+Exact COUNT(*) is linear in the rows counted, so result sets larger than
+COUNT_ESTIMATE_THRESHOLD are reported from the planner's statistics:
+pg_class.reltuples for a whole table, the EXPLAIN row estimate for a
+filtered queryset.
+"""
+import json
+
+from django.conf import settings
+from django.db import connections
+
+
+def threshold():
+    return getattr(settings, 'COUNT_ESTIMATE_THRESHOLD', 10000)
+
+
+def table_estimate(model, using='default'):
+    """Planner estimate of the rows in `model`'s table, or None before the first ANALYZE."""
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+def plan_estimate(queryset):
+    """Row estimate of the top plan node for `queryset`."""
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def bounded_count(queryset, limit):
+    """Exact count of `queryset`, stopping at `limit` rows."""
+    return queryset.order_by()[:limit].count()
+
+
+def estimate_count(queryset):
+    """
+    Return `(count, exact)` for `queryset`.
+
+    Result sets the planner puts above the threshold get its estimate with
+    exact=False. Smaller ones are counted, stopping one row past the
+    threshold, so a planner underestimate costs at most that many rows.
+    DISTINCT and grouped querysets cannot stop early, which is why the
+    planner is asked first.
+    """
+    limit = threshold()
+    if not queryset.query.where:
+        estimate = table_estimate(queryset.model, queryset.db)
+    else:
+        estimate = plan_estimate(queryset)
+    if estimate is not None and estimate > limit:
+        return estimate, False
+    counted = bounded_count(queryset, limit + 1)
+    return counted, counted <= limit
@@ -0,0 +1,136 @@
+"""
+Background deletion of a user and everything they own.
+
+`schedule` deactivates the user and records a UserDeletion; `process`
+then deletes their recipes, tags and ingredients (with the M2M links) in
+batches of set-based DELETEs, one short transaction per batch, before
+deleting the now small user row through the ORM. `schedule` queues
+`process` as a background job (core.jobs). Each batch commits its
+progress together with the rows it removed, so a crashed run resumes
+where it stopped, and it holds the UserDeletion row lock (SKIP LOCKED) so
+concurrent runners never work on the same user.
+"""
+import logging
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core import jobs
+from core.models import Ingredient, Recipe, RecipePopularity, Tag, Tombstone, UserDeletion
+
+
+logger = logging.getLogger(__name__)
+
+# Tables referencing recipes by recipe_id, emptied before the recipes.
+RECIPE_LINKS = [Recipe.tags.through, Recipe.ingredients.through, RecipePopularity]
+
+
+def batch_size():
+    return getattr(settings, 'USER_DELETION_BATCH_SIZE', 1000)
+
+
+def schedule(user):
+    """Deactivate `user` now and queue their data for deletion; returns the UserDeletion."""
+    with transaction.atomic():
+        get_user_model().objects.filter(id=user.id).update(is_active=False)
+        Token.objects.filter(user_id=user.id).delete()
+        deletion, _ = UserDeletion.objects.get_or_create(user_id=user.id, defaults={'email': user.email})
+        jobs.enqueue(process, dedupe_key=f'user-deletion:{deletion.id}', deletion_id=deletion.id)
+    user.is_active = False
+    return deletion
+
+
+def _delete_ids(cursor, table, column, ids):
+    cursor.execute(f'DELETE FROM {table} WHERE {column} = ANY(%s)', [ids])
+    return cursor.rowcount
+
+
+def _delete_recipes(cursor, user_id, limit):
+    cursor.execute(
+        'SELECT id, image FROM core_recipe WHERE user_id = %s ORDER BY id LIMIT %s',
+        [user_id, limit],
+    )
+    rows = cursor.fetchall()
+    ids = [pk for pk, _ in rows]
+    images = [image for _, image in rows if image]
+    deleted = sum(_delete_ids(cursor, link._meta.db_table, 'recipe_id', ids) for link in RECIPE_LINKS)
+    deleted += _delete_ids(cursor, Recipe._meta.db_table, 'id', ids)
+    # Files go once the rows are gone for good.
+    transaction.on_commit(lambda: [default_storage.delete(image) for image in images])
+    return len(ids), deleted
+
+
+def _delete_attrs(model, link):
+    column = f'{model._meta.model_name}_id'
+
+    def delete(cursor, user_id, limit):
+        cursor.execute(
+            f'SELECT id FROM {model._meta.db_table} WHERE user_id = %s ORDER BY id LIMIT %s',
+            [user_id, limit],
+        )
+        ids = [pk for pk, in cursor.fetchall()]
+        deleted = _delete_ids(cursor, link._meta.db_table, column, ids)
+        deleted += _delete_ids(cursor, model._meta.db_table, 'id', ids)
+        return len(ids), deleted
+
+    return delete
+
+
+def _delete_user(cursor, user_id, limit):
+    deleted = Tombstone.objects.filter(user_id=user_id).delete()[0]
+    # Only small relations are left for the collector to cascade through.
+    deleted += get_user_model().objects.filter(id=user_id).delete()[0]
+    return 0, deleted
+
+
+STAGE_DELETERS = {
+    'recipes': _delete_recipes,
+    'tags': _delete_attrs(Tag, Recipe.tags.through),
+    'ingredients': _delete_attrs(Ingredient, Recipe.ingredients.through),
+    'user': _delete_user,
+}
+
+
+def step(deletion_id, limit=None):
+    """
+    Delete one batch for `deletion_id` and return its UserDeletion, or None
+    when another runner holds it or it is already done.
+    """
+    limit = limit or batch_size()
+    with transaction.atomic():
+        deletion = UserDeletion.objects.select_for_update(skip_locked=True).filter(
+            id=deletion_id, finished_at__isnull=True,
+        ).first()
+        if deletion is None:
+            return None
+        with connection.cursor() as cursor:
+            selected, deleted = STAGE_DELETERS[deletion.stage](cursor, deletion.user_id, limit)
+        deletion.deleted_rows += deleted
+        if selected < limit:
+            deletion.stage = UserDeletion.STAGES[UserDeletion.STAGES.index(deletion.stage) + 1]
+            if deletion.stage == 'done':
+                deletion.finished_at = timezone.now()
+        deletion.save()
+    return deletion
+
+
+@jobs.task(max_attempts=20)
+def process(deletion_id, limit=None):
+    """Run `deletion_id` to completion unless another runner has it; returns the UserDeletion."""
+    deletion = None
+    while True:
+        current = step(deletion_id, limit)
+        if current is None:
+            return deletion
+        deletion = current
+        if deletion.finished_at:
+            logger.info('Deleted user %s: %s rows', deletion.user_id, deletion.deleted_rows)
+            return deletion
+
+
+def pending():
+    return UserDeletion.objects.filter(finished_at__isnull=True).order_by('requested_at')
@@ -0,0 +1,59 @@
+"""
+Readiness probes shared by the wait_for_db command and the health endpoints
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+def check_database(alias=DEFAULT_DB_ALIAS):
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def unapplied_migrations(alias=DEFAULT_DB_ALIAS):
+    executor = MigrationExecutor(connections[alias])
+    plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+    return [f'{migration.app_label}.{migration.name}' for migration, _ in plan]
+
+
+def check_cache():
+    key = 'health-check'
+    value = str(time.time())
+    cache.set(key, value, 10)
+    if cache.get(key) != value:
+        raise RuntimeError('Cache did not return the value just written')
+
+
+class CachedProbe:
+    """Run a probe at most once per TTL so orchestrator probes don't load Postgres."""
+
+    def __init__(self, probe):
+        self.probe = probe
+        self.lock = threading.Lock()
+        self.checked_at = None
+        self.error = None
+
+    def __call__(self):
+        ttl = getattr(settings, 'HEALTH_CHECK_CACHE_SECONDS', 5)
+        with self.lock:
+            now = time.monotonic()
+            if self.checked_at is None or now - self.checked_at >= ttl:
+                try:
+                    self.probe()
+                    self.error = None
+                except Exception as exc:
+                    self.error = f'{exc.__class__.__name__}: {exc}'.strip()
+                self.checked_at = now
+            return self.error
+
+    def reset(self):
+        with self.lock:
+            self.checked_at = None
+
+
+database_probe = CachedProbe(check_database)
@@ -0,0 +1,231 @@
+"""
+Background jobs stored in Postgres.
+
+A job is a row naming a function decorated with `@task` and the keyword
+arguments to call it with. Workers (`manage.py run_worker`) claim due jobs
+with SELECT ... FOR UPDATE SKIP LOCKED, so any number of them share the
+table without blocking each other, and keep a lease on what they run: a
+job whose worker died is requeued once its lease expires. Finished jobs
+are deleted; failures are retried with jittered exponential backoff and
+kept as `failed` after their last attempt.
+
+Jobs enqueued inside a transaction only become visible when it commits.
+"""
+import logging
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core import metrics
+from core.models import Job
+
+
+logger = logging.getLogger(__name__)
+
+JOBS = metrics.registry.counter('jobs_total', 'Background jobs run.', ['name', 'outcome'])
+JOB_DURATION = metrics.registry.histogram(
+    'job_duration_seconds', 'Background job run time.', ['name'],
+    buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0, 300.0, 900.0),
+)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def task(func=None, *, max_attempts=None):
+    """Mark `func` as runnable by workers; jobs refer to it by dotted path."""
+    def decorate(func):
+        func.job_name = f'{func.__module__}.{func.__qualname__}'
+        func.max_attempts = max_attempts
+        return func
+    return decorate(func) if func else decorate
+
+
+def _resolve(name_or_func):
+    func = import_string(name_or_func) if isinstance(name_or_func, str) else name_or_func
+    if not getattr(func, 'job_name', None):
+        raise ValueError(f'{name_or_func!r} is not a @task')
+    return func
+
+
+def enqueue(task, *, dedupe_key=None, delay=0, **kwargs):
+    """
+    Queue `task(**kwargs)` to run after `delay` seconds.
+
+    While a job with the same `dedupe_key` is queued or running, that job
+    is returned instead of adding another. Returns None in the unlikely
+    case that jobs with the key keep finishing while this one is added.
+    """
+    func = _resolve(task)
+    job = Job(
+        name=func.job_name,
+        kwargs=kwargs,
+        dedupe_key=dedupe_key,
+        max_attempts=func.max_attempts or _setting('JOB_MAX_ATTEMPTS', 5),
+        run_after=timezone.now() + timedelta(seconds=delay),
+    )
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                job.save()
+            return job
+        except IntegrityError:
+            if dedupe_key is None:
+                raise
+        try:
+            return Job.objects.get(dedupe_key=dedupe_key, status__in=[Job.QUEUED, Job.RUNNING])
+        except Job.DoesNotExist:
+            # The active job finished after our insert conflicted with it.
+            continue
+    return None
+
+
+def claim(worker, limit):
+    """Lock up to `limit` due jobs for `worker` and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_after__lte=now)
+            .order_by('run_after', 'id')[:limit]
+        )
+        Job.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=Job.RUNNING, locked_at=now, locked_by=worker, attempts=F('attempts') + 1,
+        )
+    for job in jobs:
+        job.status, job.locked_at, job.locked_by = Job.RUNNING, now, worker
+        job.attempts += 1
+    return jobs
+
+
+def renew(worker, job_ids):
+    """Extend the lease on jobs `worker` is still running."""
+    if job_ids:
+        Job.objects.filter(id__in=job_ids, locked_by=worker, status=Job.RUNNING).update(locked_at=timezone.now())
+
+
+def requeue_expired():
+    """Return jobs whose worker stopped renewing their lease to the queue (or fail them)."""
+    expired = timezone.now() - timedelta(seconds=_setting('JOB_LEASE_SECONDS', 300))
+    stale = Job.objects.filter(status=Job.RUNNING, locked_at__lt=expired)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, locked_by='', last_error='Lease expired',
+    )
+    return stale.update(status=Job.QUEUED, run_after=timezone.now(), locked_by='')
+
+
+def backoff(attempts):
+    base = _setting('JOB_RETRY_DELAY', 5)
+    ceiling = _setting('JOB_RETRY_MAX_DELAY', 3600)
+    return random.uniform(0, min(ceiling, base * 2 ** (attempts - 1)))
+
+
+def execute(job):
+    """Run a claimed job and record the outcome; returns 'done', 'retry' or 'failed'."""
+    started = time.monotonic()
+    try:
+        _resolve(job.name)(**job.kwargs)
+    except Exception:
+        outcome = 'failed' if job.attempts >= job.max_attempts else 'retry'
+        logger.exception('Job %s (%s) failed, attempt %s: %s', job.id, job.name, job.attempts, outcome)
+        Job.objects.filter(id=job.id, locked_by=job.locked_by).update(
+            status=Job.FAILED if outcome == 'failed' else Job.QUEUED,
+            run_after=timezone.now() + timedelta(seconds=backoff(job.attempts)),
+            locked_by='',
+            last_error=traceback.format_exc()[-4000:],
+        )
+    else:
+        outcome = 'done'
+        Job.objects.filter(id=job.id, locked_by=job.locked_by).delete()
+    finally:
+        JOB_DURATION.observe(time.monotonic() - started, name=job.name)
+    JOBS.inc(name=job.name, outcome=outcome)
+    return outcome
+
+
+def _run_in_pool(job):
+    try:
+        return execute(job)
+    finally:
+        # Pool threads outlive jobs; don't leave their connections open.
+        connections.close_all()
+
+
+class Worker:
+    """
+    Claims jobs while it has free slots and runs them in a thread pool, or
+    a process pool for CPU-bound work.
+    """
+
+    def __init__(self, concurrency=None, processes=False, poll_interval=1.0, burst=False):
+        self.concurrency = concurrency or _setting('JOB_CONCURRENCY', 4)
+        self.processes = processes
+        self.poll_interval = poll_interval
+        self.burst = burst
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+
+    def stop(self, *args):
+        self.stopping.set()
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def _executor(self):
+        if self.processes:
+            # Spawned, not forked, so children never inherit our open connections.
+            return ProcessPoolExecutor(
+                self.concurrency, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+            )
+        return ThreadPoolExecutor(self.concurrency, thread_name_prefix='job')
+
+    def _reap(self, futures, running):
+        for future in futures:
+            del running[future]
+            try:
+                future.result()
+            except Exception:
+                logger.exception('Worker could not record a job outcome')
+
+    def run(self):
+        running = {}
+        renewed = time.monotonic()
+        with self._executor() as executor:
+            while not self.stopping.is_set():
+                self._reap([future for future in running if future.done()], running)
+                requeue_expired()
+                if time.monotonic() - renewed > _setting('JOB_LEASE_SECONDS', 300) / 3:
+                    renew(self.name, list(running.values()))
+                    renewed = time.monotonic()
+
+                free = self.concurrency - len(running)
+                claimed = claim(self.name, free) if free else []
+                for job in claimed:
+                    running[executor.submit(_run_in_pool, job)] = job.id
+
+                if claimed:
+                    continue
+                if running:
+                    wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                elif self.burst:
+                    break
+                else:
+                    self.stopping.wait(self.poll_interval)
+            # Stopping: let running jobs finish rather than lose their attempt.
+            self._reap(list(running), running)
@@ -0,0 +1,35 @@
+"""
+Django command to merge duplicate tags and ingredients
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core import merge
+from core.models import Ingredient, Tag
+
+
+class Command(BaseCommand):
+    help = 'Merge tags and ingredients whose names only differ by case, whitespace or a plural ending'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='emails', help='Only dedupe these users (email)')
+        parser.add_argument('--only', choices=['tags', 'ingredients'], help='Only dedupe tags or ingredients')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be merged, change nothing')
+
+    def handle(self, *args, **options):
+        user_ids = None
+        if options['emails']:
+            user_ids = list(get_user_model().objects.filter(
+                email__in=options['emails'],
+            ).values_list('id', flat=True))
+        models = {'tags': Tag, 'ingredients': Ingredient}
+        if options['only']:
+            models = {options['only']: models[options['only']]}
+
+        for label, model in models.items():
+            before, removed, moved = merge.dedupe(model, user_ids, dry_run=options['dry_run'])
+            percent = 100 * removed / before if before else 0
+            self.stdout.write(self.style.SUCCESS(
+                f'{"Would merge" if options["dry_run"] else "Merged"} {removed} of {before} {label} '
+                f'({percent:.1f}%, {before - removed} left), {moved} recipe links moved'
+            ))
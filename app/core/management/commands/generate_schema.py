@@ -0,0 +1,30 @@
+"""
+Django command to pre-generate the cached OpenAPI schema for the current code version
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from core.schema import CachedSpectacularAPIView, code_version
+
+
+MEDIA_TYPES = {
+    'yaml': 'application/vnd.oai.openapi',
+    'json': 'application/vnd.oai.openapi+json',
+}
+
+
+class Command(BaseCommand):
+    help = 'Generate and cache the OpenAPI schema in every served format'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(MEDIA_TYPES), action='append', dest='formats')
+
+    def handle(self, *args, **options):
+        view = CachedSpectacularAPIView.as_view()
+        factory = RequestFactory()
+        for fmt in options['formats'] or sorted(MEDIA_TYPES):
+            response = view(factory.get('/api/schema/', HTTP_ACCEPT=MEDIA_TYPES[fmt]))
+            if response.status_code != 200:
+                raise CommandError(f'Schema generation failed for {fmt}: {response.status_code}')
+            self.stdout.write(f"Cached {fmt} schema {response['ETag']} for version {code_version()}")
+        self.stdout.write(self.style.SUCCESS('Schema cache ready'))
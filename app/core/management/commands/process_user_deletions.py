@@ -0,0 +1,22 @@
+"""
+Django command to delete the data of deactivated users in batches
+"""
+from django.core.management.base import BaseCommand
+
+from core import deletion
+
+
+class Command(BaseCommand):
+    help = 'Run pending user deletions to completion'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Rows per batch (USER_DELETION_BATCH_SIZE)')
+
+    def handle(self, *args, **options):
+        finished = 0
+        for deletion_id in list(deletion.pending().values_list('id', flat=True)):
+            result = deletion.process(deletion_id, options['batch_size'])
+            if result is not None and result.finished_at:
+                finished += 1
+                self.stdout.write(f'Deleted {result.email}: {result.deleted_rows} rows')
+        self.stdout.write(self.style.SUCCESS(f'Finished {finished} user deletions'))
@@ -0,0 +1,17 @@
+"""
+Django command to purge delta-sync tombstones past their retention
+"""
+from django.core.management.base import BaseCommand
+
+from core import sync
+
+
+class Command(BaseCommand):
+    help = 'Delete tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        purged = sync.purge_tombstones(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {purged} tombstones'))
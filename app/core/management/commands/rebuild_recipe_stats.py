@@ -0,0 +1,24 @@
+"""
+Django command to rebuild the per-user recipe statistics summaries
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from core import stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute RecipeStats from the recipe tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', dest='emails', help='Only rebuild these users (email)')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('id')
+        if options['emails']:
+            users = users.filter(email__in=options['emails'])
+        rebuilt = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            stats.rebuild(user_id)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt recipe stats for {rebuilt} users'))
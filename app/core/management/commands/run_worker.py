@@ -0,0 +1,28 @@
+"""
+Django command to run background jobs from the database queue
+"""
+from django.core.management.base import BaseCommand
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs until stopped (SIGTERM/SIGINT finish running jobs first)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=None, help='Jobs run at once (JOB_CONCURRENCY)')
+        parser.add_argument('--processes', action='store_true', help='Run jobs in a process pool instead of threads')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between polls when idle')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        worker = jobs.Worker(
+            concurrency=options['concurrency'],
+            processes=options['processes'],
+            poll_interval=options['poll_interval'],
+            burst=options['burst'],
+        )
+        worker.install_signal_handlers()
+        self.stdout.write(f'Worker {worker.name} running {worker.concurrency} jobs at a time')
+        worker.run()
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker.name} stopped'))
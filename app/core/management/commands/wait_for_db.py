@@ -1,23 +1,62 @@
 """
 Django command to wait for the database to be available
 """
+import random
 import time
 from psycopg2 import OperationalError as Psycopg2OpError
 
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from core.health import check_cache, unapplied_migrations
+
 
 class Command(BaseCommand):
 
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=120,
+                            help='Give up and exit non-zero after this many seconds (0 waits forever)')
+        parser.add_argument('--initial-delay', type=float, default=0.5)
+        parser.add_argument('--max-delay', type=float, default=10)
+        parser.add_argument('--check-migrations', action='store_true',
+                            help='Also wait until every migration is applied')
+        parser.add_argument('--check-cache', action='store_true',
+                            help='Also wait until the cache backend is reachable')
+
+    def _ready(self, options):
+        try:
+            self.check(databases=['default'])
+        except (Psycopg2OpError, OperationalError):
+            return 'Database unavailable'
+        if options['check_migrations']:
+            try:
+                pending = unapplied_migrations()
+            except (Psycopg2OpError, OperationalError) as exc:
+                # e.g. accepted the connection, then dropped it or is in recovery.
+                return f'Migrations unavailable ({exc})'.strip()
+            if pending:
+                return f'{len(pending)} unapplied migrations'
+        if options['check_cache']:
+            try:
+                check_cache()
+            except Exception as exc:
+                return f'Cache unavailable ({exc})'
+        return None
+
     def handle(self, *args, **options):
         self.stdout.write('Waiting for database...')
-        db_up = False
-        while db_up is False:
-            try:
-                self.check(databases=['default'])
-                db_up = True
-            except (Psycopg2OpError, OperationalError):
-                self.stdout.write("Database unavailable, waiting 1 second...")
-                time.sleep(1)
+        deadline = time.monotonic() + options['timeout'] if options['timeout'] else None
+        delay = options['initial_delay']
+        while True:
+            reason = self._ready(options)
+            if reason is None:
+                break
+            # Full jitter keeps restarting containers from probing in lockstep.
+            sleep_for = random.uniform(0, delay)
+            if deadline is not None and time.monotonic() + sleep_for > deadline:
+                raise CommandError(f"{reason}, giving up after {options['timeout']:g} seconds")
+            self.stdout.write(f'{reason}, waiting {sleep_for:.2f} seconds...')
+            time.sleep(sleep_for)
+            delay = min(delay * 2, options['max_delay'])
 
-        self.stdout.write(self.style.SUCCESS('Database available...'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS('Database available...'))
@@ -0,0 +1,133 @@
+"""
+Merging duplicate tags or ingredients into one survivor, set-based.
+
+Both `merge` (chosen duplicates of one tag) and `dedupe` (every group of
+names that normalize alike, for all or some users) fill a temporary
+duplicate -> survivor map and then apply it with three statements: links
+are copied to the survivor with INSERT ... ON CONFLICT DO NOTHING (a recipe
+already linked to it keeps one link), the duplicates' links are deleted,
+then the duplicates themselves. Nothing is loaded into Python, whatever
+the number of links. The sync triggers stamp the relinked recipes and
+write tombstones for the removed tags or ingredients.
+"""
+from django.db import connection, transaction
+
+from core import stats
+from core.models import Ingredient, Recipe, RecipeStats, Tag
+from core.signals import invalidate_similarity
+
+
+LINKS = {
+    Tag: (Recipe.tags.through, 'tag_id'),
+    Ingredient: (Recipe.ingredients.through, 'ingredient_id'),
+}
+
+# Case, surrounding and repeated whitespace don't tell names apart.
+NORMALIZED_NAME = r"lower(regexp_replace(btrim(name), '\s+', ' ', 'g'))"
+
+
+def _create_map(cursor):
+    cursor.execute(
+        'CREATE TEMPORARY TABLE merge_map '
+        '(duplicate_id bigint PRIMARY KEY, survivor_id bigint NOT NULL, user_id bigint NOT NULL) '
+        'ON COMMIT DROP'
+    )
+
+
+def _apply_map(cursor, model):
+    """Fold every mapped duplicate into its survivor; returns (duplicates, links moved)."""
+    link, column = LINKS[model]
+    table = model._meta.db_table
+    # Lock the duplicates so no link to them is added while they are merged.
+    cursor.execute(
+        f'SELECT count(*) FROM (SELECT 1 FROM {table} a JOIN merge_map m ON a.id = m.duplicate_id '
+        'FOR UPDATE OF a) locked'
+    )
+    duplicates = cursor.fetchone()[0]
+    cursor.execute(
+        f'INSERT INTO {link._meta.db_table} (recipe_id, {column}) '
+        f'SELECT l.recipe_id, m.survivor_id FROM {link._meta.db_table} l '
+        f'JOIN merge_map m ON l.{column} = m.duplicate_id ORDER BY 1, 2 '
+        'ON CONFLICT DO NOTHING'
+    )
+    moved = cursor.rowcount
+    cursor.execute(f'DELETE FROM {link._meta.db_table} l USING merge_map m WHERE l.{column} = m.duplicate_id')
+    cursor.execute(f'DELETE FROM {table} a USING merge_map m WHERE a.id = m.duplicate_id')
+    return duplicates, moved
+
+
+def merge(model, user, survivor_id, duplicate_ids):
+    """
+    Merge the user's `duplicate_ids` of `model` into `survivor_id`, which
+    must be theirs too; returns the ids that were merged.
+    """
+    link, column = LINKS[model]
+    field = f'{model._meta.model_name}_counts'
+    with stats.tracking(user.id) as recipe_stats, connection.cursor() as cursor:
+        _create_map(cursor)
+        cursor.execute(
+            f'INSERT INTO merge_map SELECT id, %s, user_id FROM {model._meta.db_table} '
+            'WHERE user_id = %s AND id = ANY(%s) AND id <> %s RETURNING duplicate_id',
+            [survivor_id, user.id, duplicate_ids, survivor_id],
+        )
+        merged = sorted(pk for pk, in cursor.fetchall())
+        if merged:
+            _apply_map(cursor, model)
+            counts = getattr(recipe_stats, field)
+            for pk in merged + [survivor_id]:
+                counts.pop(str(pk), None)
+            linked = link.objects.filter(**{column: survivor_id}).count()
+            if linked:
+                counts[str(survivor_id)] = linked
+            transaction.on_commit(lambda: invalidate_similarity(user.id))
+        cursor.execute('DROP TABLE merge_map')
+    return merged
+
+
+def dedupe(model, user_ids=None, dry_run=False):
+    """
+    Merge each user's `model` rows whose names are equal once normalized,
+    or equal but for a plural "s"/"es" ("Tomatoes" -> "tomato") when the
+    singular exists, into the oldest of them. Limited to `user_ids` if
+    given. Returns (rows before, duplicates removed, links moved); with
+    `dry_run` nothing is changed.
+    """
+    table = model._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        _create_map(cursor)
+        cursor.execute(
+            f'''
+            INSERT INTO merge_map
+            WITH normalized AS (
+                SELECT id, user_id, {NORMALIZED_NAME} AS name FROM {table}
+                WHERE %(user_ids)s::bigint[] IS NULL OR user_id = ANY(%(user_ids)s)
+            ), names AS (
+                SELECT DISTINCT user_id, name FROM normalized
+            ), keyed AS (
+                SELECT n.id, n.user_id, COALESCE(es.name, s.name, n.name) AS key
+                FROM normalized n
+                LEFT JOIN names es ON n.name LIKE '%%es' AND es.user_id = n.user_id AND es.name = left(n.name, -2)
+                LEFT JOIN names s ON n.name LIKE '%%s' AND s.user_id = n.user_id AND s.name = left(n.name, -1)
+            ), grouped AS (
+                SELECT id, user_id, min(id) OVER (PARTITION BY user_id, key) AS survivor_id FROM keyed
+            )
+            SELECT id, survivor_id, user_id FROM grouped WHERE id <> survivor_id
+            ''',
+            {'user_ids': list(user_ids) if user_ids is not None else None},
+        )
+        cursor.execute(
+            f'SELECT count(*) FROM {table} WHERE %(user_ids)s::bigint[] IS NULL OR user_id = ANY(%(user_ids)s)',
+            {'user_ids': list(user_ids) if user_ids is not None else None},
+        )
+        before = cursor.fetchone()[0]
+        duplicates, moved = _apply_map(cursor, model)
+        cursor.execute('SELECT DISTINCT user_id FROM merge_map')
+        affected = [user_id for user_id, in cursor.fetchall()]
+        # Counts keyed by the removed ids are stale; summaries rebuild on next use.
+        RecipeStats.objects.filter(user_id__in=affected).delete()
+        cursor.execute('DROP TABLE merge_map')
+        if dry_run:
+            transaction.set_rollback(True)
+        else:
+            transaction.on_commit(lambda: [invalidate_similarity(user_id) for user_id in affected])
+    return before, duplicates, moved
@@ -0,0 +1,336 @@
+"""
+In-process metrics registry exported in the Prometheus text format.
+
+Each worker process keeps its samples in memory behind a lock and
+periodically snapshots them to METRICS_DIR; a scrape merges the snapshots
+of every worker so gunicorn's process model reports one set of totals.
+Counters and histograms of workers that have exited are folded into one
+archive snapshot, so their totals are kept without their files piling up.
+"""
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def _key(self, labels):
+        return tuple((name, str(labels.get(name, ''))) for name in self.labelnames)
+
+    def dump(self):
+        return [[list(map(list, key)), value] for key, value in self.values.items()]
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        self.registry.maybe_flush()
+
+    @staticmethod
+    def merge(current, other):
+        return current + other
+
+    def samples(self, values):
+        for key, value in values.items():
+            yield self.name, key, value
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    merge = Counter.merge
+
+    def samples(self, values):
+        for key, value in values.items():
+            yield self.name, key, value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            counts, total = self.values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self.values[key] = (counts, total + value)
+        self.registry.maybe_flush()
+
+    @staticmethod
+    def merge(current, other):
+        return [a + b for a, b in zip(current[0], other[0])], current[1] + other[1]
+
+    def samples(self, values):
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f'{self.name}_bucket', key + (('le', _format_value(bound)),), cumulative
+            yield f'{self.name}_sum', key, total
+            yield f'{self.name}_count', key, cumulative
+
+
+ARCHIVE = 'metrics_archive.json'
+
+
+class Registry:
+
+    def __init__(self, directory=None, flush_interval=None):
+        self.lock = threading.RLock()
+        self.metrics = {}
+        self._directory = directory
+        self._flush_interval = flush_interval
+        self._last_flush = 0.0
+        self._collectors = []
+
+    @property
+    def directory(self):
+        if self._directory is not None:
+            return self._directory
+        return getattr(settings, 'METRICS_DIR', None)
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'METRICS_FLUSH_INTERVAL', 5.0)
+
+    def _register(self, metric):
+        with self.lock:
+            return self.metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def add_collector(self, func):
+        """Register a callable run before every flush and scrape, e.g. to refresh gauges."""
+        self._collectors.append(func)
+        return func
+
+    def collect(self):
+        for func in self._collectors:
+            func()
+
+    def reset(self):
+        with self.lock:
+            for metric in self.metrics.values():
+                metric.values.clear()
+
+    def _path(self, pid):
+        return os.path.join(self.directory, f'metrics_{pid}.json')
+
+    def maybe_flush(self):
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Snapshot this process' samples to METRICS_DIR."""
+        if not self.directory:
+            return
+        self.collect()
+        with self.lock:
+            self._last_flush = time.monotonic()
+            data = {name: metric.dump() for name, metric in self.metrics.items()}
+        os.makedirs(self.directory, exist_ok=True)
+        self._write(self._path(os.getpid()), data)
+
+    def _write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as fh:
+            json.dump(data, fh)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path) as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _snapshots(self):
+        """Yield (path, is_live, data) for every worker snapshot in METRICS_DIR."""
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith('metrics_') and filename.endswith('.json')) or filename == ARCHIVE:
+                continue
+            try:
+                pid = int(filename[len('metrics_'):-len('.json')])
+            except ValueError:
+                continue
+            path = os.path.join(self.directory, filename)
+            data = self._read(path)
+            if data is not None:
+                yield path, _pid_alive(pid), data
+
+    def _merge(self, merged, data, is_live):
+        for name, samples in data.items():
+            metric = self.metrics.get(name)
+            # Gauges describe current state, so dead workers must not contribute.
+            if metric is None or (metric.kind == 'gauge' and not is_live):
+                continue
+            merged.setdefault(name, {})
+            for key, value in samples:
+                key = tuple(map(tuple, key))
+                if metric.kind == 'histogram':
+                    value = tuple(value)
+                if key in merged[name]:
+                    value = metric.merge(merged[name][key], value)
+                merged[name][key] = value
+
+    def _archived(self):
+        return self._read(os.path.join(self.directory, ARCHIVE)) or {'folded': [], 'samples': {}}
+
+    def _compact(self):
+        """
+        Fold the snapshots of dead workers into the archive and delete them.
+
+        Dead snapshots are first renamed to unique dead_*.json names; the
+        archive lists the names it has folded in, so after a crash between
+        writing it and deleting them they are deleted, not counted again.
+        """
+        with open(os.path.join(self.directory, '.metrics.lock'), 'w') as lock:
+            # One scraper at a time.
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            for path, is_live, _ in self._snapshots():
+                if not is_live:
+                    os.replace(path, os.path.join(self.directory, f'dead_{uuid.uuid4().hex}.json'))
+            pending = sorted(name for name in os.listdir(self.directory) if name.startswith('dead_'))
+            if not pending:
+                return
+            archive = self._archived()
+            samples = {}
+            self._merge(samples, archive['samples'], is_live=False)
+            for name in pending:
+                if name not in archive['folded']:
+                    self._merge(samples, self._read(os.path.join(self.directory, name)) or {}, is_live=False)
+            self._write(os.path.join(self.directory, ARCHIVE), {
+                'folded': pending,
+                'samples': {
+                    name: [[list(map(list, key)), value] for key, value in values.items()]
+                    for name, values in samples.items()
+                },
+            })
+            for name in pending:
+                os.unlink(os.path.join(self.directory, name))
+
+    def merged(self):
+        if not self.directory:
+            self.collect()
+            with self.lock:
+                return {name: dict(metric.values) for name, metric in self.metrics.items()}
+
+        self.flush()
+        self._compact()
+        merged = {name: {} for name in self.metrics}
+        self._merge(merged, self._archived()['samples'], is_live=False)
+        for _, is_live, data in self._snapshots():
+            self._merge(merged, data, is_live)
+        return merged
+
+    def render(self):
+        lines = []
+        merged = self.merged()
+        for name, metric in sorted(self.metrics.items()):
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for sample_name, key, value in metric.samples(merged.get(name, {})):
+                lines.append(f'{sample_name}{_format_labels(key)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'http_requests_total', 'Total HTTP requests.', ['view', 'method', 'status'],
+)
+LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency.', ['view', 'method', 'status'],
+)
+# Incremented as connections open and decremented by the backend's close
+# (core.backends.postgresql), in every thread of every live worker.
+DB_CONNECTIONS = registry.gauge(
+    'db_connections_open', 'Open database connections held by workers.', ['alias'],
+)
+
+
+@receiver(connection_created)
+def _connection_opened(sender, connection, **kwargs):
+    DB_CONNECTIONS.inc(alias=connection.alias)
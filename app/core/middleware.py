@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core import metrics, timing
+from core.db import execute_wrapper
+from core.routers import use_replicas
+
+
+logger = logging.getLogger('core.timing')
+
+
+class ServerTimingMiddleware:
+    """
+    Record query count, SQL, auth, serializer and render time for a sample
+    of requests and report them in a Server-Timing header and a log line.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_sample(self, request):
+        force_header = getattr(settings, 'SERVER_TIMING_FORCE_HEADER', None)
+        if force_header and request.headers.get(force_header):
+            return True
+        sample_rate = getattr(settings, 'SERVER_TIMING_SAMPLE_RATE', 1.0)
+        return sample_rate >= 1 or random.random() < sample_rate
+
+    def __call__(self, request):
+        if not self.should_sample(request):
+            return self.get_response(request)
+
+        timings, token = timing.start()
+        try:
+            with execute_wrapper(timing.sql_wrapper):
+                response = self.get_response(request)
+        finally:
+            timing.stop(token)
+
+        response['Server-Timing'] = timings.server_timing()
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **timings.as_dict(),
+        }))
+        return response
+
+
+def view_label(request):
+    """Name the resolved view, including the viewset action, e.g. RecipeViewSet.list"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    func = match.func
+    cls = getattr(func, 'cls', None)
+    if cls is None:
+        return getattr(func, '__name__', match.view_name)
+    actions = getattr(func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower())
+        if action:
+            return f'{cls.__name__}.{action}'
+    return cls.__name__
+
+
+class MetricsMiddleware:
+    """Count requests and observe latency per resolved view, method and status."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        labels = {
+            'view': view_label(request),
+            'method': request.method,
+            'status': response.status_code,
+        }
+        metrics.LATENCY.observe(time.perf_counter() - started, **labels)
+        metrics.REQUESTS.inc(**labels)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe-method requests read from replicas, except for clients that
+    wrote within the last DB_REPLICA_PIN_SECONDS, who stay on the primary so
+    they always read their own writes.
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    @staticmethod
+    def pin_key(request):
+        client = (
+            request.headers.get('Authorization')
+            or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+            or request.META.get('REMOTE_ADDR', '')
+        )
+        return 'replica-pin:' + hashlib.sha256(client.encode()).hexdigest()
+
+    def __call__(self, request):
+        if not getattr(settings, 'DATABASE_REPLICAS', None):
+            return self.get_response(request)
+
+        key = self.pin_key(request)
+        if request.method in self.safe_methods:
+            with use_replicas(not cache.get(key)):
+                return self.get_response(request)
+
+        response = self.get_response(request)
+        if response.status_code < 400:
+            cache.set(key, 1, getattr(settings, 'DB_REPLICA_PIN_SECONDS', 10))
+        return response
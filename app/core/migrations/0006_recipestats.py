@@ -0,0 +1,27 @@
+# Generated by Django 4.0.5 on 2026-10-19 07:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_recipe_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecipeStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('recipe_count', models.IntegerField(default=0)),
+                ('time_minutes_sum', models.BigIntegerField(default=0)),
+                ('price_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('price_histogram', models.JSONField(default=list)),
+                ('tag_counts', models.JSONField(default=dict)),
+                ('ingredient_counts', models.JSONField(default=dict)),
+            ],
+        ),
+    ]
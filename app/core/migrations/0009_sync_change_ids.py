@@ -0,0 +1,126 @@
+# Generated by Django 4.0.5 on 2026-10-19 07:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# change_id holds the 64-bit id of the last transaction that wrote the row
+# (or, for recipes, its tag/ingredient links); deletes leave a tombstone.
+# Triggers rather than signals so bulk, raw and cascading writes are covered.
+SYNC_SQL = """
+CREATE FUNCTION core_stamp_change_id() RETURNS trigger AS $$
+BEGIN
+    NEW.change_id := pg_current_xact_id()::text::bigint;
+    RETURN NEW;
+END $$ LANGUAGE plpgsql;
+
+CREATE FUNCTION core_touch_recipes() RETURNS trigger AS $$
+BEGIN
+    UPDATE core_recipe SET change_id = 0
+    WHERE id IN (SELECT recipe_id FROM changed_rows)
+      AND change_id <> pg_current_xact_id()::text::bigint;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE FUNCTION core_write_tombstones() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO core_tombstone (user_id, model, object_id, change_id, deleted_at)
+    SELECT user_id, TG_ARGV[0], id, pg_current_xact_id()::text::bigint, now()
+    FROM changed_rows;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+"""
+
+SYNC_TABLE_SQL = """
+CREATE TRIGGER {table}_change_id BEFORE INSERT OR UPDATE ON {table}
+    FOR EACH ROW EXECUTE FUNCTION core_stamp_change_id();
+CREATE TRIGGER {table}_tombstone AFTER DELETE ON {table}
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_write_tombstones('{model}');
+"""
+
+LINK_TABLE_SQL = """
+CREATE TRIGGER {table}_insert_touch AFTER INSERT ON {table}
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_touch_recipes();
+CREATE TRIGGER {table}_delete_touch AFTER DELETE ON {table}
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_touch_recipes();
+"""
+
+SYNCED_TABLES = {'core_recipe': 'recipe', 'core_tag': 'tag', 'core_ingredient': 'ingredient'}
+LINK_TABLES = ['core_recipe_tags', 'core_recipe_ingredients']
+
+FORWARD_SQL = SYNC_SQL + ''.join(
+    SYNC_TABLE_SQL.format(table=table, model=model) for table, model in SYNCED_TABLES.items()
+) + ''.join(LINK_TABLE_SQL.format(table=table) for table in LINK_TABLES)
+
+REVERSE_SQL = ''.join(
+    f'DROP TRIGGER {table}_change_id ON {table}; DROP TRIGGER {table}_tombstone ON {table};'
+    for table in SYNCED_TABLES
+) + ''.join(
+    f'DROP TRIGGER {table}_insert_touch ON {table}; DROP TRIGGER {table}_delete_touch ON {table};'
+    for table in LINK_TABLES
+) + """
+DROP FUNCTION core_stamp_change_id();
+DROP FUNCTION core_touch_recipes();
+DROP FUNCTION core_write_tombstones();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_prefix_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=16)),
+                ('object_id', models.BigIntegerField()),
+                ('change_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ingredient',
+            name='change_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='change_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='change_id',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', 'change_id'], name='ingredient_user_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', 'change_id'], name='recipe_user_change_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'change_id'], name='tag_user_change_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='user',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['user', 'change_id'], name='tombstone_user_change_idx'),
+        ),
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 4.0.5 on 2026-10-19 07:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Rows of users being deleted by core.deletion need neither tombstones nor
+# change stamps: skip them instead of writing and then discarding both.
+DELETING = 'SELECT 1 FROM core_userdeletion d WHERE d.user_id = {table}.user_id AND d.finished_at IS NULL'
+
+FORWARD_SQL = f"""
+CREATE OR REPLACE FUNCTION core_touch_recipes() RETURNS trigger AS $$
+BEGIN
+    UPDATE core_recipe SET change_id = 0
+    WHERE id IN (SELECT recipe_id FROM changed_rows)
+      AND change_id <> pg_current_xact_id()::text::bigint
+      AND NOT EXISTS ({DELETING.format(table='core_recipe')});
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION core_write_tombstones() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO core_tombstone (user_id, model, object_id, change_id, deleted_at)
+    SELECT user_id, TG_ARGV[0], id, pg_current_xact_id()::text::bigint, now()
+    FROM changed_rows
+    WHERE NOT EXISTS ({DELETING.format(table='changed_rows')});
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+"""
+
+REVERSE_SQL = """
+CREATE OR REPLACE FUNCTION core_touch_recipes() RETURNS trigger AS $$
+BEGIN
+    UPDATE core_recipe SET change_id = 0
+    WHERE id IN (SELECT recipe_id FROM changed_rows)
+      AND change_id <> pg_current_xact_id()::text::bigint;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION core_write_tombstones() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO core_tombstone (user_id, model, object_id, change_id, deleted_at)
+    SELECT user_id, TG_ARGV[0], id, pg_current_xact_id()::text::bigint, now()
+    FROM changed_rows;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_sync_change_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email', models.EmailField(max_length=255)),
+                ('stage', models.CharField(default='recipes', max_length=16)),
+                ('deleted_rows', models.BigIntegerField(default=0)),
+                ('requested_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.OneToOneField(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
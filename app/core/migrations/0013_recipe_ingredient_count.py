@@ -0,0 +1,54 @@
+# Generated by Django 4.0.5 on 2026-10-19 08:47
+
+from django.db import migrations, models
+
+
+# ingredient_count mirrors the recipe's rows in core_recipe_ingredients so
+# cookable_with can compare it with the pantry matches instead of visiting
+# every link of every candidate. Triggers, like change_id (0009), so bulk and
+# cascading link writes are covered. The backfill skips the change_id stamp:
+# the count is not synced, so clients need not fetch every recipe again.
+FORWARD_SQL = """
+CREATE FUNCTION core_count_recipe_ingredients() RETURNS trigger AS $$
+BEGIN
+    UPDATE core_recipe SET ingredient_count = ingredient_count + TG_ARGV[0]::int * links.n
+    FROM (SELECT recipe_id, count(*) AS n FROM changed_rows GROUP BY recipe_id) AS links
+    WHERE core_recipe.id = links.recipe_id;
+    RETURN NULL;
+END $$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_ingredients_insert_count AFTER INSERT ON core_recipe_ingredients
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_count_recipe_ingredients('1');
+CREATE TRIGGER core_recipe_ingredients_delete_count AFTER DELETE ON core_recipe_ingredients
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION core_count_recipe_ingredients('-1');
+
+ALTER TABLE core_recipe DISABLE TRIGGER core_recipe_change_id;
+UPDATE core_recipe SET ingredient_count = links.n
+FROM (SELECT recipe_id, count(*) AS n FROM core_recipe_ingredients GROUP BY recipe_id) AS links
+WHERE core_recipe.id = links.recipe_id;
+ALTER TABLE core_recipe ENABLE TRIGGER core_recipe_change_id;
+"""
+
+REVERSE_SQL = """
+DROP TRIGGER core_recipe_ingredients_insert_count ON core_recipe_ingredients;
+DROP TRIGGER core_recipe_ingredients_delete_count ON core_recipe_ingredients;
+DROP FUNCTION core_count_recipe_ingredients();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_recipepopularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(FORWARD_SQL, REVERSE_SQL),
+    ]
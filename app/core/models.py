@@ -9,6 +9,12 @@ from django.contrib.auth.models import (
     PermissionsMixin
 )
 
+
+def prefix_search_index(field, name):
+    """Index serving LIKE 'prefix%' lookups (`field__startswith`) under any collation."""
+    return models.Index(fields=[field], name=name, opclasses=['varchar_pattern_ops'])
+
+
 def recipe_image_file_path(instance, filename):
     ext = os.path.splitext(filename)[1]
     filename = f"{uuid.uuid4()}{ext}"
@@ -55,6 +61,21 @@ class Recipe(models.Model):
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
     image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    change_id = models.BigIntegerField(default=0, editable=False)
+    # Number of ingredient links, kept by triggers on the link table
+    # (migration 0013) for recipe.filters.cookable_with.
+    ingredient_count = models.IntegerField(default=0, editable=False)
+
+    class Meta:
+        # Each ordering offered by the recipe API is an index scan within a
+        # user, with id as the tie-breaker so keyset cursors stay stable.
+        indexes = [
+            models.Index(fields=['user', 'time_minutes', 'id'], name='recipe_user_time_id_idx'),
+            models.Index(fields=['user', 'price', 'id'], name='recipe_user_price_id_idx'),
+            models.Index(fields=['user', 'title', 'id'], name='recipe_user_title_id_idx'),
+            prefix_search_index('title', 'recipe_title_prefix_idx'),
+            models.Index(fields=['user', 'change_id'], name='recipe_user_change_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -63,6 +84,13 @@ class Recipe(models.Model):
 class Tag(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    change_id = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            prefix_search_index('name', 'tag_name_prefix_idx'),
+            models.Index(fields=['user', 'change_id'], name='tag_user_change_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -71,6 +99,113 @@ class Tag(models.Model):
 class Ingredient(models.Model):
     name = models.CharField(max_length=255)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    change_id = models.BigIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            prefix_search_index('name', 'ingredient_name_prefix_idx'),
+            models.Index(fields=['user', 'change_id'], name='ingredient_user_change_idx'),
+        ]
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class RecipeStats(models.Model):
+    """Per-user recipe summary, maintained incrementally by core.stats."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True)
+    recipe_count = models.IntegerField(default=0)
+    time_minutes_sum = models.BigIntegerField(default=0)
+    price_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    price_histogram = models.JSONField(default=list)
+    tag_counts = models.JSONField(default=dict)
+    ingredient_counts = models.JSONField(default=dict)
+
+
+class RecipePopularity(models.Model):
+    """
+    How often a recipe is opened, counted in memory and written behind in
+    batches by core.popularity. Kept apart from Recipe so the writes don't
+    touch the recipe rows (and their sync change ids).
+    """
+    recipe = models.OneToOneField(Recipe, on_delete=models.CASCADE, primary_key=True, related_name='popularity')
+    views = models.BigIntegerField(default=0)
+    # log2 of the views decayed to core.popularity.EPOCH with a
+    # POPULARITY_HALF_LIFE_DAYS half-life.
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class Tombstone(models.Model):
+    """
+    Record of a deleted recipe, tag or ingredient for delta sync (core.sync).
+
+    Written by database triggers, like `change_id` on the synced models, so
+    bulk and cascading deletes are covered. No FK constraint: tombstones
+    outlive the rows and may be written while their user is being deleted.
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+    )
+    model = models.CharField(max_length=16)
+    object_id = models.BigIntegerField()
+    change_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['user', 'change_id'], name='tombstone_user_change_idx')]
+
+
+class UserDeletion(models.Model):
+    """
+    Progress of a user's data being deleted in batches by core.deletion.
+
+    Outlives the user row (no FK constraint) as a record of the deletion.
+    """
+    STAGES = ['recipes', 'tags', 'ingredients', 'user', 'done']
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+',
+    )
+    email = models.EmailField(max_length=255)
+    stage = models.CharField(max_length=16, default='recipes')
+    deleted_rows = models.BigIntegerField(default=0)
+    requested_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+
+class Job(models.Model):
+    """Background job run by `manage.py run_worker` (see core.jobs)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+
+    name = models.CharField(max_length=255)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=16, default=QUEUED)
+    dedupe_key = models.CharField(max_length=255, null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_after = models.DateTimeField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=255, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['run_after', 'id'], name='job_queued_idx', condition=models.Q(status='queued'),
+            ),
+            models.Index(
+                fields=['locked_at'], name='job_running_idx', condition=models.Q(status='running'),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'],
+                name='job_active_dedupe_key',
+                condition=models.Q(status__in=['queued', 'running']),
+            ),
+        ]
@@ -0,0 +1,110 @@
+"""
+Detect N+1 query patterns by fingerprinting the SQL executed within a request
+"""
+import logging
+import os
+import re
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from core.db import execute_wrapper
+
+
+logger = logging.getLogger('core.nplusone')
+
+_current = ContextVar('nplusone_tracker', default=None)
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST_RE = re.compile(r'\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)', re.IGNORECASE)
+_SPACE_RE = re.compile(r'\s+')
+
+
+class NPlusOneError(Exception):
+    pass
+
+
+def fingerprint(sql):
+    """Normalize literals and IN lists so statements differing only in values match."""
+    sql = _STRING_RE.sub('?', sql)
+    sql = _NUMBER_RE.sub('?', sql)
+    sql = _IN_LIST_RE.sub('IN (...)', sql)
+    return _SPACE_RE.sub(' ', sql).strip()
+
+
+def _app_stack():
+    """Stack frames belonging to this project rather than Django or third-party code."""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(base_dir)
+        and 'site-packages' not in frame.filename
+        and os.path.basename(frame.filename) not in ('nplusone.py', 'db.py')
+    ]
+    return ''.join(traceback.format_list(frames))
+
+
+class QueryTracker:
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = {}
+        self.violations = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = fingerprint(sql)
+        count = self.counts.get(shape, 0) + 1
+        self.counts[shape] = count
+        if count == self.threshold + 1:
+            self.violations[shape] = _app_stack()
+        return execute(sql, params, many, context)
+
+    def report(self, label=''):
+        lines = []
+        for shape, stack in self.violations.items():
+            lines.append(
+                f'N+1 query {label}: {self.counts[shape]} executions of\n    {shape}\n{stack}'
+            )
+        return '\n'.join(lines)
+
+
+@contextmanager
+def track_queries(threshold=None):
+    """Yield a QueryTracker recording every statement executed in the block."""
+    if threshold is None:
+        threshold = getattr(settings, 'NPLUSONE_THRESHOLD', 5)
+    tracker = QueryTracker(threshold)
+    token = _current.set(tracker)
+    try:
+        with execute_wrapper(tracker):
+            yield tracker
+    finally:
+        _current.reset(token)
+
+
+class NPlusOneMiddleware:
+    """
+    Raise or log when a single request repeats the same query shape more than
+    NPLUSONE_THRESHOLD times. NPLUSONE_MODE is one of 'raise', 'log' or 'off'.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = getattr(settings, 'NPLUSONE_MODE', 'off')
+        if mode == 'off':
+            return self.get_response(request)
+
+        with track_queries() as tracker:
+            response = self.get_response(request)
+
+        if tracker.violations:
+            report = tracker.report(f'in {request.method} {request.path}')
+            if mode == 'raise':
+                raise NPlusOneError(report)
+            logger.warning(report)
+        return response
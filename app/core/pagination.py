@@ -0,0 +1,89 @@
+"""
+Page-number pagination whose counts come from core.counting, so paging a
+large result set never runs an unbounded COUNT(*).
+"""
+from collections import OrderedDict
+
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+
+from core import counting
+
+
+class EstimatedCountPaginator(Paginator):
+    """Django paginator counting through core.counting.estimate_count; see `count_exact`."""
+
+    @cached_property
+    def _estimate(self):
+        return counting.estimate_count(self.object_list)
+
+    @property
+    def count(self):
+        return self._estimate[0]
+
+    @property
+    def count_exact(self):
+        return self._estimate[1]
+
+    def page(self, number):
+        if self.count_exact:
+            return super().page(number)
+        # An estimate must not clip the slice or bound the page number:
+        # the page holds whatever rows are actually there.
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return EstimatedPage(self.object_list[bottom:bottom + self.per_page], number, self)
+
+    def validate_number(self, number):
+        if self.count_exact:
+            return super().validate_number(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger('That page number is not an integer')
+        if number < 1:
+            raise EmptyPage('That page number is less than 1')
+        return number
+
+
+class EstimatedPage(Page):
+    """Page of an estimated count, which has a successor while it is full."""
+
+    def has_next(self):
+        return len(self) == self.paginator.per_page
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """
+    Opt-in pagination: lists stay plain arrays unless `page` or `page_size`
+    is given, in which case the response carries `count` and `count_exact`.
+    """
+    django_paginator_class = EstimatedCountPaginator
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.page_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.page.paginator.count),
+            ('count_exact', self.page.paginator.count_exact),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_exact'] = {
+            'type': 'boolean',
+            'description': 'False when count is a planner estimate for a large result set',
+        }
+        return response_schema
@@ -0,0 +1,41 @@
+"""
+Request body parsers timed into the request's Server-Timing.
+"""
+import json
+
+from django.conf import settings
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+from core.timing import timer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JSONParser(parsers.JSONParser):
+    """DRF's JSON parser, decoding with orjson when it is installed."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        with timer('parse'):
+            if orjson is None:
+                return super().parse(stream, media_type, parser_context)
+            encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+            try:
+                body = stream.read()
+                if encoding.lower().replace('-', '') != 'utf8':
+                    body = body.decode(encoding)
+                try:
+                    return orjson.loads(body)
+                except orjson.JSONDecodeError:
+                    # orjson refuses some documents the stdlib accepts (lone
+                    # surrogate escapes); let the stdlib decide, as DRF would.
+                    return json.loads(body, parse_constant=self._reject_constant)
+            except ValueError as exc:
+                raise ParseError(f'JSON parse error - {exc}')
+
+    @staticmethod
+    def _reject_constant(value):
+        raise ValueError(f'Out of range float values are not JSON compliant: {value!r}')
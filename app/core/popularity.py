@@ -0,0 +1,143 @@
+"""
+Write-behind counting of recipe views for the "popular" ordering.
+
+Views are counted in a per-process dict and written every
+POPULARITY_FLUSH_INTERVAL seconds by a background thread, or as soon as
+POPULARITY_FLUSH_SIZE distinct recipes are pending, with one INSERT ...
+ON CONFLICT DO UPDATE for the whole batch. A crashed process loses at most
+the views since its last flush; they are only a ranking signal.
+
+Scores decay with a half-life of POPULARITY_HALF_LIFE_DAYS. A view at
+time t is worth 2 ** ((t - EPOCH) / half_life) and a recipe's score is the
+log2 of the sum of its views' worth, so newer views outweigh older ones,
+every score decays at the same rate and ordering by the stored column is
+ordering by decayed views, without rewriting rows as time passes. Changing
+the half-life only affects views counted after the change.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.models import Recipe, RecipePopularity
+
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(2022, 1, 1, tzinfo=dt_timezone.utc)
+# Beyond this gap in log2 the smaller score adds nothing a float can hold.
+MAX_SCORE_GAP = 60
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def worth(now=None):
+    """log2 of what one view at `now` adds to a score."""
+    elapsed = ((now or timezone.now()) - EPOCH).total_seconds()
+    return elapsed / (_setting('POPULARITY_HALF_LIFE_DAYS', 7) * 86400)
+
+
+def flush_counts(counts, now=None):
+    """Add `counts` (recipe id -> views) to the stored popularity in one statement."""
+    if not counts:
+        return 0
+    ids = sorted(counts)
+    table = RecipePopularity._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Sorted, so concurrent flushes lock overlapping rows in the same order;
+        # joined to the recipes so ids deleted meanwhile are dropped.
+        cursor.execute(
+            f'''
+            INSERT INTO {table} AS p (recipe_id, views, score, updated_at)
+            SELECT r.id, v.views, %(worth)s + ln(v.views) / ln(2), %(now)s
+            FROM unnest(%(ids)s::bigint[], %(views)s::bigint[]) AS v(id, views)
+            JOIN {Recipe._meta.db_table} r ON r.id = v.id
+            ORDER BY r.id
+            ON CONFLICT (recipe_id) DO UPDATE SET
+                views = p.views + EXCLUDED.views,
+                score = GREATEST(p.score, EXCLUDED.score)
+                    + ln(1 + power(2, -LEAST(abs(p.score - EXCLUDED.score), %(gap)s))) / ln(2),
+                updated_at = EXCLUDED.updated_at
+            ''',
+            {
+                'ids': ids,
+                'views': [counts[pk] for pk in ids],
+                'worth': worth(now),
+                'now': now or timezone.now(),
+                'gap': MAX_SCORE_GAP,
+            },
+        )
+        return cursor.rowcount
+
+
+class ViewCounter:
+    """Per-process view counts and the thread that flushes them."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.counts = Counter()
+        self.thread = None
+        self.pid = os.getpid()
+
+    def record(self, recipe_id):
+        with self.lock:
+            if self.pid != os.getpid():
+                # Forked: the parent's counts and thread are not ours.
+                self.counts, self.thread, self.pid = Counter(), None, os.getpid()
+            self.counts[recipe_id] += 1
+            full = len(self.counts) >= _setting('POPULARITY_FLUSH_SIZE', 1000)
+            threaded = self._ensure_thread()
+        if full:
+            if threaded:
+                self.wake.set()
+            else:
+                self.flush()
+
+    def _ensure_thread(self):
+        if not _setting('POPULARITY_FLUSH_INTERVAL', 10):
+            return False
+        if self.thread is None or not self.thread.is_alive():
+            if self.thread is None:
+                # The thread is a daemon; write what it hasn't on a clean exit.
+                atexit.register(self.flush)
+            self.thread = threading.Thread(target=self._run, name='popularity-flush', daemon=True)
+            self.thread.start()
+        return True
+
+    def take(self):
+        with self.lock:
+            counts, self.counts = self.counts, Counter()
+        return counts
+
+    def flush(self):
+        """Write and forget the pending counts; they are dropped if the write fails."""
+        counts = self.take()
+        try:
+            flush_counts(counts)
+        except Exception:
+            logger.exception('Could not flush %s recipe view counts', len(counts))
+
+    def _run(self):
+        while True:
+            interval = _setting('POPULARITY_FLUSH_INTERVAL', 10)
+            if not interval:
+                return
+            self.wake.wait(interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            finally:
+                # Idle between flushes; don't hold a connection meanwhile.
+                connection.close()
+
+
+counter = ViewCounter()
@@ -0,0 +1,86 @@
+"""
+Renderers timed into the request's Server-Timing.
+
+JSON is encoded with orjson when it is installed and by DRF's stdlib
+encoder otherwise; anything orjson has no native encoding for (Decimal,
+datetimes, lazy strings, querysets...) goes through DRF's encoder, so
+both produce the same values. Floats differ: orjson writes 1e16 where
+the stdlib writes 1e+16, and it writes NaN and infinities as null where
+DRF raises ValueError. Checking every response for them would cost more
+than encoding it; the API's own fields have no floats (prices are
+Decimal strings). Indented output, as the browsable API asks for, always
+uses the stdlib.
+"""
+from rest_framework import renderers
+from rest_framework.utils import encoders
+
+from core.timing import timer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+_default = encoders.JSONEncoder().default
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class JSONRenderer(renderers.JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timer('render'):
+            if orjson is None or data is None or self.get_indent(accepted_media_type, renderer_context or {}):
+                return super().render(data, accepted_media_type, renderer_context)
+            try:
+                ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+            except orjson.JSONEncodeError:
+                # e.g. integers beyond 64 bits; the stdlib copes or raises the usual error.
+                return super().render(data, accepted_media_type, renderer_context)
+            # Like DRF, keep the output a strict JavaScript subset.
+            if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+                ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+            return ret
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """MessagePack for clients sending `Accept: application/msgpack`; needs the msgpack package."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timer('render'):
+            if data is None:
+                return b''
+            return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+class ZipRenderer(renderers.BaseRenderer):
+    """
+    Lets views that stream ZIP archives themselves negotiate
+    `Accept: application/zip`. Error responses negotiated to it keep their
+    status and have no body.
+    """
+    media_type = 'application/zip'
+    format = 'zip'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data if isinstance(data, bytes) else b''
+
+
+class BrowsableAPIRenderer(renderers.BrowsableAPIRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timer('render'):
+            return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,136 @@
+"""
+Database router sending safe-method request reads to healthy read replicas
+
+A `use_replicas()` block (one request, under ReplicaRoutingMiddleware)
+reads from a single replica, picked on its first read, so its results
+never mix servers with different lag.
+"""
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import psycopg2
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+_use_replica = ContextVar('use_replica', default=False)
+# The alias chosen for the current use_replicas() block, in a one-item list.
+_chosen_replica = ContextVar('chosen_replica', default=None)
+
+REPLICA_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+@contextmanager
+def use_replicas(enabled=True):
+    """Allow (or forbid) reads inside the block to be served by a replica."""
+    token = _use_replica.set(enabled)
+    chosen = _chosen_replica.set([None])
+    try:
+        yield
+    finally:
+        _chosen_replica.reset(chosen)
+        _use_replica.reset(token)
+
+
+class ReplicaHealth:
+    """Per-process cache of replica lag; unreachable replicas report infinite lag."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checked = {}
+        self.probing = {}
+
+    def _cached(self, alias):
+        interval = getattr(settings, 'DB_REPLICA_CHECK_INTERVAL', 5)
+        with self.lock:
+            cached = self.checked.get(alias)
+            probing = self.probing.setdefault(alias, threading.Lock())
+        fresh = cached is not None and time.monotonic() - cached[0] < interval
+        return cached, fresh, probing
+
+    def lag(self, alias):
+        cached, fresh, probing = self._cached(alias)
+        if fresh:
+            return cached[1]
+        # One thread re-probes; the others keep the last result meanwhile and
+        # only wait when there is none yet.
+        if not probing.acquire(blocking=cached is None):
+            return cached[1]
+        try:
+            cached, fresh, _ = self._cached(alias)
+            if fresh:
+                return cached[1]
+            lag = self.probe(alias)
+            with self.lock:
+                self.checked[alias] = (time.monotonic(), lag)
+            return lag
+        finally:
+            probing.release()
+
+    def probe(self, alias):
+        """Lag of `alias` in seconds, on a connection of its own with a short connect timeout."""
+        params = connections[alias].get_connection_params()
+        params['connect_timeout'] = getattr(settings, 'DB_REPLICA_PROBE_TIMEOUT', 2)
+        try:
+            conn = psycopg2.connect(**params)
+        except psycopg2.Error:
+            return float('inf')
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(REPLICA_LAG_SQL)
+                return float(cursor.fetchone()[0])
+        except psycopg2.Error:
+            return float('inf')
+        finally:
+            conn.close()
+
+    def healthy(self, alias):
+        return self.lag(alias) <= getattr(settings, 'DB_REPLICA_MAX_LAG', 5)
+
+    def reset(self):
+        with self.lock:
+            self.checked.clear()
+
+
+health = ReplicaHealth()
+
+
+class ReplicaRouter:
+
+    def __init__(self):
+        self._round_robin = itertools.count()
+
+    def _replica(self):
+        replicas = [alias for alias in getattr(settings, 'DATABASE_REPLICAS', []) if health.healthy(alias)]
+        if not replicas:
+            return DEFAULT_DB_ALIAS
+        if getattr(settings, 'DB_REPLICA_STRATEGY', 'round_robin') == 'least_lag':
+            return min(replicas, key=health.lag)
+        return replicas[next(self._round_robin) % len(replicas)]
+
+    def db_for_read(self, model, **hints):
+        if not _use_replica.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        chosen = _chosen_replica.get()
+        if chosen[0] is None:
+            chosen[0] = self._replica()
+        return chosen[0]
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
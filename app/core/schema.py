@@ -0,0 +1,174 @@
+"""
+Cache of rendered OpenAPI schemas keyed by code version, format, API version and language.
+
+Only versions in ALLOWED_VERSIONS (or none) and languages in LANGUAGES are
+cached, since both come from query parameters; other requests are rendered
+without caching. Files are named by a hash of the key and the in-memory
+cache holds at most MAX_ENTRIES schemas.
+
+Each entry keeps its compressed variants (core.compression) alongside the
+plain bytes, in memory and on disk, so they are produced once per version.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils import translation
+from django.utils.cache import patch_vary_headers
+
+from rest_framework.settings import api_settings
+
+from drf_spectacular.views import SpectacularAPIView
+
+from core import compression
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    """APP_VERSION if deployed with one, else a fingerprint of the project's Python sources."""
+    if getattr(settings, 'APP_VERSION', None):
+        return settings.APP_VERSION
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(settings.BASE_DIR):
+        dirs[:] = sorted(d for d in dirs if not d.startswith(('.', '__')))
+        for name in sorted(files):
+            if name.endswith('.py'):
+                stat = os.stat(os.path.join(root, name))
+                digest.update(f'{root}/{name}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return digest.hexdigest()[:16]
+
+
+def etag(content):
+    return '"' + hashlib.sha256(content).hexdigest()[:32] + '"'
+
+
+class SchemaCache:
+
+    MAX_ENTRIES = 32
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def cacheable(api_version=None, language=None):
+        """Whether the version and language are ones the API serves, not arbitrary request input."""
+        if api_version is not None and api_version not in (api_settings.ALLOWED_VERSIONS or ()):
+            return False
+        languages = {code for code, _ in settings.LANGUAGES} | {settings.LANGUAGE_CODE}
+        return language is None or language in languages
+
+    @staticmethod
+    def key(fmt, api_version=None, language=None):
+        return '-'.join([code_version(), fmt, api_version or 'default', language or 'default'])
+
+    @staticmethod
+    def _path(key):
+        directory = getattr(settings, 'SCHEMA_CACHE_DIR', None)
+        if not directory:
+            return None
+        return os.path.join(directory, hashlib.sha256(key.encode()).hexdigest()[:32] + '.schema')
+
+    def get(self, key):
+        """Return (content, etag, variants by coding) from memory, then disk, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is not None:
+            return entry
+        path = self._path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        with open(path, 'rb') as fh:
+            content = fh.read()
+        variants = {}
+        for coding in compression.ENCODERS:
+            if os.path.exists(f'{path}.{coding}'):
+                with open(f'{path}.{coding}', 'rb') as fh:
+                    variants[coding] = fh.read()
+        if len(variants) < len(compression.ENCODERS):
+            # Written by a build without some codings; fill them in once.
+            variants = {**compression.encode_all(content), **variants}
+            self._write_variants(path, variants)
+        return self._remember(key, content, variants)
+
+    def set(self, key, content):
+        path = self._path(key)
+        variants = compression.encode_all(content)
+        if path is not None:
+            self._write(path, content)
+            self._write_variants(path, variants)
+        return self._remember(key, content, variants)
+
+    @staticmethod
+    def _write(path, content):
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as fh:
+                fh.write(content)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
+
+    def _write_variants(self, path, variants):
+        for coding, data in variants.items():
+            if not os.path.exists(f'{path}.{coding}'):
+                self._write(f'{path}.{coding}', data)
+
+    def _remember(self, key, content, variants):
+        entry = (content, etag(content), variants)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.MAX_ENTRIES:
+                self.entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+schema_cache = SchemaCache()
+
+
+class CachedSpectacularAPIView(SpectacularAPIView):
+    """Serve the OpenAPI schema generated once per code version, format and language."""
+
+    def _get_schema_response(self, request):
+        version = self.api_version or request.version or self._get_version_parameter(request)
+        renderer = request.accepted_renderer
+        language = translation.get_language()
+
+        if schema_cache.cacheable(version, language):
+            key = schema_cache.key(renderer.format, version, language)
+            entry = schema_cache.get(key)
+            if entry is None:
+                entry = schema_cache.set(key, self._render(request, renderer))
+        else:
+            content = self._render(request, renderer)
+            entry = (content, etag(content), {})
+        content, tag, variants = entry
+        coding = compression.negotiate(request.headers.get('Accept-Encoding'), variants)
+
+        if tag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+            response['ETag'] = f'W/{tag}' if coding else tag
+        else:
+            response = HttpResponse(variants[coding] if coding else content, content_type=request.accepted_media_type)
+            response['Content-Disposition'] = f'inline; filename="{self._get_filename(request, version)}"'
+            response['ETag'] = tag
+            if coding:
+                compression.set_encoding(response, coding)
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def _render(self, request, renderer):
+        response = super()._get_schema_response(request)
+        return renderer.render(response.data, request.accepted_media_type, self.get_renderer_context())
@@ -0,0 +1,31 @@
+import uuid
+
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Ingredient, Recipe, Tag
+
+
+def similarity_version_key(user_id):
+    return f'similarity-version:{user_id}'
+
+
+def invalidate_similarity(user_id):
+    """Stamp a new version so every worker rebuilds the user's similarity index."""
+    cache.set(similarity_version_key(user_id), uuid.uuid4().hex, None)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_similarity_on_change(sender, instance, **kwargs):
+    invalidate_similarity(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def invalidate_similarity_on_m2m_change(sender, instance, action, **kwargs):
+    if action.startswith('post_'):
+        invalidate_similarity(instance.user_id)
@@ -0,0 +1,122 @@
+"""
+Per-user inverted index over recipe tags and ingredients for "similar recipes".
+
+Similarity is weighted Jaccard: shared features over the union of both
+recipes' features, each feature weighted by its inverse document frequency
+within the user's collection so that rare ingredients count for more than
+"Salt". Indexes are built on first use, kept in a small per-process LRU, and
+invalidated through a version stamp in the shared cache that signals bump
+whenever a user's recipes or their tags/ingredients change.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from core.models import Recipe
+from core.signals import similarity_version_key
+
+
+class RecipeIndex:
+
+    def __init__(self, recipe_ids, pairs):
+        """
+        recipe_ids: sorted array of the user's recipe ids
+        pairs: (n, 2) array of (recipe_id, feature code) rows
+        """
+        self.recipe_ids = recipe_ids
+        size = len(recipe_ids)
+        rows = np.searchsorted(recipe_ids, pairs[:, 0])
+        codes = pairs[:, 1]
+
+        # Postings: recipe rows grouped by feature, in CSR form.
+        order = np.lexsort((rows, codes))
+        self.posting_rows = rows[order]
+        self.features, starts, counts = np.unique(codes[order], return_index=True, return_counts=True)
+        self.posting_starts = np.append(starts, len(order))
+        self.idf = np.log1p(size / counts) if size else np.zeros(0)
+
+        # Forward index: features of each recipe, in CSR form.
+        order = np.argsort(rows, kind='stable')
+        self.recipe_features = np.searchsorted(self.features, codes[order])
+        self.recipe_starts = np.searchsorted(rows[order], np.arange(size + 1))
+        self.weight_totals = np.bincount(
+            rows, weights=self.idf[np.searchsorted(self.features, codes)], minlength=size,
+        ) if len(codes) else np.zeros(size)
+
+    @classmethod
+    def build(cls, user_id):
+        recipe_ids = np.fromiter(
+            Recipe.objects.filter(user_id=user_id).order_by('id').values_list('id', flat=True), dtype=np.int64,
+        )
+        tag_pairs = Recipe.tags.through.objects.filter(recipe__user_id=user_id).values_list('recipe_id', 'tag_id')
+        ingredient_pairs = Recipe.ingredients.through.objects.filter(
+            recipe__user_id=user_id,
+        ).values_list('recipe_id', 'ingredient_id')
+        # Tags and ingredients share one feature space: even codes are tags, odd are ingredients.
+        pairs = [(recipe_id, tag_id * 2) for recipe_id, tag_id in tag_pairs.iterator()]
+        pairs += [(recipe_id, ingredient_id * 2 + 1) for recipe_id, ingredient_id in ingredient_pairs.iterator()]
+        return cls(recipe_ids, np.array(pairs, dtype=np.int64).reshape(-1, 2))
+
+    def similar(self, recipe_id, limit=10):
+        """Return [(recipe_id, score)] for the `limit` most similar recipes, best first."""
+        row = np.searchsorted(self.recipe_ids, recipe_id)
+        if row >= len(self.recipe_ids) or self.recipe_ids[row] != recipe_id:
+            return []
+        features = self.recipe_features[self.recipe_starts[row]:self.recipe_starts[row + 1]]
+        if not len(features):
+            return []
+
+        starts = self.posting_starts[features]
+        lengths = self.posting_starts[features + 1] - starts
+        # Gather every posting of the recipe's features in one vectorized step.
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        candidates = self.posting_rows[offsets]
+        shared = np.bincount(
+            candidates, weights=np.repeat(self.idf[features], lengths), minlength=len(self.recipe_ids),
+        )
+        shared[row] = 0
+        union = self.weight_totals[row] + self.weight_totals - shared
+        scores = np.divide(shared, union, out=np.zeros_like(shared), where=shared > 0)
+
+        matches = np.flatnonzero(scores)
+        if len(matches) > limit:
+            matches = matches[np.argpartition(-scores[matches], limit - 1)[:limit]]
+        matches = matches[np.lexsort((self.recipe_ids[matches], -scores[matches]))]
+        return [(int(self.recipe_ids[i]), round(float(scores[i]), 4)) for i in matches]
+
+
+class IndexCache:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.indexes = OrderedDict()
+
+    def get(self, user_id):
+        version = cache.get(similarity_version_key(user_id))
+        key = (user_id, version)
+        with self.lock:
+            index = self.indexes.get(user_id)
+            if index is not None and index[0] == key:
+                self.indexes.move_to_end(user_id)
+                return index[1]
+        built = RecipeIndex.build(user_id)
+        with self.lock:
+            self.indexes[user_id] = (key, built)
+            self.indexes.move_to_end(user_id)
+            while len(self.indexes) > getattr(settings, 'SIMILARITY_INDEX_CACHE_SIZE', 64):
+                self.indexes.popitem(last=False)
+        return built
+
+    def clear(self):
+        with self.lock:
+            self.indexes.clear()
+
+
+index_cache = IndexCache()
+
+
+def similar_recipes(user_id, recipe_id, limit=10):
+    return index_cache.get(user_id).similar(recipe_id, limit)
@@ -0,0 +1,173 @@
+"""
+Incremental maintenance of the per-user RecipeStats summary.
+
+Writers lock the user's summary row for the duration of their transaction
+(`tracking`), snapshot the recipe before and after the change and apply the
+difference, so reading the stats never scans the user's recipes.
+
+Only writes that go through `tracking` keep the summary current: the API,
+the bulk endpoints and the admin do; other ORM or SQL writes to recipes
+don't, and `manage.py rebuild_recipe_stats` recomputes the summaries
+after them (or on a schedule, if such writes are routine).
+"""
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from core.models import Recipe, RecipeStats
+
+
+PRICE_BUCKETS = (Decimal('5'), Decimal('10'), Decimal('20'), Decimal('50'))
+
+
+def price_bucket(price):
+    for index, bound in enumerate(PRICE_BUCKETS):
+        if price < bound:
+            return index
+    return len(PRICE_BUCKETS)
+
+
+def snapshot(recipe):
+    """The parts of a recipe the summary depends on."""
+    return {
+        'time_minutes': recipe.time_minutes,
+        'price': Decimal(recipe.price),
+        'tag_ids': [tag.id for tag in recipe.tags.all()],
+        'ingredient_ids': [ingredient.id for ingredient in recipe.ingredients.all()],
+    }
+
+
+def _bump(counts, ids, sign):
+    for pk in ids:
+        key = str(pk)
+        value = counts.get(key, 0) + sign
+        if value > 0:
+            counts[key] = value
+        else:
+            counts.pop(key, None)
+
+
+def apply(stats, recipe_snapshot, sign):
+    """Add (sign=1) or remove (sign=-1) one recipe snapshot from the summary."""
+    if not stats.price_histogram:
+        stats.price_histogram = [0] * (len(PRICE_BUCKETS) + 1)
+    stats.recipe_count += sign
+    stats.time_minutes_sum += sign * recipe_snapshot['time_minutes']
+    stats.price_sum += sign * recipe_snapshot['price']
+    stats.price_histogram[price_bucket(recipe_snapshot['price'])] += sign
+    _bump(stats.tag_counts, recipe_snapshot['tag_ids'], sign)
+    _bump(stats.ingredient_counts, recipe_snapshot['ingredient_ids'], sign)
+
+
+def summarize(recipes):
+    """Totals of a recipe queryset in the summary's terms, from aggregate queries."""
+    totals = recipes.aggregate(
+        recipe_count=Count('id'),
+        time_minutes_sum=Sum('time_minutes'),
+        price_sum=Sum('price'),
+        **{
+            f'bucket_{index}': Count('id', filter=_bucket_filter(index))
+            for index in range(len(PRICE_BUCKETS) + 1)
+        },
+    )
+    recipe_ids = recipes.values('id')
+    tag_counts = Recipe.tags.through.objects.filter(recipe_id__in=recipe_ids).values('tag_id').annotate(n=Count('id'))
+    ingredient_counts = Recipe.ingredients.through.objects.filter(
+        recipe_id__in=recipe_ids,
+    ).values('ingredient_id').annotate(n=Count('id'))
+    return {
+        'recipe_count': totals['recipe_count'],
+        'time_minutes_sum': totals['time_minutes_sum'] or 0,
+        'price_sum': totals['price_sum'] or 0,
+        'price_histogram': [totals[f'bucket_{index}'] for index in range(len(PRICE_BUCKETS) + 1)],
+        'tag_counts': {str(row['tag_id']): row['n'] for row in tag_counts},
+        'ingredient_counts': {str(row['ingredient_id']): row['n'] for row in ingredient_counts},
+    }
+
+
+def apply_summary(stats, summary, sign):
+    """Add (sign=1) or remove (sign=-1) the totals of many recipes at once."""
+    if not stats.price_histogram:
+        stats.price_histogram = [0] * (len(PRICE_BUCKETS) + 1)
+    stats.recipe_count += sign * summary['recipe_count']
+    stats.time_minutes_sum += sign * summary['time_minutes_sum']
+    stats.price_sum += sign * summary['price_sum']
+    stats.price_histogram = [
+        count + sign * delta for count, delta in zip(stats.price_histogram, summary['price_histogram'])
+    ]
+    for field in ('tag_counts', 'ingredient_counts'):
+        counts = getattr(stats, field)
+        for key, n in summary[field].items():
+            value = counts.get(key, 0) + sign * n
+            if value > 0:
+                counts[key] = value
+            else:
+                counts.pop(key, None)
+
+
+def compute(user):
+    """Build a user's summary from scratch with aggregate queries."""
+    user_id = getattr(user, 'pk', user)
+    return RecipeStats(user_id=user_id, **summarize(Recipe.objects.filter(user_id=user_id)))
+
+
+def _bucket_filter(index):
+    condition = Q()
+    if index > 0:
+        condition &= Q(price__gte=PRICE_BUCKETS[index - 1])
+    if index < len(PRICE_BUCKETS):
+        condition &= Q(price__lt=PRICE_BUCKETS[index])
+    return condition
+
+
+SUMMARY_FIELDS = ('recipe_count', 'time_minutes_sum', 'price_sum', 'price_histogram', 'tag_counts', 'ingredient_counts')
+
+
+def _locked(user):
+    """Lock the user's summary row, first creating it from scratch if there is none. Needs a transaction."""
+    user_id = getattr(user, 'pk', user)
+    stats = RecipeStats.objects.select_for_update().filter(user_id=user_id).first()
+    if stats is None:
+        # Concurrent first writers both get here: the loser's insert waits for
+        # the winner's transaction and is dropped, and it locks the winner's row.
+        RecipeStats.objects.bulk_create([compute(user_id)], ignore_conflicts=True)
+        stats = RecipeStats.objects.select_for_update().get(user_id=user_id)
+    return stats
+
+
+def rebuild(user):
+    """Recompute the user's summary under its row lock, so no tracked delta is lost."""
+    with transaction.atomic():
+        stats = _locked(user)
+        fresh = compute(user)
+        for field in SUMMARY_FIELDS:
+            setattr(stats, field, getattr(fresh, field))
+        stats.save()
+    return stats
+
+
+def get_stats(user):
+    """Return the user's summary, building it on first use."""
+    stats = RecipeStats.objects.filter(user=user).first()
+    return stats if stats is not None else rebuild(user)
+
+
+@contextmanager
+def tracking(user):
+    """
+    Open a transaction holding a lock on the user's summary row and yield it;
+    deltas applied inside the block are saved with the recipe changes.
+    """
+    with transaction.atomic():
+        # A missing row is summarized from the state before this change; the
+        # caller applies its delta.
+        stats = _locked(user)
+        yield stats
+        stats.save()
+
+
+def forget(stats, field, pk):
+    """Drop a deleted tag ('tag_counts') or ingredient ('ingredient_counts') from the summary."""
+    getattr(stats, field).pop(str(pk), None)
@@ -1,8 +1,17 @@
+import io
+
 import pytest
+from decimal import Decimal
+from PIL import Image
 
 from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from core import models, stats
+
 
 pytestmark = pytest.mark.django_db
 
@@ -39,4 +48,129 @@ class TestAdminSite:
     def test_create_user_page(self, admin_and_user, client):
         url = reverse('admin:core_user_add')
         res = client.get(url)
-        assert res.status_code == 200
\ No newline at end of file
+        assert res.status_code == 200
+
+
+@pytest.fixture
+def kitchen(admin_and_user):
+    _, user = admin_and_user
+    tags = [models.Tag.objects.create(user=user, name=f'Tag {i}') for i in range(30)]
+    ingredients = [models.Ingredient.objects.create(user=user, name=f'Ingredient {i}') for i in range(30)]
+    for i in range(30):
+        recipe = models.Recipe.objects.create(
+            user=user, title=f'Recipe {i}', time_minutes=10, price=Decimal('5.00'),
+        )
+        recipe.tags.add(tags[i])
+        recipe.ingredients.add(ingredients[i])
+    return user
+
+
+def image_upload():
+    buffer = io.BytesIO()
+    Image.new('RGB', (10, 10)).save(buffer, format='JPEG')
+    return SimpleUploadedFile('recipe.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+def analyze(model):
+    with connection.cursor() as cursor:
+        cursor.execute(f'ANALYZE {model._meta.db_table}')
+
+
+class TestLargeTableAdmin:
+
+    @pytest.mark.parametrize('model', ['recipe', 'tag', 'ingredient'])
+    def test_changelist_does_not_query_per_row(self, kitchen, client, model):
+        with CaptureQueriesContext(connection) as queries:
+            res = client.get(reverse(f'admin:core_{model}_changelist'))
+
+        assert res.status_code == 200
+        assert len(queries) <= 6
+        assert not any('COUNT(*)' in q['sql'] and 'LIMIT' not in q['sql'] for q in queries.captured_queries)
+
+    def test_recipe_form_uses_autocomplete(self, kitchen, client):
+        recipe = models.Recipe.objects.filter(user=kitchen).first()
+        other_tag = models.Tag.objects.exclude(recipe=recipe).first()
+
+        res = client.get(reverse('admin:core_recipe_change', args=[recipe.id]))
+
+        content = res.content.decode()
+        assert res.status_code == 200
+        assert 'admin-autocomplete' in content
+        assert recipe.tags.get().name in content
+        assert other_tag.name not in content
+
+    def test_autocomplete_searches_by_prefix(self, kitchen, client):
+        res = client.get(reverse('admin:autocomplete'), {
+            'app_label': 'core', 'model_name': 'recipe', 'field_name': 'tags', 'term': 'Tag 2',
+        })
+
+        names = {result['text'] for result in res.json()['results']}
+        assert res.status_code == 200
+        assert names == {'Tag 2'} | {f'Tag {i}' for i in range(20, 30)}
+
+    def test_changelist_count_uses_table_estimate(self, kitchen, client, settings):
+        settings.COUNT_ESTIMATE_THRESHOLD = 10
+        analyze(models.Recipe)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = client.get(reverse('admin:core_recipe_changelist'))
+
+        assert res.status_code == 200
+        assert '30 recipes' in res.content.decode()
+        assert not any('COUNT(*)' in q['sql'] for q in queries.captured_queries)
+
+    def test_user_delete_is_scheduled(self, kitchen, client):
+        url = reverse('admin:core_user_delete', args=[kitchen.id])
+
+        confirm = client.get(url)
+        res = client.post(url, {'post': 'yes'})
+
+        kitchen.refresh_from_db()
+        assert confirm.status_code == 200
+        assert res.status_code == 302
+        assert kitchen.is_active is False
+        assert models.UserDeletion.objects.filter(user_id=kitchen.id).exists()
+
+
+class TestRecipeAdminStats:
+
+    def assert_stats_current(self, user):
+        stored = models.RecipeStats.objects.get(user=user)
+        fresh = stats.compute(user)
+        for field in stats.SUMMARY_FIELDS:
+            assert getattr(stored, field) == getattr(fresh, field), field
+
+    def test_add_and_change_keep_stats_current(self, kitchen, client, settings, tmp_path):
+        settings.MEDIA_ROOT = str(tmp_path)
+        stats.rebuild(kitchen)
+        tag, other_tag = models.Tag.objects.filter(user=kitchen)[:2]
+        ingredient = models.Ingredient.objects.filter(user=kitchen).first()
+        form = {
+            'user': kitchen.id, 'title': 'Admin recipe', 'time_minutes': 15, 'price': '12.00',
+            'tags': [tag.id], 'ingredients': [ingredient.id],
+        }
+
+        res = client.post(reverse('admin:core_recipe_add'), {**form, 'image': image_upload()})
+        assert res.status_code == 302
+        self.assert_stats_current(kitchen)
+
+        recipe = models.Recipe.objects.get(title='Admin recipe')
+        res = client.post(reverse('admin:core_recipe_change', args=[recipe.id]), {
+            **form, 'price': '60.00', 'tags': [other_tag.id],
+        })
+        assert res.status_code == 302
+        self.assert_stats_current(kitchen)
+
+    def test_deletes_keep_stats_current(self, kitchen, client):
+        stats.rebuild(kitchen)
+        recipes = list(models.Recipe.objects.filter(user=kitchen).order_by('id')[:3])
+        tag = recipes[0].tags.get()
+
+        client.post(reverse('admin:core_recipe_delete', args=[recipes[0].id]), {'post': 'yes'})
+        client.post(reverse('admin:core_recipe_changelist'), {
+            'action': 'delete_selected', 'post': 'yes', '_selected_action': [recipe.id for recipe in recipes[1:]],
+        })
+        client.post(reverse('admin:core_tag_delete', args=[tag.id]), {'post': 'yes'})
+
+        assert models.Recipe.objects.filter(user=kitchen).count() == 27
+        self.assert_stats_current(kitchen)
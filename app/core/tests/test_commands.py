@@ -1,10 +1,20 @@
 import pytest
+from io import StringIO
 from psycopg2 import OperationalError as Psycopg2Error
 
 from unittest.mock import patch
 
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.db.utils import OperationalError
+from django.utils import timezone
+
+from core import deletion
+from core.models import Job, Recipe, RecipeStats, Tag, Tombstone, UserDeletion
 
 pytestmark = pytest.mark.django_db
 
@@ -28,4 +38,107 @@ class TestCommand:
 
         assert patched_check.call_count == 6
 
-        patched_check.assert_called_with(databases=['default'])
\ No newline at end of file
+        patched_check.assert_called_with(databases=['default'])
+
+    @patch('core.management.commands.wait_for_db.random.uniform', side_effect=lambda low, high: high)
+    @patch('core.management.commands.wait_for_db.Command.check')
+    @patch('time.sleep')
+    def test_wait_for_db_backs_off_exponentially(self, patched_sleep, patched_check, patched_uniform):
+        patched_check.side_effect = [OperationalError] * 5 + [True]
+
+        call_command('wait_for_db', initial_delay=1, max_delay=4)
+
+        delays = [c.args[0] for c in patched_sleep.call_args_list]
+        assert delays == [1, 2, 4, 4, 4]
+
+    @patch('core.management.commands.wait_for_db.Command.check')
+    @patch('time.sleep')
+    def test_wait_for_db_gives_up_at_deadline(self, patched_sleep, patched_check):
+        patched_check.side_effect = OperationalError
+
+        with pytest.raises(CommandError):
+            call_command('wait_for_db', timeout=0.001, initial_delay=1)
+
+    @patch('core.management.commands.wait_for_db.unapplied_migrations')
+    @patch('core.management.commands.wait_for_db.Command.check')
+    @patch('time.sleep')
+    def test_wait_for_db_waits_for_migrations(self, patched_sleep, patched_check, patched_pending):
+        patched_pending.side_effect = [['core.0006_example'], []]
+
+        call_command('wait_for_db', check_migrations=True)
+
+        assert patched_pending.call_count == 2
+        assert patched_sleep.call_count == 1
+
+    @patch('core.management.commands.wait_for_db.unapplied_migrations')
+    @patch('core.management.commands.wait_for_db.Command.check')
+    @patch('time.sleep')
+    def test_wait_for_db_retries_when_migration_check_loses_database(
+        self, patched_sleep, patched_check, patched_pending,
+    ):
+        patched_pending.side_effect = [OperationalError('server closed the connection'), []]
+
+        call_command('wait_for_db', check_migrations=True)
+
+        assert patched_pending.call_count == 2
+        assert patched_sleep.call_count == 1
+
+    def test_wait_for_db_checks_real_database_migrations_and_cache(self):
+        call_command('wait_for_db', check_migrations=True, check_cache=True)
+
+    def test_rebuild_recipe_stats(self):
+        user = get_user_model().objects.create_user(email='rebuild@example.com', password='passme123')
+        Recipe.objects.create(user=user, title='Stew', time_minutes=40, price=Decimal('7.50'))
+        RecipeStats.objects.create(user=user, recipe_count=99)
+
+        call_command('rebuild_recipe_stats')
+
+        recipe_stats = RecipeStats.objects.get(user=user)
+        assert recipe_stats.recipe_count == 1
+        assert recipe_stats.time_minutes_sum == 40
+        assert recipe_stats.price_histogram == [0, 1, 0, 0, 0]
+
+    def test_purge_tombstones(self, settings):
+        user = get_user_model().objects.create_user(email='purge@example.com', password='passme123')
+        Recipe.objects.create(user=user, title='Old', time_minutes=5, price=Decimal('1.00')).delete()
+        Recipe.objects.create(user=user, title='New', time_minutes=5, price=Decimal('1.00')).delete()
+        old = Tombstone.objects.order_by('id').first()
+        Tombstone.objects.filter(id=old.id).update(
+            deleted_at=timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS + 1),
+        )
+
+        call_command('purge_tombstones', batch_size=1)
+
+        assert list(Tombstone.objects.values_list('model', flat=True)) == ['recipe']
+        assert not Tombstone.objects.filter(id=old.id).exists()
+
+    def test_process_user_deletions(self):
+        user = get_user_model().objects.create_user(email='leaving@example.com', password='passme123')
+        Recipe.objects.create(user=user, title='Stew', time_minutes=40, price=Decimal('7.50'))
+        deletion.schedule(user)
+
+        call_command('process_user_deletions', batch_size=1)
+
+        assert not get_user_model().objects.filter(id=user.id).exists()
+        assert UserDeletion.objects.get(email='leaving@example.com').stage == 'done'
+
+    @pytest.mark.django_db(transaction=True)
+    def test_run_worker_burst(self):
+        user = get_user_model().objects.create_user(email='worker@example.com', password='passme123')
+        deletion.schedule(user)
+
+        call_command('run_worker', '--burst', '--concurrency', '1', '--poll-interval', '0.01')
+
+        assert not Job.objects.exists()
+        assert not get_user_model().objects.filter(id=user.id).exists()
+
+    def test_dedupe_recipe_attrs(self):
+        user = get_user_model().objects.create_user(email='dupes@example.com', password='passme123')
+        for name in ('Vegan', 'vegan', ' VEGAN'):
+            Tag.objects.create(user=user, name=name)
+        out = StringIO()
+
+        call_command('dedupe_recipe_attrs', '--only', 'tags', stdout=out)
+
+        assert list(Tag.objects.values_list('name', flat=True)) == ['Vegan']
+        assert 'Merged 2 of 3 tags' in out.getvalue()
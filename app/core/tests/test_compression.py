@@ -0,0 +1,157 @@
+import gzip
+import json
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import compression
+from core.models import Recipe
+from core.schema import schema_cache
+
+
+pytestmark = pytest.mark.django_db
+
+RECIPES_URL = reverse('recipe:recipe-list')
+SCHEMA_URL = reverse('api-schema')
+
+
+def decode(response):
+    coding = response.get('Content-Encoding')
+    if coding == 'gzip':
+        return gzip.decompress(response.content)
+    if coding == 'br':
+        return compression.brotli.decompress(response.content)
+    if coding == 'zstd':
+        return compression.zstandard.ZstdDecompressor().decompressobj().decompress(response.content)
+    return response.content
+
+
+@pytest.fixture
+def api_client():
+    user = get_user_model().objects.create_user(email='squeeze@example.com', password='passme123')
+    for i in range(40):
+        Recipe.objects.create(user=user, title=f'Tomato soup {i}', time_minutes=20, price=Decimal('4.50'))
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+class TestNegotiate:
+
+    @pytest.mark.parametrize('header, available, expected', [
+        ('gzip, deflate', None, 'gzip'),
+        ('gzip;q=0.5, br', ['br', 'gzip'], 'br'),
+        ('gzip, br;q=0', ['br', 'gzip'], 'gzip'),
+        ('*', ['br', 'gzip'], 'br'),
+        ('identity', None, None),
+        ('', None, None),
+        ('gzip;q=0', None, None),
+        ('br', {}, None),
+    ])
+    def test_negotiate(self, header, available, expected):
+        assert compression.negotiate(header, available) == expected
+
+
+class TestCompressionMiddleware:
+
+    def middleware(self, response):
+        return compression.CompressionMiddleware(lambda request: response)
+
+    @pytest.mark.parametrize('coding', list(compression.ENCODERS))
+    def test_compresses_recipe_list(self, api_client, coding):
+        plain = api_client.get(RECIPES_URL)
+
+        res = api_client.get(RECIPES_URL, HTTP_ACCEPT_ENCODING=coding)
+
+        assert res['Content-Encoding'] == coding
+        assert int(res['Content-Length']) == len(res.content) < len(plain.content)
+        assert json.loads(decode(res)) == plain.json()
+        assert 'Accept-Encoding' in res['Vary']
+
+    def test_small_responses_left_alone_but_vary(self, settings):
+        settings.COMPRESSION_MIN_SIZE = 1000
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+
+        res = self.middleware(HttpResponse(b'{"a": 1}', content_type='application/json'))(request)
+
+        assert not res.has_header('Content-Encoding')
+        assert res['Vary'] == 'Accept-Encoding'
+
+    @pytest.mark.parametrize('response', [
+        HttpResponse(b'x' * 5000, content_type='image/png'),
+        StreamingHttpResponse(iter([b'x' * 5000]), content_type='application/json'),
+    ])
+    def test_incompressible_and_streamed_responses_pass_through(self, response):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+
+        res = self.middleware(response)(request)
+
+        assert not res.has_header('Content-Encoding')
+        assert not res.has_header('Vary')
+
+    def test_etag_becomes_weak(self):
+        response = HttpResponse(b'a' * 5000, content_type='text/plain')
+        response['ETag'] = '"abc"'
+
+        res = self.middleware(response)(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+
+        assert res['ETag'] == 'W/"abc"'
+
+
+class TestPrecomputedSchemaVariants:
+
+    @pytest.fixture(autouse=True)
+    def schema_dir(self, settings, tmp_path):
+        settings.SCHEMA_CACHE_DIR = str(tmp_path)
+        schema_cache.clear()
+        yield tmp_path
+        schema_cache.clear()
+
+    def test_cached_variants_are_reused(self):
+        client = APIClient()
+        plain = client.get(SCHEMA_URL)
+
+        with patch('core.compression.encode', wraps=compression.encode) as encode:
+            first = client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip')
+            second = client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        encode.assert_not_called()
+        assert first['Content-Encoding'] == 'gzip'
+        assert first.content == second.content
+        assert decode(first) == plain.content
+        assert first['ETag'] == f'W/{plain["ETag"]}'
+        assert 'Accept-Encoding' in first['Vary']
+
+    def test_variants_survive_restart_from_disk(self, schema_dir):
+        APIClient().get(SCHEMA_URL)
+        assert {path.suffix for path in schema_dir.iterdir()} == {'.schema', *(f'.{c}' for c in compression.ENCODERS)}
+        schema_cache.clear()
+
+        with patch('core.compression.encode') as encode:
+            res = APIClient().get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='br, gzip')
+
+        encode.assert_not_called()
+        assert res['Content-Encoding'] == next(iter(compression.ENCODERS))
+
+    def test_not_modified_for_weak_etag(self):
+        client = APIClient()
+        etag = client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+
+        res = client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+
+        assert res.status_code == 304
+        assert res['ETag'] == etag
+
+    def test_uncached_schema_writes_no_variants(self, schema_dir):
+        res = APIClient().get(SCHEMA_URL, {'lang': '../../evil'}, HTTP_ACCEPT_ENCODING='gzip')
+
+        assert res.status_code == 200
+        assert res['Content-Encoding'] == 'gzip'
+        assert not list(schema_dir.iterdir())
+        assert not any(schema_dir.parent.rglob('evil*'))
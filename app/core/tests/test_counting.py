@@ -0,0 +1,66 @@
+import pytest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core import counting
+from core.models import Recipe
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def recipes():
+    user = get_user_model().objects.create_user(email='counting@example.com', password='pass1234')
+    Recipe.objects.bulk_create([
+        Recipe(user=user, title=f'Recipe {i}', time_minutes=i, price=Decimal('5.00'))
+        for i in range(40)
+    ])
+    return Recipe.objects.filter(user=user)
+
+
+class TestEstimateCount:
+
+    def test_exact_below_threshold(self, recipes, settings):
+        settings.COUNT_ESTIMATE_THRESHOLD = 100
+
+        assert counting.estimate_count(recipes) == (40, True)
+        assert counting.estimate_count(recipes.filter(time_minutes__lt=5)) == (5, True)
+
+    def test_estimate_above_threshold(self, recipes, settings):
+        settings.COUNT_ESTIMATE_THRESHOLD = 10
+
+        with CaptureQueriesContext(connection) as queries:
+            count, exact = counting.estimate_count(recipes.filter(time_minutes__gte=5))
+
+        assert exact is False
+        assert count >= 11
+        assert queries[0]['sql'].startswith('EXPLAIN')
+
+    def test_planner_estimate_skips_counting(self, recipes, settings, monkeypatch):
+        settings.COUNT_ESTIMATE_THRESHOLD = 10
+        monkeypatch.setattr(counting, 'plan_estimate', lambda queryset: 5000)
+
+        with CaptureQueriesContext(connection) as queries:
+            assert counting.estimate_count(recipes) == (5000, False)
+        assert len(queries) == 0
+
+    def test_unfiltered_large_table_uses_reltuples(self, recipes, settings):
+        settings.COUNT_ESTIMATE_THRESHOLD = 10
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE core_recipe')
+
+        with CaptureQueriesContext(connection) as queries:
+            assert counting.estimate_count(Recipe.objects.all()) == (40, False)
+        assert len(queries) == 1
+
+    def test_unanalyzed_table_is_counted(self, recipes, settings):
+        settings.COUNT_ESTIMATE_THRESHOLD = 100
+
+        assert counting.estimate_count(Recipe.objects.all()) == (40, True)
+
+    def test_plan_estimate(self, recipes):
+        assert counting.plan_estimate(recipes) >= 1
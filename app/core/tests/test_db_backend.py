@@ -0,0 +1,106 @@
+import gc
+import threading
+import weakref
+
+import pytest
+
+from django.db import connection, connections
+from django.db.utils import OperationalError
+
+from core.backends.postgresql.base import ConnectionPool, DatabaseWrapper, _pools
+
+
+pytestmark = pytest.mark.django_db
+
+
+class FakeConnection:
+    closed = 0
+
+    def get_transaction_status(self):
+        return 0
+
+    def close(self):
+        self.closed = 1
+
+
+class TestConnectionPool:
+
+    def test_idle_connections_are_reused(self):
+        created = []
+        pool = ConnectionPool('test', lambda: created.append(FakeConnection()) or created[-1], 2, health_checks=False)
+
+        conn = pool.acquire()
+        pool.release(conn)
+
+        assert pool.acquire() is conn
+        assert len(created) == 1
+
+    def test_exhausted_pool_raises_after_timeout(self):
+        pool = ConnectionPool('test', FakeConnection, 1, timeout=0.01, health_checks=False)
+        pool.acquire()
+
+        with pytest.raises(OperationalError):
+            pool.acquire()
+
+    def test_waiters_are_served_when_connection_released(self):
+        pool = ConnectionPool('test', FakeConnection, 1, timeout=5, health_checks=False)
+        held = pool.acquire()
+        acquired = []
+        waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+        waiter.start()
+
+        pool.release(held)
+        waiter.join(timeout=5)
+
+        assert acquired == [held]
+
+    def test_closed_connections_are_replaced(self):
+        pool = ConnectionPool('test', FakeConnection, 1, health_checks=False)
+        conn = pool.acquire()
+        conn.close()
+        pool.release(conn)
+
+        assert pool.acquire() is not conn
+
+
+@pytest.mark.django_db(transaction=True)
+class TestPooledWrapper:
+
+    def test_pool_does_not_keep_first_wrapper_alive(self):
+        settings_dict = {**connections['default'].settings_dict, 'POOL': {'MAX_SIZE': 2}}
+        first = DatabaseWrapper(settings_dict, alias='pooled')
+        first.ensure_connection()
+        pooled = first.connection
+        first.close()
+        first_ref = weakref.ref(first)
+        del first
+        gc.collect()
+
+        second = DatabaseWrapper(settings_dict, alias='pooled')
+        try:
+            with second.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                assert cursor.fetchone() == (1,)
+            assert first_ref() is None
+            assert second.connection is pooled
+        finally:
+            second.close()
+            second.pool.close_idle()
+            for key in [key for key in _pools if key[0] == 'pooled']:
+                del _pools[key]
+
+
+@pytest.mark.django_db(transaction=True)
+class TestHealthChecks:
+
+    def test_broken_persistent_connection_is_replaced(self):
+        connection.ensure_connection()
+        broken = connection.connection
+        # Simulate the server dropping the connection between requests.
+        broken.close()
+        connection.close_if_unusable_or_obsolete()
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+            assert cursor.fetchone() == (1,)
+        assert connection.connection is not broken
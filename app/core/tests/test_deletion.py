@@ -0,0 +1,107 @@
+import pytest
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+
+from core import deletion
+from core.models import Ingredient, Recipe, RecipeStats, Tag, Tombstone
+
+
+pytestmark = pytest.mark.django_db
+
+
+def create_kitchen(email, recipes=5):
+    user = get_user_model().objects.create_user(email=email, password='passme123')
+    tags = [Tag.objects.create(user=user, name=f'Tag {i}') for i in range(3)]
+    ingredients = [Ingredient.objects.create(user=user, name=f'Ingredient {i}') for i in range(3)]
+    for i in range(recipes):
+        recipe = Recipe.objects.create(user=user, title=f'Recipe {i}', time_minutes=5, price=Decimal('1.00'))
+        recipe.tags.add(*tags[:2])
+        recipe.ingredients.add(*ingredients)
+    RecipeStats.objects.create(user=user, recipe_count=recipes)
+    return user
+
+
+@pytest.fixture
+def doomed():
+    return create_kitchen('doomed@example.com')
+
+
+@pytest.fixture
+def bystander():
+    return create_kitchen('bystander@example.com', recipes=2)
+
+
+def owned_rows(user):
+    return (
+        Recipe.objects.filter(user=user).count()
+        + Tag.objects.filter(user=user).count()
+        + Ingredient.objects.filter(user=user).count()
+    )
+
+
+class TestUserDeletion:
+
+    def test_schedule_deactivates_immediately(self, doomed):
+        Token.objects.create(user=doomed)
+
+        record = deletion.schedule(doomed)
+
+        doomed.refresh_from_db()
+        assert doomed.is_active is False
+        assert not Token.objects.filter(user=doomed).exists()
+        assert record.stage == 'recipes'
+        assert owned_rows(doomed) == 11
+
+    def test_schedule_is_idempotent(self, doomed):
+        assert deletion.schedule(doomed).id == deletion.schedule(doomed).id
+
+    def test_process_deletes_everything_in_batches(self, doomed, bystander):
+        record = deletion.schedule(doomed)
+
+        with patch.object(deletion, 'step', wraps=deletion.step) as step:
+            result = deletion.process(record.id, limit=2)
+
+        assert result.stage == 'done'
+        assert result.finished_at is not None
+        # 5 recipes, 25 links, 3 tags, 3 ingredients, the user and their stats row.
+        assert result.deleted_rows == 38
+        assert step.call_count > 4
+        assert not get_user_model().objects.filter(id=doomed.id).exists()
+        assert not RecipeStats.objects.filter(user_id=doomed.id).exists()
+        assert not Tombstone.objects.filter(user_id=doomed.id).exists()
+        assert owned_rows(bystander) == 8
+        assert Recipe.objects.get(user=bystander, title='Recipe 0').tags.count() == 2
+
+    def test_resumes_after_crash(self, doomed):
+        record = deletion.schedule(doomed)
+
+        with patch.dict(deletion.STAGE_DELETERS, {'tags': lambda *args: 1 / 0}):
+            with pytest.raises(ZeroDivisionError):
+                deletion.process(record.id, limit=2)
+
+        record.refresh_from_db()
+        assert record.stage == 'tags'
+        assert not Recipe.objects.filter(user=doomed).exists()
+
+        assert deletion.process(record.id, limit=2).stage == 'done'
+        assert owned_rows(doomed) == 0
+
+    def test_finished_deletion_is_not_reprocessed(self, doomed):
+        record = deletion.schedule(doomed)
+        deletion.process(record.id)
+
+        assert deletion.step(record.id) is None
+        assert not deletion.pending().exists()
+
+    def test_recipe_images_removed_after_commit(self, doomed, django_capture_on_commit_callbacks):
+        Recipe.objects.filter(user=doomed, title='Recipe 0').update(image='uploads/recipe/a.jpg')
+        record = deletion.schedule(doomed)
+
+        with patch('core.deletion.default_storage.delete') as delete_file:
+            with django_capture_on_commit_callbacks(execute=True):
+                deletion.process(record.id)
+
+        delete_file.assert_called_once_with('uploads/recipe/a.jpg')
@@ -0,0 +1,42 @@
+from unittest.mock import patch
+
+import pytest
+
+from django.db.utils import OperationalError
+from django.urls import reverse
+
+from core.health import database_probe
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def reset_probe():
+    database_probe.reset()
+    yield
+    database_probe.reset()
+
+
+class TestHealthEndpoints:
+
+    def test_liveness_does_not_touch_database(self, client, django_assert_num_queries):
+        with django_assert_num_queries(0):
+            res = client.get(reverse('health-live'))
+        assert res.status_code == 200
+
+    def test_readiness_probe_result_is_cached(self, client, settings):
+        settings.HEALTH_CHECK_CACHE_SECONDS = 60
+        with patch.object(database_probe, 'probe') as probe:
+            for _ in range(3):
+                res = client.get(reverse('health-ready'))
+
+        assert res.status_code == 200
+        assert probe.call_count == 1
+
+    def test_readiness_reports_database_failure(self, client):
+        with patch.object(database_probe, 'probe', side_effect=OperationalError('down')):
+            res = client.get(reverse('health-ready'))
+
+        assert res.status_code == 503
+        assert res.json()['database'] == 'OperationalError: down'
@@ -0,0 +1,163 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core import deletion, jobs
+from core.models import Job, Recipe
+
+
+pytestmark = pytest.mark.django_db
+
+calls = []
+
+
+@jobs.task
+def record(value):
+    calls.append(value)
+
+
+@jobs.task(max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+def not_a_task():
+    pass
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+
+def claim_one():
+    claimed = jobs.claim('test-worker', 1)
+    assert len(claimed) == 1
+    return claimed[0]
+
+
+class TestQueue:
+
+    def test_enqueue(self):
+        job = jobs.enqueue(record, value=1)
+
+        assert job.name == 'core.tests.test_jobs.record'
+        assert job.kwargs == {'value': 1}
+        assert job.status == Job.QUEUED
+        assert job.max_attempts == 5
+
+    def test_enqueue_by_name(self):
+        assert jobs.enqueue('core.tests.test_jobs.explode').max_attempts == 2
+
+    def test_only_tasks_can_be_enqueued(self):
+        with pytest.raises(ValueError):
+            jobs.enqueue(not_a_task)
+
+    def test_dedupe_key(self):
+        first = jobs.enqueue(record, dedupe_key='same', value=1)
+        second = jobs.enqueue(record, dedupe_key='same', value=2)
+
+        assert first.id == second.id
+        assert Job.objects.count() == 1
+
+        jobs.execute(claim_one())
+        assert jobs.enqueue(record, dedupe_key='same', value=3).id != first.id
+
+    def test_dedupe_retries_when_active_job_finishes_meanwhile(self):
+        first = jobs.enqueue(record, dedupe_key='same', value=1)
+        get = Job.objects.get
+
+        def finish_first(**lookup):
+            Job.objects.filter(id=first.id).delete()
+            return get(**lookup)
+
+        with patch.object(Job.objects, 'get', side_effect=finish_first):
+            second = jobs.enqueue(record, dedupe_key='same', value=2)
+
+        assert second.id != first.id
+        assert list(Job.objects.values_list('kwargs', flat=True)) == [{'value': 2}]
+
+    def test_claim_skips_delayed_and_running_jobs(self):
+        jobs.enqueue(record, delay=60, value=1)
+        due = jobs.enqueue(record, value=2)
+
+        claimed = jobs.claim('test-worker', 5)
+
+        assert [job.id for job in claimed] == [due.id]
+        assert claimed[0].attempts == 1
+        assert Job.objects.get(id=due.id).status == Job.RUNNING
+        assert jobs.claim('other-worker', 5) == []
+
+    def test_success_deletes_job(self):
+        jobs.enqueue(record, value='hello')
+
+        assert jobs.execute(claim_one()) == 'done'
+        assert calls == ['hello']
+        assert not Job.objects.exists()
+
+    def test_failure_retries_with_backoff_then_fails(self, settings):
+        settings.JOB_RETRY_DELAY = 0
+        job = jobs.enqueue(explode)
+
+        assert jobs.execute(claim_one()) == 'retry'
+        job.refresh_from_db()
+        assert job.status == Job.QUEUED
+        assert 'boom' in job.last_error
+
+        assert jobs.execute(claim_one()) == 'failed'
+        job.refresh_from_db()
+        assert job.status == Job.FAILED
+        assert jobs.claim('test-worker', 1) == []
+
+    def test_backoff_grows_and_is_capped(self, settings):
+        settings.JOB_RETRY_DELAY = 1
+        settings.JOB_RETRY_MAX_DELAY = 10
+
+        assert all(0 <= jobs.backoff(1) <= 1 for _ in range(20))
+        assert all(0 <= jobs.backoff(10) <= 10 for _ in range(20))
+
+    def test_expired_lease_is_requeued(self):
+        job = jobs.enqueue(record, value=1)
+        claim_one()
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        assert jobs.requeue_expired() == 1
+        assert claim_one().attempts == 2
+
+    def test_renew_keeps_lease(self):
+        job = jobs.enqueue(record, value=1)
+        claim_one()
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        jobs.renew('test-worker', [job.id])
+
+        assert jobs.requeue_expired() == 0
+
+
+@pytest.mark.django_db(transaction=True)
+class TestWorker:
+
+    def test_burst_runs_all_jobs(self):
+        for value in range(10):
+            jobs.enqueue(record, value=value)
+
+        jobs.Worker(concurrency=3, burst=True, poll_interval=0.01).run()
+
+        assert sorted(calls) == list(range(10))
+        assert not Job.objects.exists()
+
+    def test_user_deletion_runs_as_job(self):
+        user = get_user_model().objects.create_user(email='queued@example.com', password='passme123')
+        Recipe.objects.create(user=user, title='Stew', time_minutes=40, price=Decimal('7.50'))
+        deletion.schedule(user)
+        deletion.schedule(user)
+
+        assert Job.objects.count() == 1
+        jobs.Worker(concurrency=2, burst=True, poll_interval=0.01).run()
+
+        assert not get_user_model().objects.filter(id=user.id).exists()
+        assert not deletion.pending().exists()
@@ -0,0 +1,112 @@
+import pytest
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+
+from core import merge, stats
+from core.models import Ingredient, Recipe, RecipeStats, Tag, Tombstone
+
+
+pytestmark = pytest.mark.django_db
+
+
+def create_user(email):
+    return get_user_model().objects.create_user(email=email, password='passme123')
+
+
+def create_recipe(user, *ingredients):
+    recipe = Recipe.objects.create(user=user, title='Salad', time_minutes=5, price=Decimal('3.00'))
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+@pytest.fixture
+def cook():
+    return create_user('cook@example.com')
+
+
+@pytest.fixture
+def pantry(cook):
+    names = ['Tomato', 'tomato ', 'Tomatoes', 'Red  onion', 'red onion', 'Asparagus', 'Basil']
+    return {name: Ingredient.objects.create(user=cook, name=name) for name in names}
+
+
+class TestDedupe:
+
+    def test_merges_normalized_names_into_oldest(self, cook, pantry):
+        salad = create_recipe(cook, pantry['tomato '], pantry['Tomatoes'], pantry['red onion'])
+        sauce = create_recipe(cook, pantry['Tomato'], pantry['Tomatoes'], pantry['Basil'])
+
+        before, removed, moved = merge.dedupe(Ingredient)
+
+        assert (before, removed) == (7, 3)
+        assert sorted(Ingredient.objects.filter(user=cook).values_list('name', flat=True)) == [
+            'Asparagus', 'Basil', 'Red  onion', 'Tomato',
+        ]
+        assert set(salad.ingredients.values_list('name', flat=True)) == {'Tomato', 'Red  onion'}
+        assert set(sauce.ingredients.values_list('name', flat=True)) == {'Tomato', 'Basil'}
+        assert moved == 2
+        assert Tombstone.objects.filter(model='ingredient').count() == 3
+
+    def test_plural_only_folds_onto_existing_singular(self, cook):
+        Ingredient.objects.create(user=cook, name='Peas')
+        Ingredient.objects.create(user=cook, name='Grapes')
+        Ingredient.objects.create(user=cook, name='Grape')
+
+        merge.dedupe(Ingredient)
+
+        assert sorted(Ingredient.objects.values_list('name', flat=True)) == ['Grapes', 'Peas']
+
+    def test_users_are_deduped_separately(self, cook, pantry):
+        other = create_user('other@example.com')
+        theirs = Ingredient.objects.create(user=other, name='TOMATO')
+
+        merge.dedupe(Ingredient, user_ids=[cook.id])
+
+        assert Ingredient.objects.filter(id=theirs.id).exists()
+        assert not Ingredient.objects.filter(user=cook, name='Tomatoes').exists()
+
+    def test_dry_run_changes_nothing(self, cook, pantry):
+        create_recipe(cook, pantry['Tomatoes'])
+
+        before, removed, moved = merge.dedupe(Ingredient, dry_run=True)
+
+        assert (removed, moved) == (3, 1)
+        assert Ingredient.objects.count() == 7
+
+    def test_drops_stale_stats_summaries(self, cook, pantry):
+        create_recipe(cook, pantry['Tomatoes'])
+        stats.rebuild(cook)
+
+        merge.dedupe(Ingredient)
+
+        assert not RecipeStats.objects.filter(user=cook).exists()
+        assert stats.get_stats(cook).ingredient_counts == {str(pantry['Tomato'].id): 1}
+
+
+class TestMerge:
+
+    def test_merges_chosen_duplicates(self, cook, django_capture_on_commit_callbacks):
+        keep, dup = Tag.objects.create(user=cook, name='Dinner'), Tag.objects.create(user=cook, name='Supper')
+        both = Recipe.objects.create(user=cook, title='Stew', time_minutes=5, price=Decimal('3.00'))
+        both.tags.add(keep, dup)
+        Recipe.objects.create(user=cook, title='Soup', time_minutes=5, price=Decimal('3.00')).tags.add(dup)
+        stats.rebuild(cook)
+
+        with patch('core.merge.invalidate_similarity') as invalidate:
+            with django_capture_on_commit_callbacks(execute=True):
+                merged = merge.merge(Tag, cook, keep.id, [dup.id])
+
+        assert merged == [dup.id]
+        assert list(Tag.objects.filter(user=cook)) == [keep]
+        assert keep.recipe_set.count() == 2
+        assert RecipeStats.objects.get(user=cook).tag_counts == stats.compute(cook).tag_counts
+        invalidate.assert_called_once_with(cook.id)
+
+    def test_ignores_other_users_ids(self, cook):
+        keep = Tag.objects.create(user=cook, name='Dinner')
+        theirs = Tag.objects.create(user=create_user('other@example.com'), name='Dinner')
+
+        assert merge.merge(Tag, cook, keep.id, [theirs.id, keep.id]) == []
+        assert Tag.objects.filter(id=theirs.id).exists()
@@ -0,0 +1,123 @@
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.metrics import DB_CONNECTIONS, Registry, registry
+
+
+pytestmark = pytest.mark.django_db
+
+METRICS_URL = reverse('metrics')
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    registry.reset()
+    yield
+    registry.reset()
+
+
+class TestRegistry:
+
+    def test_histogram_buckets_are_cumulative(self):
+        local = Registry()
+        histogram = local.histogram('latency_seconds', 'Latency.', ['view'], buckets=(0.1, 1.0))
+        histogram.observe(0.05, view='a')
+        histogram.observe(0.5, view='a')
+        histogram.observe(5, view='a')
+
+        text = local.render()
+
+        assert '# TYPE latency_seconds histogram' in text
+        assert 'latency_seconds_bucket{view="a",le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{view="a",le="1.0"} 2' in text
+        assert 'latency_seconds_bucket{view="a",le="+Inf"} 3' in text
+        assert 'latency_seconds_count{view="a"} 3' in text
+        assert 'latency_seconds_sum{view="a"} 5.55' in text
+
+    def test_snapshots_are_merged_across_workers(self, tmp_path):
+        local = Registry(directory=str(tmp_path), flush_interval=0)
+        counter = local.counter('jobs_total', 'Jobs.', ['kind'])
+        gauge = local.gauge('busy', 'Busy workers.')
+        counter.inc(2, kind='export')
+        gauge.set(1)
+        dead_pid = 2 ** 22 + 1
+        with open(os.path.join(tmp_path, f'metrics_{dead_pid}.json'), 'w') as fh:
+            json.dump({'jobs_total': [[[['kind', 'export']], 3]], 'busy': [[[], 4]]}, fh)
+
+        text = local.render()
+
+        assert 'jobs_total{kind="export"} 5' in text
+        assert 'busy 1' in text
+
+    def test_dead_worker_snapshots_are_archived(self, tmp_path):
+        local = Registry(directory=str(tmp_path), flush_interval=0)
+        counter = local.counter('jobs_total', 'Jobs.', ['kind'])
+        counter.inc(1, kind='export')
+        for dead_pid in (2 ** 22 + 1, 2 ** 22 + 2):
+            with open(os.path.join(tmp_path, f'metrics_{dead_pid}.json'), 'w') as fh:
+                json.dump({'jobs_total': [[[['kind', 'export']], 3]]}, fh)
+
+        first = local.render()
+        second = local.render()
+
+        assert 'jobs_total{kind="export"} 7' in first
+        assert first == second
+        assert {path.name for path in tmp_path.glob('metrics_*.json')} == {
+            'metrics_archive.json', f'metrics_{os.getpid()}.json',
+        }
+
+    def test_crash_before_deleting_dead_snapshots_does_not_double_count(self, tmp_path):
+        local = Registry(directory=str(tmp_path), flush_interval=0)
+        local.counter('jobs_total', 'Jobs.', ['kind'])
+        with open(os.path.join(tmp_path, f'metrics_{2 ** 22 + 1}.json'), 'w') as fh:
+            json.dump({'jobs_total': [[[['kind', 'export']], 3]]}, fh)
+
+        with patch('core.metrics.os.unlink', side_effect=OSError), pytest.raises(OSError):
+            local.render()
+        text = local.render()
+
+        assert 'jobs_total{kind="export"} 3' in text
+        assert not list(tmp_path.glob('dead_*'))
+
+    def test_label_values_are_escaped(self):
+        local = Registry()
+        local.counter('hits_total', 'Hits.', ['path']).inc(path='a\\b"c\nd')
+
+        assert 'hits_total{path="a\\\\b\\"c\\nd"} 1' in local.render()
+
+
+class TestMetricsEndpoint:
+
+    def test_requests_labelled_by_view_action(self):
+        user = get_user_model().objects.create_user(email='metrics@example.com', password='passme123')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        client.get(reverse('recipe:recipe-list'))
+
+        res = client.get(METRICS_URL)
+
+        assert res.status_code == 200
+        assert res['Content-Type'].startswith('text/plain')
+        body = res.content.decode()
+        assert 'http_requests_total{view="RecipeViewSet.list",method="GET",status="200"} 1' in body
+        assert 'http_request_duration_seconds_bucket{view="RecipeViewSet.list"' in body
+
+    def test_connection_gauge_follows_open_and_close(self):
+        conn = connections.create_connection('default')
+        before = DB_CONNECTIONS.values.get((('alias', 'default'),), 0)
+
+        conn.ensure_connection()
+        opened = DB_CONNECTIONS.values[(('alias', 'default'),)]
+        conn.close()
+
+        assert opened == before + 1
+        assert DB_CONNECTIONS.values[(('alias', 'default'),)] == before
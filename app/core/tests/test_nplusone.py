@@ -0,0 +1,65 @@
+import pytest
+
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory
+
+from core.models import Tag
+from core.nplusone import NPlusOneError, NPlusOneMiddleware, fingerprint, track_queries
+
+
+pytestmark = pytest.mark.django_db
+
+
+class TestFingerprint:
+
+    def test_literals_are_normalized(self):
+        a = fingerprint("SELECT * FROM core_tag WHERE id = 12 AND name = 'x'")
+        b = fingerprint("SELECT *  FROM core_tag WHERE id = 7 AND name = 'it''s'")
+        assert a == b == 'SELECT * FROM core_tag WHERE id = ? AND name = ?'
+
+    def test_in_lists_of_any_length_match(self):
+        a = fingerprint('SELECT * FROM core_tag WHERE id IN (%s, %s)')
+        b = fingerprint('SELECT * FROM core_tag WHERE id IN (%s, %s, %s, %s)')
+        assert a == b
+
+
+class TestDetector:
+
+    def test_repeated_shape_is_flagged_with_stack(self):
+        user = get_user_model().objects.create_user(email='n1@example.com', password='passme123')
+        tags = [Tag.objects.create(user=user, name=f'Tag {i}') for i in range(4)]
+
+        with track_queries(threshold=2) as tracker:
+            for tag in tags:
+                Tag.objects.get(id=tag.id)
+
+        assert len(tracker.violations) == 1
+        report = tracker.report()
+        assert '4 executions' in report
+        assert 'test_nplusone.py' in report
+
+    def test_middleware_raises_in_raise_mode(self, settings):
+        settings.NPLUSONE_MODE = 'raise'
+        settings.NPLUSONE_THRESHOLD = 1
+        user = get_user_model().objects.create_user(email='n1@example.com', password='passme123')
+
+        def view(request):
+            for _ in range(3):
+                Tag.objects.filter(user=user).exists()
+
+        middleware = NPlusOneMiddleware(view)
+        with pytest.raises(NPlusOneError):
+            middleware(RequestFactory().get('/'))
+
+    def test_middleware_logs_in_log_mode(self, settings, caplog):
+        settings.NPLUSONE_MODE = 'log'
+        settings.NPLUSONE_THRESHOLD = 1
+        user = get_user_model().objects.create_user(email='n1@example.com', password='passme123')
+
+        def view(request):
+            for _ in range(3):
+                Tag.objects.filter(user=user).exists()
+            return 'ok'
+
+        assert NPlusOneMiddleware(view)(RequestFactory().get('/')) == 'ok'
+        assert 'N+1 query in GET /' in caplog.text
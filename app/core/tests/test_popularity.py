@@ -0,0 +1,129 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from core import deletion, popularity
+from core.models import Recipe, RecipePopularity
+from recipe import bulk
+
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user(email='popular@example.com', password='passme123')
+
+
+@pytest.fixture
+def recipes(user):
+    return [
+        Recipe.objects.create(user=user, title=f'Recipe {i}', time_minutes=5, price=Decimal('1.00'))
+        for i in range(3)
+    ]
+
+
+def scores():
+    return dict(RecipePopularity.objects.values_list('recipe_id', 'score'))
+
+
+class TestFlushCounts:
+
+    def test_upsert_adds_views(self, recipes):
+        now = timezone.now()
+        popularity.flush_counts({recipes[0].id: 3}, now)
+        popularity.flush_counts({recipes[0].id: 1, recipes[1].id: 1}, now)
+
+        rows = {row.recipe_id: row for row in RecipePopularity.objects.all()}
+        assert rows[recipes[0].id].views == 4
+        assert rows[recipes[0].id].score == pytest.approx(popularity.worth(now) + 2)
+        assert rows[recipes[1].id].score == pytest.approx(popularity.worth(now))
+
+    def test_recent_views_outweigh_older_ones(self, recipes, settings):
+        settings.POPULARITY_HALF_LIFE_DAYS = 1
+        start = timezone.now()
+        popularity.flush_counts({recipes[0].id: 4, recipes[1].id: 1}, start)
+        popularity.flush_counts({recipes[1].id: 1}, start + timedelta(days=3))
+
+        ranked = sorted(scores(), key=scores().get, reverse=True)
+
+        assert ranked == [recipes[1].id, recipes[0].id]
+
+    def test_deleted_recipes_are_skipped(self, recipes):
+        gone = recipes[2].id
+        recipes[2].delete()
+
+        assert popularity.flush_counts({gone: 1, recipes[0].id: 1}) == 1
+        assert list(scores()) == [recipes[0].id]
+
+
+class TestViewCounter:
+
+    def test_counts_until_size_threshold(self, recipes, settings):
+        settings.POPULARITY_FLUSH_SIZE = 2
+        counter = popularity.ViewCounter()
+
+        counter.record(recipes[0].id)
+        counter.record(recipes[0].id)
+        assert not RecipePopularity.objects.exists()
+
+        counter.record(recipes[1].id)
+        assert dict(RecipePopularity.objects.values_list('recipe_id', 'views')) == {recipes[0].id: 2, recipes[1].id: 1}
+        assert not counter.counts
+
+    def test_forked_process_starts_empty(self, recipes):
+        counter = popularity.ViewCounter()
+        counter.record(recipes[0].id)
+
+        with patch('core.popularity.os.getpid', return_value=counter.pid + 1):
+            counter.record(recipes[1].id)
+
+        assert counter.counts == {recipes[1].id: 1}
+
+    def test_failed_flush_drops_counts(self, recipes, caplog):
+        counter = popularity.ViewCounter()
+        counter.record(recipes[0].id)
+
+        with patch('core.popularity.flush_counts', side_effect=RuntimeError('db down')):
+            counter.flush()
+
+        assert not counter.counts
+        assert 'Could not flush 1 recipe view counts' in caplog.text
+
+    @pytest.mark.django_db(transaction=True)
+    def test_background_thread_flushes_periodically(self, user, settings):
+        settings.POPULARITY_FLUSH_INTERVAL = 0.05
+        recipe = Recipe.objects.create(user=user, title='Soup', time_minutes=5, price=Decimal('1.00'))
+        counter = popularity.ViewCounter()
+
+        counter.record(recipe.id)
+        deadline = time.monotonic() + 5
+        while not RecipePopularity.objects.exists() and time.monotonic() < deadline:
+            time.sleep(0.02)
+
+        assert RecipePopularity.objects.get().views == 1
+        settings.POPULARITY_FLUSH_INTERVAL = 0
+        counter.wake.set()
+        counter.thread.join(1)
+        assert not counter.thread.is_alive()
+
+
+class TestDeletingViewedRecipes:
+
+    def test_bulk_delete(self, user, recipes):
+        popularity.flush_counts({recipe.id: 1 for recipe in recipes})
+
+        assert bulk.delete(user, [recipes[0].id]) == [recipes[0].id]
+        assert not RecipePopularity.objects.filter(recipe_id=recipes[0].id).exists()
+
+    def test_user_deletion(self, user, recipes):
+        popularity.flush_counts({recipe.id: 1 for recipe in recipes})
+
+        deletion.process(deletion.schedule(user).id)
+
+        assert not RecipePopularity.objects.exists()
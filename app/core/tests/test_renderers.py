@@ -0,0 +1,102 @@
+import io
+import uuid
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from core.parsers import JSONParser
+from core.renderers import JSONRenderer, MessagePackRenderer
+
+
+pytestmark = pytest.mark.django_db
+
+SAMPLE = {
+    'id': 7,
+    'price': Decimal('8.79'),
+    'created': datetime(2022, 6, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+    'day': date(2022, 6, 1),
+    'key': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'label': gettext_lazy('Dinner'),
+    'tags': [{'id': 1, 'name': 'Café  '}],
+    3: None,
+}
+
+
+class TestJSONRenderer:
+
+    def test_matches_drf_output(self):
+        assert JSONRenderer().render(SAMPLE) == renderers.JSONRenderer().render(SAMPLE)
+
+    def test_falls_back_to_stdlib_without_orjson(self):
+        with patch('core.renderers.orjson', None):
+            assert JSONRenderer().render(SAMPLE) == renderers.JSONRenderer().render(SAMPLE)
+
+    def test_huge_integers_fall_back_to_stdlib(self):
+        assert JSONRenderer().render({'n': 2 ** 70}) == b'{"n":1180591620717411303424}'
+
+    def test_indented_output_uses_stdlib(self):
+        ret = JSONRenderer().render({'a': 1}, 'application/json; indent=4')
+        assert ret == b'{\n    "a": 1\n}'
+
+    def test_none_renders_empty(self):
+        assert JSONRenderer().render(None) == b''
+
+    def test_non_finite_floats_render_as_null(self):
+        pytest.importorskip('orjson')
+        with pytest.raises(ValueError):
+            renderers.JSONRenderer().render({'score': float('nan')})
+
+        assert JSONRenderer().render({'score': float('nan'), 'max': float('inf')}) == b'{"score":null,"max":null}'
+
+
+class TestJSONParser:
+
+    def parse(self, parser, body):
+        return parser.parse(io.BytesIO(body), 'application/json', {'encoding': 'utf-8'})
+
+    @pytest.mark.parametrize('body', [b'{"title": "Caf\\u00e9", "price": "1.50", "n": 12}', b'"\\ud800"', b'[]'])
+    def test_matches_drf_parser(self, body):
+        assert self.parse(JSONParser(), body) == self.parse(parsers.JSONParser(), body)
+
+    @pytest.mark.parametrize('body', [b'{"title": ', b'{"n": NaN}', b'\xff'])
+    def test_invalid_documents_raise_parse_error(self, body):
+        with pytest.raises(ParseError):
+            self.parse(JSONParser(), body)
+
+    def test_falls_back_to_stdlib_without_orjson(self):
+        with patch('core.parsers.orjson', None):
+            assert self.parse(JSONParser(), b'{"a": 1}') == {'a': 1}
+
+
+class TestMessagePackRenderer:
+
+    def test_round_trips_through_drf_encoder(self):
+        msgpack = pytest.importorskip('msgpack')
+
+        data = msgpack.unpackb(MessagePackRenderer().render(SAMPLE), strict_map_key=False)
+
+        assert data['price'] == 8.79
+        assert data['created'] == '2022-06-01T12:30:15.123456Z'
+        assert data['label'] == 'Dinner'
+        assert data[3] is None
+
+    def test_recipes_negotiated_by_accept_header(self):
+        msgpack = pytest.importorskip('msgpack')
+        user = get_user_model().objects.create_user(email='packed@example.com', password='passme123')
+        Recipe.objects.create(user=user, title='Soup', time_minutes=5, price=Decimal('2.50'))
+        client = APIClient()
+        client.force_authenticate(user=user)
+
+        res = client.get(reverse('recipe:recipe-list'), HTTP_ACCEPT='application/msgpack')
+
+        assert res['Content-Type'] == 'application/msgpack'
+        assert msgpack.unpackb(res.content)[0]['price'] == '2.50'
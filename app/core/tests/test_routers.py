@@ -0,0 +1,114 @@
+import threading
+from unittest.mock import patch
+
+import psycopg2
+import pytest
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from core import routers
+from core.middleware import ReplicaRoutingMiddleware
+from core.models import Recipe
+from core.routers import ReplicaRouter, use_replicas
+
+
+@pytest.fixture
+def replicas(settings, monkeypatch):
+    settings.DATABASE_REPLICAS = ['replica_1', 'replica_2']
+    settings.DB_REPLICA_MAX_LAG = 5
+    lags = {'replica_1': 0.5, 'replica_2': 0.1}
+    monkeypatch.setattr(routers.health, 'lag', lambda alias: lags[alias])
+    cache.clear()
+    return lags
+
+
+class TestReplicaRouter:
+
+    def test_reads_use_primary_by_default(self, replicas):
+        assert ReplicaRouter().db_for_read(Recipe) == 'default'
+
+    def test_round_robin_between_replicas(self, replicas):
+        router = ReplicaRouter()
+        chosen = []
+        for _ in range(4):
+            with use_replicas():
+                chosen.append(router.db_for_read(Recipe))
+        assert chosen == ['replica_1', 'replica_2', 'replica_1', 'replica_2']
+
+    def test_one_replica_per_scope(self, replicas):
+        router = ReplicaRouter()
+        with use_replicas():
+            chosen = {router.db_for_read(Recipe) for _ in range(4)}
+        assert chosen == {'replica_1'}
+
+    def test_least_lag_strategy(self, replicas, settings):
+        settings.DB_REPLICA_STRATEGY = 'least_lag'
+        with use_replicas():
+            assert ReplicaRouter().db_for_read(Recipe) == 'replica_2'
+
+    def test_lagging_or_unreachable_replicas_fall_back_to_primary(self, replicas):
+        replicas['replica_1'] = 30
+        replicas['replica_2'] = float('inf')
+        with use_replicas():
+            assert ReplicaRouter().db_for_read(Recipe) == 'default'
+
+    def test_writes_and_migrations_use_primary(self, replicas):
+        router = ReplicaRouter()
+        with use_replicas():
+            assert router.db_for_write(Recipe) == 'default'
+        assert router.allow_migrate('replica_1', 'core') is False
+
+
+class TestReplicaHealth:
+
+    def test_probe_uses_short_connect_timeout(self, settings):
+        settings.DB_REPLICA_PROBE_TIMEOUT = 1
+        with patch('core.routers.psycopg2.connect', side_effect=psycopg2.OperationalError) as connect:
+            assert routers.ReplicaHealth().probe('default') == float('inf')
+        assert connect.call_args.kwargs['connect_timeout'] == 1
+
+    def test_reprobe_is_single_flight(self, settings):
+        settings.DB_REPLICA_CHECK_INTERVAL = 0
+        health = routers.ReplicaHealth()
+        health.checked['replica_1'] = (0, 0.5)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_probe(alias):
+            started.set()
+            release.wait(5)
+            return 1.0
+
+        with patch.object(health, 'probe', side_effect=slow_probe) as probe:
+            prober = threading.Thread(target=health.lag, args=['replica_1'])
+            prober.start()
+            started.wait(5)
+            # Served the last result instead of probing again.
+            assert health.lag('replica_1') == 0.5
+            release.set()
+            prober.join()
+
+        assert probe.call_count == 1
+        assert health.checked['replica_1'][1] == 1.0
+
+
+class TestReplicaRoutingMiddleware:
+
+    def test_client_is_pinned_to_primary_after_write(self, replicas):
+        seen = []
+
+        def view(request):
+            seen.append(routers._use_replica.get())
+            return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+        middleware = ReplicaRoutingMiddleware(view)
+        factory = RequestFactory()
+        auth = {'HTTP_AUTHORIZATION': 'Token abc'}
+
+        middleware(factory.get('/', **auth))
+        middleware(factory.post('/', **auth))
+        middleware(factory.get('/', **auth))
+        middleware(factory.get('/', HTTP_AUTHORIZATION='Token other'))
+
+        assert seen == [True, False, False, True]
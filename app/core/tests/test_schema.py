@@ -0,0 +1,97 @@
+from unittest.mock import patch
+
+import pytest
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.schema import schema_cache
+
+
+SCHEMA_URL = reverse('api-schema')
+
+
+@pytest.fixture(autouse=True)
+def schema_dir(settings, tmp_path):
+    settings.SCHEMA_CACHE_DIR = str(tmp_path)
+    schema_cache.clear()
+    yield tmp_path
+    schema_cache.clear()
+
+
+class TestCachedSchema:
+
+    def test_schema_generated_once_and_served_with_etag(self):
+        client = APIClient()
+        with patch('drf_spectacular.generators.SchemaGenerator.get_schema', autospec=True) as get_schema:
+            get_schema.return_value = {'openapi': '3.0.3', 'paths': {}}
+            first = client.get(SCHEMA_URL)
+            second = client.get(SCHEMA_URL)
+
+        assert first.status_code == second.status_code == 200
+        assert get_schema.call_count == 1
+        assert first['ETag'] == second['ETag']
+        assert first.content == second.content
+
+    def test_matching_etag_returns_not_modified(self):
+        client = APIClient()
+        etag = client.get(SCHEMA_URL)['ETag']
+
+        res = client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        assert res.status_code == 304
+
+    def test_formats_are_cached_separately(self):
+        client = APIClient()
+        yaml_res = client.get(SCHEMA_URL)
+        json_res = client.get(SCHEMA_URL, HTTP_ACCEPT='application/vnd.oai.openapi+json')
+
+        assert yaml_res['Content-Type'].startswith('application/vnd.oai.openapi')
+        assert json_res.json()['openapi'].startswith('3.')
+        assert yaml_res['ETag'] != json_res['ETag']
+
+    def test_command_writes_schema_to_disk(self, schema_dir):
+        call_command('generate_schema')
+
+        assert len(list(schema_dir.glob('*.schema'))) == 2
+        schema_cache.clear()
+        with patch('drf_spectacular.generators.SchemaGenerator.get_schema') as get_schema:
+            res = APIClient().get(SCHEMA_URL)
+        assert res.status_code == 200
+        get_schema.assert_not_called()
+
+    def test_unknown_language_is_served_but_not_cached(self, schema_dir):
+        client = APIClient()
+        with patch('drf_spectacular.generators.SchemaGenerator.get_schema', autospec=True) as get_schema:
+            get_schema.return_value = {'openapi': '3.0.3', 'paths': {}}
+            for _ in range(2):
+                res = client.get(SCHEMA_URL, {'lang': 'x/../../evil/pwn'})
+                assert res.status_code == 200
+
+        assert get_schema.call_count == 2
+        assert not schema_cache.entries
+        assert not any(schema_dir.parent.rglob('pwn*'))
+        assert not list(schema_dir.iterdir())
+
+    def test_unknown_version_is_not_cached(self, schema_dir):
+        APIClient().get(SCHEMA_URL, {'version': '../../v9'})
+
+        assert not schema_cache.entries
+        assert not list(schema_dir.iterdir())
+
+    def test_supported_language_is_cached_under_a_hashed_name(self, schema_dir):
+        APIClient().get(SCHEMA_URL, {'lang': 'de'})
+
+        assert len(schema_cache.entries) == 1
+        [path] = schema_dir.glob('*.schema')
+        assert len(path.stem) == 32 and 'de' not in path.stem.split('-')
+
+    def test_memory_cache_is_bounded(self, settings):
+        settings.SCHEMA_CACHE_DIR = None
+        for i in range(schema_cache.MAX_ENTRIES + 5):
+            schema_cache.set(schema_cache.key('json', language=f'l{i}'), b'{}')
+
+        assert len(schema_cache.entries) == schema_cache.MAX_ENTRIES
+        assert schema_cache.get(schema_cache.key('json', language='l0')) is None
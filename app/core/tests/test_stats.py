@@ -0,0 +1,83 @@
+import threading
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from core import stats
+from core.models import Recipe, RecipeStats
+
+
+# Each thread commits on its own connection.
+pytestmark = pytest.mark.django_db(transaction=True)
+
+
+@pytest.fixture
+def user():
+    return get_user_model().objects.create_user(email='stats@example.com', password='passme123')
+
+
+def add_recipe(user, title):
+    with stats.tracking(user.id) as recipe_stats:
+        recipe = Recipe.objects.create(user=user, title=title, time_minutes=10, price=Decimal('4.00'))
+        stats.apply(recipe_stats, stats.snapshot(recipe), 1)
+
+
+def in_thread(target, errors):
+    def run():
+        try:
+            target()
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connection.close()
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+class TestConcurrentWriters:
+
+    def test_concurrent_first_writers_both_count(self, user):
+        both_computing = threading.Barrier(2, timeout=5)
+        compute = stats.compute
+
+        def compute_together(user_id):
+            summary = compute(user_id)
+            both_computing.wait()
+            return summary
+
+        errors = []
+        with patch('core.stats.compute', side_effect=compute_together):
+            threads = [in_thread(lambda i=i: add_recipe(user, f'Recipe {i}'), errors) for i in range(2)]
+            for thread in threads:
+                thread.join()
+
+        assert errors == []
+        assert RecipeStats.objects.get(user=user).recipe_count == 2
+
+    def test_rebuild_waits_for_tracked_writes(self, user):
+        add_recipe(user, 'Existing')
+        locked, go = threading.Event(), threading.Event()
+
+        def slow_writer():
+            with stats.tracking(user.id) as recipe_stats:
+                recipe = Recipe.objects.create(user=user, title='New', time_minutes=10, price=Decimal('4.00'))
+                stats.apply(recipe_stats, stats.snapshot(recipe), 1)
+                locked.set()
+                go.wait(5)
+
+        errors = []
+        writer = in_thread(slow_writer, errors)
+        locked.wait(5)
+        rebuilder = in_thread(lambda: stats.rebuild(user.id), errors)
+        time.sleep(0.2)
+        go.set()
+        writer.join()
+        rebuilder.join()
+
+        assert errors == []
+        assert RecipeStats.objects.get(user=user).recipe_count == 2
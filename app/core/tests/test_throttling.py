@@ -0,0 +1,116 @@
+from unittest.mock import patch
+
+import pytest
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.urls import reverse
+
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from core.throttling import TokenBucketThrottle, local_state, parse_rate
+
+
+pytestmark = pytest.mark.django_db
+
+
+class FakeView:
+    throttle_scope = None
+
+
+@pytest.fixture
+def rates(settings):
+    def set_rates(**rates):
+        settings.REST_FRAMEWORK = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}
+    return set_rates
+
+
+def anonymous_request(method='get', ip='10.0.0.1'):
+    request = Request(getattr(APIRequestFactory(), method)('/', REMOTE_ADDR=ip))
+    request.user = AnonymousUser()
+    return request
+
+
+def throttle_at(now):
+    throttle = TokenBucketThrottle()
+    throttle.timer = lambda: now
+    return throttle
+
+
+class TestTokenBucketThrottle:
+
+    def test_parse_rate(self):
+        assert parse_rate('10/min') == (10, 60)
+        assert parse_rate('5/s') == (5, 1)
+
+    def test_bucket_empties_then_refills(self, rates):
+        rates(read='3/min')
+        allowed = [throttle_at(600).allow_request(anonymous_request(), FakeView()) for _ in range(4)]
+        assert allowed == [True, True, True, False]
+
+        # Halfway through the next window half of the previous consumption has drained.
+        assert throttle_at(690).allow_request(anonymous_request(), FakeView()) is True
+        assert throttle_at(690).allow_request(anonymous_request(), FakeView()) is False
+
+    def test_scopes_and_clients_have_separate_buckets(self, rates):
+        rates(read='1/min', write='1/min')
+        assert throttle_at(600).allow_request(anonymous_request('get'), FakeView())
+        assert throttle_at(600).allow_request(anonymous_request('post'), FakeView())
+        assert throttle_at(600).allow_request(anonymous_request('get', ip='10.0.0.2'), FakeView())
+        assert not throttle_at(600).allow_request(anonymous_request('get'), FakeView())
+
+    def test_empty_bucket_rejected_locally_without_cache_round_trip(self, rates):
+        rates(read='1/min')
+        throttle_at(600).allow_request(anonymous_request(), FakeView())
+        denied = throttle_at(600)
+        assert not denied.allow_request(anonymous_request(), FakeView())
+        assert denied.wait() == 60
+
+        with patch.object(cache, 'incr') as incr, patch.object(cache, 'get') as get:
+            throttle = throttle_at(630)
+            assert not throttle.allow_request(anonymous_request(), FakeView())
+        incr.assert_not_called()
+        get.assert_not_called()
+        assert throttle.wait() == 30
+
+    def test_expired_block_already_removed_elsewhere(self, rates):
+        rates(read='1/min')
+        throttle_at(600).allow_request(anonymous_request(), FakeView())
+        throttle_at(600).allow_request(anonymous_request(), FakeView())
+
+        class Pruned(dict):
+            # Another thread (or prune()) drops the entry between get and removal.
+            def get(self, key, default=None):
+                value = super().get(key, default)
+                self.clear()
+                return value
+
+        with patch.object(local_state, 'blocked', Pruned(local_state.blocked)):
+            assert throttle_at(730).allow_request(anonymous_request(), FakeView())
+
+    def test_unconfigured_scope_is_not_throttled(self, rates):
+        rates()
+        assert all(throttle_at(600).allow_request(anonymous_request(), FakeView()) for _ in range(5))
+
+
+class TestThrottledViews:
+
+    def test_token_endpoint_limited_per_ip(self, rates):
+        rates(token='2/min')
+        client = APIClient()
+        payload = {'email': 'nobody@example.com', 'password': 'wrong'}
+        statuses = [client.post(reverse('user:token'), payload).status_code for _ in range(3)]
+
+        assert statuses == [400, 400, 429]
+
+    def test_spoofed_forwarded_for_does_not_reset_bucket(self, rates):
+        rates(token='2/min')
+        client = APIClient()
+        payload = {'email': 'nobody@example.com', 'password': 'wrong'}
+        statuses = [
+            client.post(reverse('user:token'), payload, HTTP_X_FORWARDED_FOR=f'203.0.113.{i}').status_code
+            for i in range(3)
+        ]
+
+        assert statuses == [400, 400, 429]
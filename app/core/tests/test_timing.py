@@ -0,0 +1,61 @@
+import json
+import logging
+
+import pytest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+
+
+pytestmark = pytest.mark.django_db
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+@pytest.fixture
+def api_client():
+    user = get_user_model().objects.create_user(email='timing@example.com', password='passme123')
+    Recipe.objects.create(user=user, title='Soup', time_minutes=5, price=Decimal('2.50'))
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+class TestServerTiming:
+
+    def test_header_reports_spans(self, api_client, settings):
+        settings.SERVER_TIMING_SAMPLE_RATE = 1.0
+        res = api_client.get(RECIPES_URL)
+
+        header = res['Server-Timing']
+        assert header.startswith('db;desc="')
+        for name in ('serialize', 'render', 'total'):
+            assert f'{name};dur=' in header
+
+    def test_unsampled_request_has_no_header(self, api_client, settings):
+        settings.SERVER_TIMING_SAMPLE_RATE = 0
+        res = api_client.get(RECIPES_URL)
+
+        assert 'Server-Timing' not in res
+
+    def test_force_header_samples_request(self, api_client, settings):
+        settings.SERVER_TIMING_SAMPLE_RATE = 0
+        settings.SERVER_TIMING_FORCE_HEADER = 'X-Server-Timing'
+        res = api_client.get(RECIPES_URL, HTTP_X_SERVER_TIMING='1')
+
+        assert 'Server-Timing' in res
+
+    def test_log_line_counts_queries(self, api_client, settings, caplog):
+        settings.SERVER_TIMING_SAMPLE_RATE = 1.0
+        with caplog.at_level(logging.INFO, logger='core.timing'):
+            api_client.get(RECIPES_URL)
+
+        record = json.loads(caplog.records[-1].getMessage())
+        assert record['path'] == RECIPES_URL
+        assert record['status'] == 200
+        assert record['queries'] > 0
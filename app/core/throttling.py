@@ -0,0 +1,127 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+MAX_LOCAL_ENTRIES = 10000
+
+
+def parse_rate(rate):
+    """'100/min' -> (100, 60)"""
+    num, period = rate.split('/')
+    return int(num), PERIODS[period[0]]
+
+
+class LocalState:
+    """Per-process memo of immutable previous-window counts and of clients known to be empty."""
+
+    def __init__(self):
+        self.previous = {}
+        self.blocked = {}
+
+    def clear(self):
+        self.previous.clear()
+        self.blocked.clear()
+
+    def prune(self):
+        if len(self.previous) > MAX_LOCAL_ENTRIES:
+            self.previous.clear()
+        if len(self.blocked) > MAX_LOCAL_ENTRIES:
+            self.blocked.clear()
+
+
+local_state = LocalState()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket per user, or per IP for anonymous requests, scoped by the
+    view's `throttle_scope` (e.g. 'upload', 'token') or else by 'read' / 'write'.
+    A rate of 'N/period' is a bucket of N tokens refilled over one period.
+
+    The bucket is kept as two fixed-window counters in the cache: what the
+    previous window consumed drains linearly across the current one, which
+    refills tokens continuously, so recording a request is a single atomic
+    incr. Previous-window counts never change and are memoized locally, and
+    clients found empty are rejected locally until their next token is due.
+    """
+    timer = time.time
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope:
+            return scope
+        return 'read' if request.method in SAFE_METHODS else 'write'
+
+    def get_cache_key(self, request, view, scope):
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            ident = f'user:{user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return f'throttle:{scope}:{ident}'
+
+    def allow_request(self, request, view):
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        capacity, period = parse_rate(rate)
+        key = self.get_cache_key(request, view, scope)
+        now = self.timer()
+
+        blocked_until = local_state.blocked.get(key)
+        if blocked_until is not None:
+            if now < blocked_until:
+                self.wait_seconds = blocked_until - now
+                return False
+            local_state.blocked.pop(key, None)
+
+        window, elapsed = divmod(now, period)
+        remaining = 1 - elapsed / period
+        current = self._incr(f'{key}:{int(window)}', period)
+        previous = self._previous(f'{key}:{int(window) - 1}')
+        overdraft = previous * remaining + current - capacity
+        if overdraft <= 0:
+            return True
+
+        if previous * remaining >= overdraft:
+            self.wait_seconds = overdraft * period / previous
+        else:
+            self.wait_seconds = remaining * period
+        local_state.prune()
+        local_state.blocked[key] = now + self.wait_seconds
+        return False
+
+    def _incr(self, key, period):
+        try:
+            return self.cache.incr(key)
+        except ValueError:
+            # First request of the window; the counter must outlive the next
+            # window, where it serves as the previous count.
+            if self.cache.add(key, 1, timeout=2 * period + 1):
+                return 1
+            return self.cache.incr(key)
+
+    def _previous(self, key):
+        count = local_state.previous.get(key)
+        if count is None:
+            count = self.cache.get(key, 0)
+            local_state.prune()
+            local_state.previous[key] = count
+        return count
+
+    def wait(self):
+        return self.wait_seconds
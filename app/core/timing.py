@@ -0,0 +1,95 @@
+"""
+Per-request timing state shared by the middleware, DB wrapper, serializers and renderers
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from rest_framework import serializers
+
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.spans = {}
+
+    def add(self, name, duration):
+        self.spans[name] = self.spans.get(name, 0.0) + duration
+
+    @property
+    def total(self):
+        return time.perf_counter() - self.started
+
+    def as_dict(self):
+        data = {name: round(value * 1000, 2) for name, value in self.spans.items()}
+        data['queries'] = self.query_count
+        data['total'] = round(self.total * 1000, 2)
+        return data
+
+    def server_timing(self):
+        parts = [f'db;desc="{self.query_count} queries";dur={self.spans.get("db", 0.0) * 1000:.2f}']
+        for name, value in self.spans.items():
+            if name != 'db':
+                parts.append(f'{name};dur={value * 1000:.2f}')
+        parts.append(f'total;dur={self.total * 1000:.2f}')
+        return ', '.join(parts)
+
+
+def current():
+    return _current.get()
+
+
+def start():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timer(name):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def sql_wrapper(execute, sql, params, many, context):
+    """Connection execute wrapper recording query count and SQL time."""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.query_count += 1
+        timings.add('db', time.perf_counter() - started)
+
+
+class TimedListSerializer(serializers.ListSerializer):
+
+    @property
+    def data(self):
+        with timer('serialize'):
+            return super().data
+
+
+class TimedSerializerMixin:
+
+    @property
+    def data(self):
+        with timer('serialize'):
+            return super().data
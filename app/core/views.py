@@ -0,0 +1,19 @@
+from django.http import HttpResponse, JsonResponse
+
+from core.health import database_probe
+from core.metrics import registry
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def liveness_view(request):
+    return JsonResponse({'status': 'ok'})
+
+
+def readiness_view(request):
+    error = database_probe()
+    if error:
+        return JsonResponse({'status': 'unavailable', 'database': error}, status=503)
+    return JsonResponse({'status': 'ok', 'database': 'ok'})
@@ -0,0 +1,100 @@
+"""
+Set-based updates and deletes over many of a user's recipes.
+
+Each operation is one transaction of a few statements whose size does not
+depend on how many recipes are touched: the owned recipes are locked by
+id, scalar fields are changed with one UPDATE, tag and ingredient links
+are added with INSERT ... SELECT ... ON CONFLICT DO NOTHING and removed
+with DELETE ... USING. Every statement repeats the user_id condition, so
+ids of other users' recipes, tags or ingredients are never touched. The
+sync triggers stamp the changed rows; the stats summary is adjusted by
+the aggregate totals of the recipes before and after the change.
+"""
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+
+from core import stats
+from core.deletion import RECIPE_LINKS
+from core.models import Ingredient, Recipe, Tag
+from core.signals import invalidate_similarity
+
+
+LINKS = {
+    'tags': (Recipe.tags.through, 'tag_id', Tag),
+    'ingredients': (Recipe.ingredients.through, 'ingredient_id', Ingredient),
+}
+
+
+def _lock_owned(cursor, user_id, ids, columns='id'):
+    cursor.execute(
+        f'SELECT {columns} FROM {Recipe._meta.db_table} WHERE user_id = %s AND id = ANY(%s) ORDER BY id FOR UPDATE',
+        [user_id, ids],
+    )
+    return cursor.fetchall()
+
+
+def _add_links(cursor, user_id, recipe_ids, relation, attr_ids):
+    link, column, model = LINKS[relation]
+    cursor.execute(
+        f'INSERT INTO {link._meta.db_table} (recipe_id, {column}) '
+        f'SELECT r.id, a.id FROM {Recipe._meta.db_table} r, {model._meta.db_table} a '
+        'WHERE r.user_id = %s AND r.id = ANY(%s) AND a.user_id = %s AND a.id = ANY(%s) '
+        'ON CONFLICT DO NOTHING',
+        [user_id, recipe_ids, user_id, attr_ids],
+    )
+
+
+def _remove_links(cursor, user_id, recipe_ids, relation, attr_ids):
+    link, column, _ = LINKS[relation]
+    cursor.execute(
+        f'DELETE FROM {link._meta.db_table} l USING {Recipe._meta.db_table} r '
+        f'WHERE l.recipe_id = r.id AND r.user_id = %s AND r.id = ANY(%s) AND l.{column} = ANY(%s)',
+        [user_id, recipe_ids, attr_ids],
+    )
+
+
+def update(user, ids, fields=None, add=None, remove=None):
+    """
+    Set `fields` on the user's recipes among `ids` and add/remove the tag
+    and ingredient ids given per relation in `add` and `remove`, e.g.
+    add={'tags': [1, 2]}. Returns the ids of the recipes that were updated.
+    """
+    fields, add, remove = fields or {}, add or {}, remove or {}
+    with stats.tracking(user.id) as recipe_stats:
+        with connection.cursor() as cursor:
+            owned = [pk for pk, in _lock_owned(cursor, user.id, ids)]
+            if not owned:
+                return []
+            recipes = Recipe.objects.filter(user=user, id__in=owned)
+            stats.apply_summary(recipe_stats, stats.summarize(recipes), -1)
+            if fields:
+                recipes.update(**fields)
+            for relation, attr_ids in remove.items():
+                if attr_ids:
+                    _remove_links(cursor, user.id, owned, relation, attr_ids)
+            for relation, attr_ids in add.items():
+                if attr_ids:
+                    _add_links(cursor, user.id, owned, relation, attr_ids)
+            stats.apply_summary(recipe_stats, stats.summarize(recipes), 1)
+        transaction.on_commit(lambda: invalidate_similarity(user.id))
+    return owned
+
+
+def delete(user, ids):
+    """Delete the user's recipes among `ids` with their links and images; returns the deleted ids."""
+    with stats.tracking(user.id) as recipe_stats:
+        with connection.cursor() as cursor:
+            rows = _lock_owned(cursor, user.id, ids, 'id, image')
+            owned = [pk for pk, _ in rows]
+            if not owned:
+                return []
+            stats.apply_summary(recipe_stats, stats.summarize(Recipe.objects.filter(user=user, id__in=owned)), -1)
+            for link in RECIPE_LINKS:
+                cursor.execute(f'DELETE FROM {link._meta.db_table} WHERE recipe_id = ANY(%s)', [owned])
+            cursor.execute(
+                f'DELETE FROM {Recipe._meta.db_table} WHERE user_id = %s AND id = ANY(%s)', [user.id, owned],
+            )
+        images = [image for _, image in rows if image]
+        transaction.on_commit(lambda: [default_storage.delete(image) for image in images])
+        transaction.on_commit(lambda: invalidate_similarity(user.id))
+    return owned
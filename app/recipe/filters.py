@@ -0,0 +1,54 @@
+from django.db.models import Count, F
+
+from core.models import Recipe
+
+
+def cookable_with(queryset, ingredient_ids, max_missing=0):
+    """
+    Restrict `queryset` to recipes using at least one of `ingredient_ids`
+    and needing at most `max_missing` ingredients outside of them.
+
+    Only the links to the given ingredients are read, from the through-table
+    index on ingredient_id, and counted per recipe; a recipe qualifies when
+    its trigger-maintained ingredient_count exceeds that by <= max_missing.
+    Recipes sharing nothing with the pantry are never visited, nor are the
+    other links of those that do.
+    """
+    covered = Recipe.ingredients.through.objects.filter(
+        ingredient_id__in=ingredient_ids,
+    ).values('recipe_id').annotate(
+        matched=Count('id'),
+    ).filter(recipe__ingredient_count__lte=F('matched') + max_missing).values('recipe_id')
+    return queryset.filter(id__in=covered)
+
+
+# Public ordering names mapped to the columns they sort by. All but
+# 'popular' have a matching (user, field, id) index on Recipe, scanned in
+# either direction. 'popular' puts the most viewed first (core.popularity).
+ORDERINGS = {
+    'id': ('id',),
+    'time_minutes': ('time_minutes', 'id'),
+    'price': ('price', 'id'),
+    'title': ('title', 'id'),
+    'popular': ('-popularity__score', '-id'),
+}
+DEFAULT_ORDERING = '-id'
+# Recipes never opened have no popularity row; they rank below all others.
+NULLS_LOWEST = {'popularity__score'}
+
+
+def ordering_fields(ordering):
+    """Return order_by() arguments for an `ordering` such as '-price', or None if unknown."""
+    name = ordering.lstrip('-')
+    if name not in ORDERINGS or ordering.count('-') > 1:
+        return None
+    reverse = ordering.startswith('-')
+    fields = []
+    for field in ORDERINGS[name]:
+        descending = field.startswith('-') != reverse
+        field = field.lstrip('-')
+        if field in NULLS_LOWEST:
+            fields.append(F(field).desc(nulls_last=True) if descending else F(field).asc(nulls_first=True))
+        else:
+            fields.append(f'-{field}' if descending else field)
+    return fields
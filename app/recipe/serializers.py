@@ -1,25 +1,29 @@
 from rest_framework import serializers
 
+from core import stats
 from core.models import Recipe, Tag, Ingredient
+from core.timing import TimedListSerializer, TimedSerializerMixin
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Tag
         fields = ('id', 'name')
         read_only_fields = ('id',)
+        list_serializer_class = TimedListSerializer
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
         fields = ('id', 'name')
         read_only_fields = ('id',)
+        list_serializer_class = TimedListSerializer
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
 
@@ -27,6 +31,7 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients',)
         read_only_fields = ('id',)
+        list_serializer_class = TimedListSerializer
 
     def _get_or_create_tags(self, tags, recipe):
         auth_user = self.context['request'].user
@@ -44,25 +49,32 @@ class RecipeSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
-        recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        with stats.tracking(validated_data['user']) as recipe_stats:
+            recipe = Recipe.objects.create(**validated_data)
+            self._get_or_create_tags(tags, recipe)
+            self._get_or_create_ingredients(ingredients, recipe)
+            stats.apply(recipe_stats, stats.snapshot(recipe), 1)
         return recipe
 
     def update(self, instance, validated_data):
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
-        if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
-
-        if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
-
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        with stats.tracking(instance.user_id) as recipe_stats:
+            stats.apply(recipe_stats, stats.snapshot(instance), -1)
+            if tags is not None:
+                instance.tags.clear()
+                self._get_or_create_tags(tags, instance)
+
+            if ingredients is not None:
+                instance.ingredients.clear()
+                self._get_or_create_ingredients(ingredients, instance)
+
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+            # The M2M changes above invalidate any prefetched tags/ingredients.
+            getattr(instance, '_prefetched_objects_cache', {}).clear()
+            stats.apply(recipe_stats, stats.snapshot(instance), 1)
         return instance
 
 
@@ -72,10 +84,146 @@ class RecipeDetailSerializer(RecipeSerializer):
         fields = RecipeSerializer.Meta.fields + ('description', 'image',)
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class SimilarRecipeSerializer(RecipeSerializer):
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + ('similarity',)
+
+
+class RecipeBatchSerializer(serializers.Serializer):
+    results = RecipeDetailSerializer(many=True)
+    missing = serializers.ListField(
+        child=serializers.IntegerField(), help_text='Requested IDs that do not exist or belong to another user',
+    )
+
+
+MAX_BULK_IDS = 1000
+
+
+def _id_list(**kwargs):
+    return serializers.ListField(child=serializers.IntegerField(), **kwargs)
+
+
+class RecipeBulkDeleteSerializer(serializers.Serializer):
+    ids = _id_list(min_length=1, max_length=MAX_BULK_IDS)
+
+
+class RecipeBulkUpdateSerializer(serializers.ModelSerializer):
+    """Changes applied to every listed recipe; tags and ingredients are added or removed by id."""
+    ids = _id_list(min_length=1, max_length=MAX_BULK_IDS)
+    add_tags = _id_list(required=False)
+    remove_tags = _id_list(required=False)
+    add_ingredients = _id_list(required=False)
+    remove_ingredients = _id_list(required=False)
+
+    class Meta:
+        model = Recipe
+        fields = (
+            'ids', 'title', 'time_minutes', 'price', 'link', 'description',
+            'add_tags', 'remove_tags', 'add_ingredients', 'remove_ingredients',
+        )
+        extra_kwargs = {field: {'required': False} for field in ('title', 'time_minutes', 'price')}
+
+    def validate(self, attrs):
+        for relation in ('tags', 'ingredients'):
+            both = set(attrs.get(f'add_{relation}', [])) & set(attrs.get(f'remove_{relation}', []))
+            if both:
+                raise serializers.ValidationError(
+                    {f'remove_{relation}': f'Also listed in add_{relation}: {sorted(both)}.'}
+                )
+        if len(attrs) == 1:
+            raise serializers.ValidationError('No changes given.')
+        return attrs
+
+
+class RecipeBulkResultSerializer(serializers.Serializer):
+    ids = _id_list(help_text='IDs of the recipes changed')
+    missing = _id_list(help_text='Requested IDs that do not exist or belong to another user')
+
+
+class MergeSerializer(serializers.Serializer):
+    ids = _id_list(min_length=1, max_length=MAX_BULK_IDS, help_text='IDs to merge into this one and delete')
+
+
+class MergeResultSerializer(serializers.Serializer):
+    merged = _id_list(help_text='IDs merged and deleted')
+    missing = _id_list(help_text='Requested IDs that do not exist or belong to another user')
+
+
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
         fields = ('id', 'image',)
         read_only_fields = ('id',)
         extra_kwargs = {'image': {'required': 'True'}}
+
+
+class RecipeStatsSerializer(serializers.Serializer):
+    TOP_N = 10
+
+    recipe_count = serializers.IntegerField()
+    average_time_minutes = serializers.SerializerMethodField()
+    average_price = serializers.SerializerMethodField()
+    price_distribution = serializers.SerializerMethodField()
+    top_tags = serializers.SerializerMethodField()
+    top_ingredients = serializers.SerializerMethodField()
+
+    def get_average_time_minutes(self, obj):
+        if not obj.recipe_count:
+            return None
+        return round(obj.time_minutes_sum / obj.recipe_count, 2)
+
+    def get_average_price(self, obj):
+        if not obj.recipe_count:
+            return None
+        return str(round(obj.price_sum / obj.recipe_count, 2))
+
+    def get_price_distribution(self, obj):
+        bounds = (None,) + stats.PRICE_BUCKETS + (None,)
+        counts = obj.price_histogram or [0] * (len(stats.PRICE_BUCKETS) + 1)
+        return [
+            {
+                'min': str(low) if low is not None else None,
+                'max': str(high) if high is not None else None,
+                'count': count,
+            }
+            for low, high, count in zip(bounds, bounds[1:], counts)
+        ]
+
+    def _top(self, counts, model):
+        top = sorted(counts.items(), key=lambda item: (-item[1], int(item[0])))[:self.TOP_N]
+        names = dict(model.objects.filter(id__in=[int(pk) for pk, _ in top]).values_list('id', 'name'))
+        return [{'id': int(pk), 'name': names.get(int(pk)), 'count': count} for pk, count in top]
+
+    def get_top_tags(self, obj):
+        return self._top(obj.tag_counts, Tag)
+
+    def get_top_ingredients(self, obj):
+        return self._top(obj.ingredient_counts, Ingredient)
+
+
+class SyncRecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Recipe as sent by /sync/: tags and ingredients by id, synced separately."""
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'title', 'time_minutes', 'price', 'link', 'tags', 'ingredients')
+        read_only_fields = fields
+        list_serializer_class = TimedListSerializer
+
+
+class SyncDeletedSerializer(serializers.Serializer):
+    recipes = serializers.ListField(child=serializers.IntegerField())
+    tags = serializers.ListField(child=serializers.IntegerField())
+    ingredients = serializers.ListField(child=serializers.IntegerField())
+
+
+class SyncSerializer(serializers.Serializer):
+    token = serializers.CharField(help_text='Pass as `since` on the next sync')
+    full = serializers.BooleanField(help_text='True when this is a full snapshot to replace local data')
+    recipes = SyncRecipeSerializer(many=True)
+    tags = TagSerializer(many=True)
+    ingredients = IngredientSerializer(many=True)
+    deleted = SyncDeletedSerializer()
@@ -0,0 +1,155 @@
+import pytest
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import stats
+from core.models import Ingredient, Recipe, RecipeStats, Tag, Tombstone
+
+
+pytestmark = pytest.mark.django_db
+
+BULK_URL = reverse('recipe:recipe-bulk-update')
+
+
+@pytest.fixture
+def bulk_user():
+    return get_user_model().objects.create_user(email='bulk@example.com', password='passme123')
+
+
+@pytest.fixture
+def other_user():
+    return get_user_model().objects.create_user(email='other@example.com', password='passme123')
+
+
+@pytest.fixture
+def api_client(bulk_user):
+    client = APIClient()
+    client.force_authenticate(user=bulk_user)
+    return client
+
+
+@pytest.fixture
+def kitchen(bulk_user):
+    tags = [Tag.objects.create(user=bulk_user, name=name) for name in ('Dinner', 'Quick')]
+    rice = Ingredient.objects.create(user=bulk_user, name='Rice')
+    recipes = []
+    for i in range(3):
+        recipe = Recipe.objects.create(user=bulk_user, title=f'Recipe {i}', time_minutes=10 * (i + 1), price=Decimal('7.50'))
+        recipe.tags.add(tags[0])
+        recipe.ingredients.add(rice)
+        recipes.append(recipe)
+    stats.rebuild(bulk_user)
+    return {'tags': tags, 'rice': rice, 'recipes': recipes}
+
+
+def assert_matches_recompute(user):
+    stored = RecipeStats.objects.get(user=user)
+    fresh = stats.compute(user)
+    for field in ('recipe_count', 'time_minutes_sum', 'price_sum', 'price_histogram', 'tag_counts', 'ingredient_counts'):
+        assert getattr(stored, field) == getattr(fresh, field), field
+
+
+class TestBulkUpdate:
+
+    def test_updates_fields_and_links(self, api_client, bulk_user, kitchen):
+        dinner, quick = kitchen['tags']
+        ids = [recipe.id for recipe in kitchen['recipes'][:2]]
+
+        res = api_client.patch(BULK_URL, {
+            'ids': ids, 'price': '25.00', 'add_tags': [quick.id], 'remove_tags': [dinner.id],
+            'remove_ingredients': [kitchen['rice'].id],
+        }, format='json')
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data == {'ids': ids, 'missing': []}
+        for recipe in Recipe.objects.filter(id__in=ids):
+            assert recipe.price == Decimal('25.00')
+            assert list(recipe.tags.all()) == [quick]
+            assert not recipe.ingredients.exists()
+        untouched = kitchen['recipes'][2]
+        untouched.refresh_from_db()
+        assert untouched.price == Decimal('7.50')
+        assert_matches_recompute(bulk_user)
+
+    def test_adding_existing_link_is_ignored(self, api_client, bulk_user, kitchen):
+        dinner = kitchen['tags'][0]
+        ids = [recipe.id for recipe in kitchen['recipes']]
+
+        res = api_client.patch(BULK_URL, {'ids': ids, 'add_tags': [dinner.id]}, format='json')
+
+        assert res.status_code == status.HTTP_200_OK
+        assert Recipe.tags.through.objects.filter(tag=dinner).count() == 3
+        assert_matches_recompute(bulk_user)
+
+    def test_other_users_rows_are_untouched(self, api_client, bulk_user, other_user, kitchen):
+        foreign = Recipe.objects.create(user=other_user, title='Theirs', time_minutes=5, price=Decimal('1.00'))
+        foreign_tag = Tag.objects.create(user=other_user, name='Theirs')
+        mine = kitchen['recipes'][0]
+
+        res = api_client.patch(BULK_URL, {
+            'ids': [mine.id, foreign.id], 'title': 'Renamed', 'add_tags': [foreign_tag.id],
+        }, format='json')
+
+        assert res.data == {'ids': [mine.id], 'missing': [foreign.id]}
+        foreign.refresh_from_db()
+        assert foreign.title == 'Theirs'
+        assert not mine.tags.filter(id=foreign_tag.id).exists()
+
+    def test_statement_count_does_not_grow_with_ids(self, api_client, kitchen, django_assert_max_num_queries):
+        quick = kitchen['tags'][1]
+        ids = [recipe.id for recipe in kitchen['recipes']]
+
+        with django_assert_max_num_queries(13):
+            api_client.patch(BULK_URL, {'ids': ids, 'time_minutes': 5, 'add_tags': [quick.id]}, format='json')
+
+    def test_invalidates_similarity(self, api_client, bulk_user, kitchen, django_capture_on_commit_callbacks):
+        with patch('recipe.bulk.invalidate_similarity') as invalidate:
+            with django_capture_on_commit_callbacks(execute=True):
+                api_client.patch(BULK_URL, {'ids': [kitchen['recipes'][0].id], 'title': 'New'}, format='json')
+
+        invalidate.assert_called_once_with(bulk_user.id)
+
+    @pytest.mark.parametrize('payload', [
+        {'title': 'No ids'},
+        {'ids': [], 'title': 'Empty'},
+        {'ids': [1]},
+        {'ids': [1], 'add_tags': [2], 'remove_tags': [2]},
+        {'ids': list(range(1001)), 'title': 'Too many'},
+    ])
+    def test_invalid_payload_rejected(self, api_client, payload):
+        res = api_client.patch(BULK_URL, payload, format='json')
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestBulkDelete:
+
+    def test_deletes_owned_recipes(self, api_client, bulk_user, other_user, kitchen):
+        foreign = Recipe.objects.create(user=other_user, title='Theirs', time_minutes=5, price=Decimal('1.00'))
+        doomed = [recipe.id for recipe in kitchen['recipes'][:2]]
+
+        res = api_client.delete(BULK_URL, {'ids': doomed + [foreign.id]}, format='json')
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data == {'ids': doomed, 'missing': [foreign.id]}
+        assert list(Recipe.objects.filter(user=bulk_user)) == [kitchen['recipes'][2]]
+        assert Recipe.objects.filter(id=foreign.id).exists()
+        assert not Recipe.tags.through.objects.filter(recipe_id__in=doomed).exists()
+        assert set(Tombstone.objects.filter(model='recipe').values_list('object_id', flat=True)) == set(doomed)
+        assert_matches_recompute(bulk_user)
+
+    def test_deletes_images_after_commit(self, api_client, kitchen, django_capture_on_commit_callbacks):
+        recipe = kitchen['recipes'][0]
+        Recipe.objects.filter(id=recipe.id).update(image='uploads/recipe/old.jpg')
+
+        with patch('recipe.bulk.default_storage') as storage:
+            with django_capture_on_commit_callbacks(execute=True):
+                api_client.delete(BULK_URL, {'ids': [recipe.id]}, format='json')
+
+        storage.delete.assert_called_once_with('uploads/recipe/old.jpg')
@@ -0,0 +1,135 @@
+import io
+import json
+import zipfile
+
+import pytest
+from decimal import Decimal
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Tag
+
+
+pytestmark = pytest.mark.django_db
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+
+
+@pytest.fixture
+def export_user():
+    return get_user_model().objects.create_user(email='export@example.com', password='passme123')
+
+
+@pytest.fixture
+def api_client(export_user):
+    client = APIClient()
+    client.force_authenticate(user=export_user)
+    return client
+
+
+def jpeg_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 32), 'red').save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+def create_recipe(user, title, image=None):
+    recipe = Recipe.objects.create(user=user, title=title, time_minutes=10, price=Decimal('4.50'))
+    if image:
+        recipe.image.save('photo.jpg', ContentFile(image))
+    return recipe
+
+
+def download(client, **headers):
+    res = client.get(EXPORT_URL, **headers)
+    assert res.status_code == status.HTTP_200_OK
+    assert res.streaming
+    return res, zipfile.ZipFile(io.BytesIO(b''.join(res.streaming_content)))
+
+
+class TestExport:
+
+    def test_archive_contains_recipes_and_images(self, api_client, export_user):
+        image = jpeg_bytes()
+        soup = create_recipe(export_user, 'Soup', image=image)
+        soup.tags.add(Tag.objects.create(user=export_user, name='Warm'))
+        create_recipe(export_user, 'Salad')
+
+        res, archive = download(api_client)
+
+        assert res['Content-Type'] == 'application/zip'
+        assert 'recipes.zip' in res['Content-Disposition']
+        assert archive.testzip() is None
+        recipes = json.loads(archive.read('recipes.json'))
+        assert [r['title'] for r in recipes] == ['Soup', 'Salad']
+        assert recipes[0]['tags'] == [{'id': soup.tags.get().id, 'name': 'Warm'}]
+        assert recipes[0]['image'] == f'images/{soup.id}.jpg'
+        assert recipes[1]['image'] is None
+        assert archive.read(f'images/{soup.id}.jpg') == image
+
+    def test_accept_zip_is_negotiated(self, api_client, export_user):
+        create_recipe(export_user, 'Soup')
+
+        res, archive = download(api_client, HTTP_ACCEPT='application/zip')
+
+        assert res['Content-Type'] == 'application/zip'
+        assert [r['title'] for r in json.loads(archive.read('recipes.json'))] == ['Soup']
+
+    def test_errors_for_zip_clients_keep_their_status(self, export_user):
+        res = APIClient().get(EXPORT_URL, HTTP_ACCEPT='application/zip')
+
+        assert res.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_jpegs_are_stored_not_recompressed(self, api_client, export_user):
+        soup = create_recipe(export_user, 'Soup', image=jpeg_bytes())
+
+        _, archive = download(api_client)
+
+        assert archive.getinfo(f'images/{soup.id}.jpg').compress_type == zipfile.ZIP_STORED
+        assert archive.getinfo('recipes.json').compress_type == zipfile.ZIP_DEFLATED
+
+    def test_only_own_recipes(self, api_client, export_user):
+        other = get_user_model().objects.create_user(email='other@example.com', password='passme123')
+        create_recipe(other, 'Secret', image=jpeg_bytes())
+        create_recipe(export_user, 'Mine')
+
+        _, archive = download(api_client)
+
+        assert archive.namelist() == ['recipes.json']
+        assert [r['title'] for r in json.loads(archive.read('recipes.json'))] == ['Mine']
+
+    def test_missing_image_file_is_skipped(self, api_client, export_user):
+        recipe = create_recipe(export_user, 'Soup', image=jpeg_bytes())
+        recipe.image.storage.delete(recipe.image.name)
+
+        _, archive = download(api_client)
+
+        assert archive.namelist() == ['recipes.json']
+
+    def test_streams_in_batches(self, api_client, export_user):
+        for i in range(5):
+            create_recipe(export_user, f'Recipe {i}')
+
+        with patch('recipe.export.BATCH_SIZE', 2), CaptureQueriesContext(connection) as queries:
+            res = api_client.get(EXPORT_URL)
+            content = b''.join(res.streaming_content)
+
+        batches = [q for q in queries.captured_queries if 'LIMIT 2' in q['sql']]
+        assert len(batches) == 4
+        archive = zipfile.ZipFile(io.BytesIO(content))
+        assert len(json.loads(archive.read('recipes.json'))) == 5
@@ -11,6 +11,7 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core import popularity
 from core.models import Recipe, Tag, Ingredient
 
 from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
@@ -373,6 +374,20 @@ class TestPrivateRecipeAPI:
         assert s2.data in res.json()
         assert s3.data not in res.json()
 
+    def test_list_recipes_does_not_query_per_row(self, api_client, recipe_user, settings):
+        settings.NPLUSONE_THRESHOLD = 2
+        tag = Tag.objects.create(user=recipe_user, name='Dinner')
+        ingredient = Ingredient.objects.create(user=recipe_user, name='Rice')
+        for i in range(5):
+            recipe = create_recipe(user=recipe_user, title=f'Recipe {i}')
+            recipe.tags.add(tag)
+            recipe.ingredients.add(ingredient)
+
+        res = api_client.get(RECIPES_URL)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert len(res.data) == 5
+        assert res.data[0]['tags'][0]['name'] == 'Dinner'
 
 
 class TestImageUpload:
@@ -400,6 +415,244 @@ class TestImageUpload:
         assert res.status_code == status.HTTP_400_BAD_REQUEST
 
 
+class TestCookableWith:
+
+    @pytest.fixture
+    def pantry(self, recipe_user):
+        names = ('Rice', 'Egg', 'Onion', 'Saffron')
+        return {name: Ingredient.objects.create(user=recipe_user, name=name) for name in names}
+
+    def recipe_with(self, user, title, *ingredients):
+        recipe = create_recipe(user=user, title=title)
+        recipe.ingredients.add(*ingredients)
+        return recipe
+
+    def test_only_fully_covered_recipes(self, api_client, recipe_user, pantry):
+        fried_rice = self.recipe_with(recipe_user, 'Fried rice', pantry['Rice'], pantry['Egg'])
+        self.recipe_with(recipe_user, 'Paella', pantry['Rice'], pantry['Saffron'])
+        self.recipe_with(recipe_user, 'Onion soup', pantry['Onion'])
+
+        params = {'cookable_with': f"{pantry['Rice'].id},{pantry['Egg'].id}"}
+        res = api_client.get(RECIPES_URL, params)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [r['id'] for r in res.data] == [fried_rice.id]
+
+    def test_max_missing_allows_other_ingredients(self, api_client, recipe_user, pantry):
+        fried_rice = self.recipe_with(recipe_user, 'Fried rice', pantry['Rice'], pantry['Egg'])
+        paella = self.recipe_with(recipe_user, 'Paella', pantry['Rice'], pantry['Saffron'], pantry['Onion'])
+        omelette = self.recipe_with(recipe_user, 'Omelette', pantry['Egg'], pantry['Onion'])
+
+        params = {'cookable_with': f"{pantry['Rice'].id},{pantry['Egg'].id}", 'max_missing': 1}
+        res = api_client.get(RECIPES_URL, params)
+
+        assert sorted(r['id'] for r in res.data) == sorted([fried_rice.id, omelette.id])
+        assert paella.id not in [r['id'] for r in res.data]
+
+    def test_combines_with_tag_filter(self, api_client, recipe_user, pantry):
+        tag = Tag.objects.create(user=recipe_user, name='Breakfast')
+        tagged = self.recipe_with(recipe_user, 'Eggs', pantry['Egg'])
+        tagged.tags.add(tag)
+        self.recipe_with(recipe_user, 'More eggs', pantry['Egg'])
+
+        params = {'cookable_with': str(pantry['Egg'].id), 'tags': str(tag.id)}
+        res = api_client.get(RECIPES_URL, params)
+
+        assert [r['id'] for r in res.data] == [tagged.id]
+
+    def test_follows_ingredient_changes(self, api_client, recipe_user, pantry):
+        paella = self.recipe_with(recipe_user, 'Paella', pantry['Rice'], pantry['Saffron'], pantry['Onion'])
+        params = {'cookable_with': str(pantry['Rice'].id)}
+        assert api_client.get(RECIPES_URL, params).data == []
+
+        paella.ingredients.remove(pantry['Onion'])
+        pantry['Saffron'].delete()
+        paella.refresh_from_db()
+
+        assert paella.ingredient_count == 1
+        assert [r['id'] for r in api_client.get(RECIPES_URL, params).data] == [paella.id]
+
+    @pytest.mark.parametrize('params', [
+        {'cookable_with': '1,abc'},
+        {'cookable_with': '1', 'max_missing': '-1'},
+        {'cookable_with': '1', 'max_missing': 'many'},
+        {'tags': 'x'},
+    ])
+    def test_invalid_params_rejected(self, api_client, params):
+        res = api_client.get(RECIPES_URL, params)
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestRangeAndOrdering:
+    @pytest.fixture
+    def menu(self, recipe_user):
+        return {
+            'soup': create_recipe(recipe_user, title='Soup', time_minutes=20, price=Decimal('4.50')),
+            'stew': create_recipe(recipe_user, title='Stew', time_minutes=90, price=Decimal('9.00')),
+            'salad': create_recipe(recipe_user, title='Salad', time_minutes=10, price=Decimal('12.00')),
+            'pasta': create_recipe(recipe_user, title='Pasta', time_minutes=20, price=Decimal('7.25')),
+        }
+
+    def titles(self, res):
+        return [recipe['title'] for recipe in res.data]
 
+    def test_range_filters(self, api_client, menu):
+        res = api_client.get(RECIPES_URL, {'max_time_minutes': 30, 'max_price': '10'})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert sorted(self.titles(res)) == ['Pasta', 'Soup']
 
+    def test_range_bounds_are_inclusive(self, api_client, menu):
+        res = api_client.get(RECIPES_URL, {'min_time_minutes': 20, 'max_time_minutes': 20, 'min_price': '7.25'})
 
+        assert self.titles(res) == ['Pasta']
+
+    @pytest.mark.parametrize('ordering, expected', [
+        ('price', ['Soup', 'Pasta', 'Stew', 'Salad']),
+        ('-price', ['Salad', 'Stew', 'Pasta', 'Soup']),
+        ('title', ['Pasta', 'Salad', 'Soup', 'Stew']),
+        ('time_minutes', ['Salad', 'Soup', 'Pasta', 'Stew']),
+        ('-time_minutes', ['Stew', 'Pasta', 'Soup', 'Salad']),
+        ('id', ['Soup', 'Stew', 'Salad', 'Pasta']),
+    ])
+    def test_ordering(self, api_client, menu, ordering, expected):
+        res = api_client.get(RECIPES_URL, {'ordering': ordering})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert self.titles(res) == expected
+
+    def test_popular_ordering(self, api_client, menu):
+        for name in ('stew', 'stew', 'salad', 'stew'):
+            api_client.get(detail_url(menu[name].id))
+        popularity.counter.flush()
+
+        popular = api_client.get(RECIPES_URL, {'ordering': 'popular'})
+        least = api_client.get(RECIPES_URL, {'ordering': '-popular'})
+
+        assert self.titles(popular) == ['Stew', 'Salad', 'Pasta', 'Soup']
+        assert self.titles(least) == ['Soup', 'Pasta', 'Salad', 'Stew']
+
+    def test_default_ordering_is_newest_first(self, api_client, menu):
+        res = api_client.get(RECIPES_URL)
+
+        assert self.titles(res) == ['Pasta', 'Salad', 'Stew', 'Soup']
+
+    @pytest.mark.parametrize('params', [
+        {'ordering': 'description'},
+        {'ordering': '--price'},
+        {'min_time_minutes': 'soon'},
+        {'max_price': 'cheap'},
+        {'max_price': 'NaN'},
+        {'min_price': '-1'},
+        {'min_price': '10', 'max_price': '5'},
+    ])
+    def test_invalid_params_rejected(self, api_client, params):
+        res = api_client.get(RECIPES_URL, params)
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestPagination:
+
+    @pytest.fixture
+    def recipes(self, recipe_user):
+        return [create_recipe(recipe_user, title=f'Recipe {i}') for i in range(5)]
+
+    def test_unpaginated_by_default(self, api_client, recipes):
+        res = api_client.get(RECIPES_URL)
+
+        assert isinstance(res.data, list)
+        assert len(res.data) == 5
+
+    def test_page_carries_exact_count(self, api_client, recipes):
+        res = api_client.get(RECIPES_URL, {'page_size': 2, 'page': 2})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data['count'] == 5
+        assert res.data['count_exact'] is True
+        assert [r['title'] for r in res.data['results']] == ['Recipe 2', 'Recipe 1']
+        assert res.data['next'] and res.data['previous']
+
+    def test_large_result_sets_report_estimates(self, api_client, recipes, settings):
+        settings.COUNT_ESTIMATE_THRESHOLD = 3
+
+        res = api_client.get(RECIPES_URL, {'page': 1, 'max_time_minutes': 100})
+
+        assert res.data['count_exact'] is False
+        assert res.data['count'] >= 4
+        assert len(res.data['results']) == 5
+
+    def test_tag_list_paginates(self, api_client, recipe_user):
+        for name in ('Vegan', 'Dessert', 'Quick'):
+            Tag.objects.create(user=recipe_user, name=name)
+
+        res = api_client.get(reverse('recipe:tag-list'), {'page_size': 2})
+
+        assert res.data['count'] == 3
+        assert res.data['count_exact'] is True
+        assert len(res.data['results']) == 2
+
+    def test_estimated_pages_are_not_clipped(self, api_client, recipes, settings):
+        settings.COUNT_ESTIMATE_THRESHOLD = 1
+
+        first = api_client.get(RECIPES_URL, {'page_size': 3, 'max_time_minutes': 100})
+        second = api_client.get(first.data['next'])
+
+        assert len(first.data['results']) == 3
+        assert len(second.data['results']) == 2
+        assert second.data['next'] is None
+
+
+BATCH_URL = reverse('recipe:recipe-batch')
+
+
+class TestBatchRetrieve:
+
+    @pytest.fixture
+    def recipes(self, recipe_user):
+        tag = Tag.objects.create(user=recipe_user, name='Dinner')
+        recipes = [create_recipe(recipe_user, title=f'Recipe {i}') for i in range(4)]
+        for recipe in recipes:
+            recipe.tags.add(tag)
+        return recipes
+
+    def test_returns_details_in_request_order(self, api_client, recipes):
+        ids = [recipes[2].id, recipes[0].id, recipes[3].id]
+
+        res = api_client.get(BATCH_URL, {'ids': ','.join(map(str, ids))})
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [r['id'] for r in res.data['results']] == ids
+        assert res.data['results'][0] == RecipeDetailSerializer(recipes[2]).data
+        assert res.data['missing'] == []
+
+    def test_reports_missing_and_foreign_ids(self, api_client, recipes):
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='other123')
+        foreign = create_recipe(other_user)
+        unknown = recipes[-1].id + 1000
+
+        res = api_client.get(BATCH_URL, {'ids': f'{foreign.id},{recipes[1].id},{unknown}'})
+
+        assert [r['id'] for r in res.data['results']] == [recipes[1].id]
+        assert res.data['missing'] == [foreign.id, unknown]
+
+    def test_duplicate_ids_returned_once(self, api_client, recipes):
+        res = api_client.get(BATCH_URL, {'ids': f'{recipes[0].id},{recipes[0].id}'})
+
+        assert len(res.data['results']) == 1
+
+    def test_query_count_does_not_grow_with_ids(self, api_client, recipes, django_assert_max_num_queries):
+        ids = ','.join(str(recipe.id) for recipe in recipes)
+
+        with django_assert_max_num_queries(3):
+            res = api_client.get(BATCH_URL, {'ids': ids})
+
+        assert len(res.data['results']) == 4
+
+    @pytest.mark.parametrize('params', [{}, {'ids': ''}, {'ids': '1,x'}, {'ids': ','.join(map(str, range(101)))}])
+    def test_invalid_params_rejected(self, api_client, params):
+        res = api_client.get(BATCH_URL, params)
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
+        assert 'ids' in res.data
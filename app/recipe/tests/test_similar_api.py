@@ -0,0 +1,114 @@
+import pytest
+from decimal import Decimal
+
+import numpy as np
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Recipe, Tag, Ingredient
+from core.similarity import RecipeIndex, index_cache
+
+
+pytestmark = pytest.mark.django_db
+
+
+def similar_url(recipe_id):
+    return reverse('recipe:recipe-similar', args=[recipe_id])
+
+
+def create_recipe(user, title, tags=(), ingredients=()):
+    recipe = Recipe.objects.create(user=user, title=title, time_minutes=10, price=Decimal('5.00'))
+    recipe.tags.add(*tags)
+    recipe.ingredients.add(*ingredients)
+    return recipe
+
+
+@pytest.fixture(autouse=True)
+def clear_indexes():
+    index_cache.clear()
+    yield
+    index_cache.clear()
+
+
+@pytest.fixture
+def similar_user():
+    return get_user_model().objects.create_user(email='similar@example.com', password='passme123')
+
+
+@pytest.fixture
+def api_client(similar_user):
+    client = APIClient()
+    client.force_authenticate(user=similar_user)
+    return client
+
+
+@pytest.fixture
+def pantry(similar_user):
+    names = ('Rice', 'Chicken', 'Garlic', 'Chilli')
+    return {name: Ingredient.objects.create(user=similar_user, name=name) for name in names}
+
+
+class TestRecipeIndex:
+
+    def test_weighted_jaccard_scores(self):
+        # Recipe 1 has features {a, b}, 2 has {a, b, c}, 3 has {c}.
+        pairs = np.array([[1, 10], [1, 20], [2, 10], [2, 20], [2, 30], [3, 30]])
+        index = RecipeIndex(np.array([1, 2, 3]), pairs)
+
+        results = index.similar(1)
+
+        assert [recipe_id for recipe_id, _ in results] == [2]
+        idf = np.log1p(3 / np.array([2, 2, 2]))
+        assert results[0][1] == round(float(idf[:2].sum() / idf.sum()), 4)
+
+    def test_unknown_recipe_has_no_neighbours(self):
+        index = RecipeIndex(np.array([1]), np.zeros((0, 2), dtype=np.int64))
+        assert index.similar(99) == []
+        assert index.similar(1) == []
+
+
+class TestSimilarRecipesAPI:
+
+    def test_similar_recipes_ranked_by_overlap(self, api_client, similar_user, pantry):
+        base = create_recipe(similar_user, 'Chicken rice', ingredients=[pantry['Rice'], pantry['Chicken'], pantry['Garlic']])
+        close = create_recipe(similar_user, 'Garlic chicken rice', ingredients=[pantry['Rice'], pantry['Chicken'], pantry['Garlic']])
+        partial = create_recipe(similar_user, 'Fried rice', ingredients=[pantry['Rice'], pantry['Chilli']])
+        create_recipe(similar_user, 'Plain water')
+
+        res = api_client.get(similar_url(base.id))
+
+        assert res.status_code == status.HTTP_200_OK
+        assert [r['id'] for r in res.data] == [close.id, partial.id]
+        assert res.data[0]['similarity'] == 1.0
+        assert 0 < res.data[1]['similarity'] < 1
+
+    def test_limit(self, api_client, similar_user, pantry):
+        base = create_recipe(similar_user, 'Base', ingredients=[pantry['Rice']])
+        for i in range(5):
+            create_recipe(similar_user, f'Rice {i}', ingredients=[pantry['Rice']])
+
+        res = api_client.get(similar_url(base.id), {'limit': 2})
+
+        assert len(res.data) == 2
+
+    def test_index_invalidated_when_tags_change(self, api_client, similar_user):
+        tag = Tag.objects.create(user=similar_user, name='Dinner')
+        base = create_recipe(similar_user, 'Base', tags=[tag])
+        other = create_recipe(similar_user, 'Other')
+        assert api_client.get(similar_url(base.id)).data == []
+
+        other.tags.add(tag)
+
+        assert [r['id'] for r in api_client.get(similar_url(base.id)).data] == [other.id]
+
+    def test_other_users_recipe_not_found(self, api_client):
+        other_user = get_user_model().objects.create_user(email='other@example.com', password='passme123')
+        recipe = create_recipe(other_user, 'Secret')
+
+        res = api_client.get(similar_url(recipe.id))
+
+        assert res.status_code == status.HTTP_404_NOT_FOUND
@@ -0,0 +1,117 @@
+import pytest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import stats
+from core.models import Recipe, RecipeStats, Tag
+
+
+pytestmark = pytest.mark.django_db
+
+STATS_URL = reverse('recipe:stats')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@pytest.fixture
+def stats_user():
+    return get_user_model().objects.create_user(email='stats@example.com', password='passme123')
+
+
+@pytest.fixture
+def api_client(stats_user):
+    client = APIClient()
+    client.force_authenticate(user=stats_user)
+    return client
+
+
+def create_via_api(client, **kwargs):
+    payload = {'title': 'Soup', 'time_minutes': 10, 'price': Decimal('4.00')}
+    payload.update(kwargs)
+    res = client.post(RECIPES_URL, payload, format='json')
+    assert res.status_code == status.HTTP_201_CREATED
+    return res.data['id']
+
+
+def assert_matches_recompute(user):
+    stored = RecipeStats.objects.get(user=user)
+    fresh = stats.compute(user)
+    for field in ('recipe_count', 'time_minutes_sum', 'price_sum', 'price_histogram', 'tag_counts', 'ingredient_counts'):
+        assert getattr(stored, field) == getattr(fresh, field), field
+
+
+class TestPublicStatsAPI:
+
+    def test_auth_required(self):
+        res = APIClient().get(STATS_URL)
+        assert res.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+class TestPrivateStatsAPI:
+
+    def test_stats_for_new_user(self, api_client):
+        res = api_client.get(STATS_URL)
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data['recipe_count'] == 0
+        assert res.data['average_price'] is None
+        assert [bucket['count'] for bucket in res.data['price_distribution']] == [0] * 5
+
+    def test_stats_follow_create_update_delete(self, api_client, stats_user):
+        soup = create_via_api(api_client, tags=[{'name': 'Dinner'}], ingredients=[{'name': 'Salt'}])
+        create_via_api(api_client, time_minutes=30, price=Decimal('12.00'), tags=[{'name': 'Dinner'}, {'name': 'Fancy'}])
+        assert_matches_recompute(stats_user)
+
+        api_client.patch(detail_url(soup), {'price': '60.00', 'tags': [{'name': 'Lunch'}]}, format='json')
+        assert_matches_recompute(stats_user)
+
+        api_client.delete(detail_url(soup))
+        assert_matches_recompute(stats_user)
+
+        res = api_client.get(STATS_URL)
+        assert res.data['recipe_count'] == 1
+        assert res.data['average_time_minutes'] == 30
+        assert res.data['average_price'] == '12.00'
+        assert [tag['name'] for tag in res.data['top_tags']] == ['Dinner', 'Fancy']
+
+    def test_top_tags_ranked_by_usage(self, api_client):
+        create_via_api(api_client, tags=[{'name': 'Quick'}, {'name': 'Vegan'}])
+        create_via_api(api_client, tags=[{'name': 'Vegan'}])
+
+        res = api_client.get(STATS_URL)
+
+        assert res.data['top_tags'][0] == {'id': Tag.objects.get(name='Vegan').id, 'name': 'Vegan', 'count': 2}
+        assert res.data['top_tags'][1]['count'] == 1
+
+    def test_deleting_tag_removes_it_from_stats(self, api_client, stats_user):
+        create_via_api(api_client, tags=[{'name': 'Quick'}])
+        tag = Tag.objects.get(name='Quick')
+
+        api_client.delete(reverse('recipe:tag-detail', args=[tag.id]))
+
+        assert api_client.get(STATS_URL).data['top_tags'] == []
+        assert_matches_recompute(stats_user)
+
+    def test_existing_recipes_counted_on_first_write(self, api_client, stats_user):
+        Recipe.objects.create(user=stats_user, title='Old', time_minutes=5, price=Decimal('2.00'))
+
+        create_via_api(api_client)
+
+        assert RecipeStats.objects.get(user=stats_user).recipe_count == 2
+        assert_matches_recompute(stats_user)
+
+    def test_stats_read_does_not_scan_recipes(self, api_client, stats_user, django_assert_max_num_queries):
+        for _ in range(3):
+            create_via_api(api_client, tags=[{'name': 'Dinner'}])
+
+        with django_assert_max_num_queries(4):
+            res = api_client.get(STATS_URL)
+        assert res.data['recipe_count'] == 3
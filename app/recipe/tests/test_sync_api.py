@@ -0,0 +1,163 @@
+import time
+
+import pytest
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core import routers
+from core.models import Ingredient, Recipe, Tag
+
+
+# Each request must commit on its own for change tokens to separate them.
+pytestmark = pytest.mark.django_db(transaction=True)
+
+SYNC_URL = reverse('recipe:sync')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+@pytest.fixture
+def sync_user():
+    return get_user_model().objects.create_user(email='sync@example.com', password='passme123')
+
+
+@pytest.fixture
+def api_client(sync_user):
+    client = APIClient()
+    client.force_authenticate(user=sync_user)
+    return client
+
+
+@pytest.fixture
+def kitchen(sync_user):
+    tag = Tag.objects.create(user=sync_user, name='Dinner')
+    salt = Ingredient.objects.create(user=sync_user, name='Salt')
+    soup = Recipe.objects.create(user=sync_user, title='Soup', time_minutes=10, price=Decimal('4.00'))
+    stew = Recipe.objects.create(user=sync_user, title='Stew', time_minutes=60, price=Decimal('9.00'))
+    soup.tags.add(tag)
+    soup.ingredients.add(salt)
+    return {'tag': tag, 'salt': salt, 'soup': soup, 'stew': stew}
+
+
+def sync(client, since=None):
+    res = client.get(SYNC_URL, {'since': since} if since else {})
+    assert res.status_code == status.HTTP_200_OK
+    return res.data
+
+
+def ids(rows):
+    return [row['id'] for row in rows]
+
+
+class TestSync:
+
+    def test_first_sync_is_full(self, api_client, kitchen):
+        data = sync(api_client)
+
+        assert data['full'] is True
+        assert data['token']
+        assert ids(data['recipes']) == [kitchen['soup'].id, kitchen['stew'].id]
+        assert data['recipes'][0]['tags'] == [kitchen['tag'].id]
+        assert ids(data['tags']) == [kitchen['tag'].id]
+        assert ids(data['ingredients']) == [kitchen['salt'].id]
+
+    def test_nothing_changed(self, api_client, kitchen):
+        token = sync(api_client)['token']
+
+        data = sync(api_client, token)
+
+        assert data['full'] is False
+        assert data['recipes'] == data['tags'] == data['ingredients'] == []
+        assert data['deleted'] == {'recipes': [], 'tags': [], 'ingredients': []}
+
+    def test_returns_only_updated_rows(self, api_client, kitchen):
+        token = sync(api_client)['token']
+        api_client.patch(detail_url(kitchen['stew'].id), {'title': 'Beef stew'})
+
+        data = sync(api_client, token)
+
+        assert [r['title'] for r in data['recipes']] == ['Beef stew']
+        assert data['tags'] == []
+
+    def test_link_changes_mark_recipe_changed(self, api_client, kitchen):
+        token = sync(api_client)['token']
+        api_client.patch(detail_url(kitchen['stew'].id), {'tags': [{'name': 'Winter'}]}, format='json')
+
+        data = sync(api_client, token)
+
+        assert ids(data['recipes']) == [kitchen['stew'].id]
+        assert [t['name'] for t in data['tags']] == ['Winter']
+        assert data['recipes'][0]['tags'] == ids(data['tags'])
+
+    def test_bulk_updates_are_tracked(self, api_client, kitchen, sync_user):
+        token = sync(api_client)['token']
+        Recipe.objects.filter(user=sync_user).update(price=Decimal('5.00'))
+
+        assert ids(sync(api_client, token)['recipes']) == [kitchen['soup'].id, kitchen['stew'].id]
+
+    def test_deletions_leave_tombstones(self, api_client, kitchen):
+        token = sync(api_client)['token']
+        api_client.delete(detail_url(kitchen['stew'].id))
+        api_client.delete(reverse('recipe:tag-detail', args=[kitchen['tag'].id]))
+
+        data = sync(api_client, token)
+
+        assert data['deleted'] == {'recipes': [kitchen['stew'].id], 'tags': [kitchen['tag'].id], 'ingredients': []}
+        # Soup lost its tag, so it changed too.
+        assert ids(data['recipes']) == [kitchen['soup'].id]
+        assert data['recipes'][0]['tags'] == []
+
+    def test_token_advances(self, api_client, kitchen):
+        first = sync(api_client)['token']
+        api_client.patch(detail_url(kitchen['soup'].id), {'title': 'Pea soup'})
+        second = sync(api_client, first)['token']
+
+        assert sync(api_client, second)['recipes'] == []
+
+    def test_other_users_changes_are_excluded(self, api_client, kitchen):
+        token = sync(api_client)['token']
+        other = get_user_model().objects.create_user(email='other@example.com', password='passme123')
+        Recipe.objects.create(user=other, title='Other', time_minutes=5, price=Decimal('1.00')).delete()
+
+        data = sync(api_client, token)
+
+        assert data['recipes'] == []
+        assert data['deleted']['recipes'] == []
+
+    def test_expired_token_gets_full_sync(self, api_client, kitchen, settings):
+        expired = f'1.{int(time.time()) - (settings.SYNC_TOMBSTONE_RETENTION_DAYS + 1) * 86400}'
+
+        data = sync(api_client, expired)
+
+        assert data['full'] is True
+        assert len(data['recipes']) == 2
+
+    def test_reads_stay_on_primary_when_replicas_are_enabled(self, api_client, kitchen, settings, monkeypatch):
+        settings.DATABASE_REPLICAS = ['replica_1']
+        monkeypatch.setattr(routers.health, 'lag', lambda alias: 0)
+        aliases = []
+        db_for_read = routers.ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            aliases.append(db_for_read(router, model, **hints))
+            return 'default'
+
+        monkeypatch.setattr(routers.ReplicaRouter, 'db_for_read', record)
+
+        data = sync(api_client)
+
+        assert len(data['recipes']) == 2
+        assert aliases and set(aliases) == {'default'}
+
+    @pytest.mark.parametrize('token', ['abc', '1', '1.2.3', '-5.100'])
+    def test_invalid_token(self, api_client, token):
+        res = api_client.get(SYNC_URL, {'since': token})
+
+        assert res.status_code == status.HTTP_400_BAD_REQUEST
@@ -117,5 +117,31 @@ class TestPrivateTagAPI:
         assert len(res.data) == 1
 
 
+class TestMergeTags:
 
+    def test_merge_tags(self, api_client, tag_user):
+        keep = Tag.objects.create(user=tag_user, name='Dessert')
+        dup = Tag.objects.create(user=tag_user, name='dessert')
+        other = Tag.objects.create(
+            user=get_user_model().objects.create_user(email='other@example.com', password='passme123'), name='Dessert',
+        )
+        recipe = Recipe.objects.create(user=tag_user, title='Pie', time_minutes=30, price=Decimal('4.00'))
+        recipe.tags.add(dup)
 
+        res = api_client.post(reverse('recipe:tag-merge', args=[keep.id]), {'ids': [dup.id, other.id]}, format='json')
+
+        assert res.status_code == status.HTTP_200_OK
+        assert res.data == {'merged': [dup.id], 'missing': [other.id]}
+        assert list(recipe.tags.all()) == [keep]
+        assert Tag.objects.filter(id=other.id).exists()
+
+    def test_merge_into_other_users_tag_not_found(self, api_client, tag_user):
+        other = Tag.objects.create(
+            user=get_user_model().objects.create_user(email='other@example.com', password='passme123'), name='Dessert',
+        )
+        mine = Tag.objects.create(user=tag_user, name='Dessert')
+
+        res = api_client.post(reverse('recipe:tag-merge', args=[other.id]), {'ids': [mine.id]}, format='json')
+
+        assert res.status_code == status.HTTP_404_NOT_FOUND
+        assert Tag.objects.filter(id=mine.id).exists()
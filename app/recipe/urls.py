@@ -13,5 +13,7 @@ router.register('ingredients', views.IngredientViewSet)
 app_name = 'recipe'
 
 urlpatterns = [
+    path('stats/', views.RecipeStatsView.as_view(), name='stats'),
+    path('sync/', views.RecipeSyncView.as_view(), name='sync'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,12 +1,21 @@
+from decimal import Decimal, InvalidOperation
+
+from django.http import StreamingHttpResponse
 from drf_spectacular.utils import extend_schema_view, extend_schema, OpenApiParameter, OpenApiTypes
-from rest_framework import viewsets, mixins, status
+from rest_framework import generics, viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
 
+from core import merge, popularity, stats, sync
+from core.authentication import TokenAuthentication
+from core.pagination import EstimatedCountPagination
+from core.renderers import ZipRenderer
 from core.models import Recipe, Tag, Ingredient
-from recipe import serializers
+from core.routers import use_replicas
+from recipe import bulk, export, filters, serializers
 
 
 @extend_schema_view(
@@ -21,7 +30,28 @@ from recipe import serializers
                 'ingredients',
                 OpenApiTypes.STR,
                 description='Comma separated list of ingredient IDs to filter'
-            )
+            ),
+            OpenApiParameter(
+                'cookable_with',
+                OpenApiTypes.STR,
+                description='Comma separated list of ingredient IDs at hand; only recipes '
+                            'made from these (see max_missing) are returned',
+            ),
+            OpenApiParameter(
+                'max_missing',
+                OpenApiTypes.INT,
+                description='With cookable_with, allow up to this many other ingredients (default 0)',
+            ),
+            OpenApiParameter('min_time_minutes', OpenApiTypes.INT, description='Minimum preparation time'),
+            OpenApiParameter('max_time_minutes', OpenApiTypes.INT, description='Maximum preparation time'),
+            OpenApiParameter('min_price', OpenApiTypes.DECIMAL, description='Minimum price'),
+            OpenApiParameter('max_price', OpenApiTypes.DECIMAL, description='Maximum price'),
+            OpenApiParameter(
+                'ordering',
+                OpenApiTypes.STR,
+                enum=[f'{prefix}{name}' for name in filters.ORDERINGS for prefix in ('', '-')],
+                description=f'Sort order, ties broken by id (default {filters.DEFAULT_ORDERING})',
+            ),
         ]
     )
 )
@@ -30,35 +60,207 @@ class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = EstimatedCountPagination
+    throttle_scope = None
+    max_batch_ids = 100
+
+    def _params_to_ints(self, qs, param=None):
+        try:
+            return [int(str_id) for str_id in qs.split(',')]
+        except ValueError:
+            raise ValidationError({param: 'Must be a comma separated list of integer IDs.'})
+
+    def _param_to_int(self, param, default, min_value=0):
+        value = self.request.query_params.get(param)
+        if value is None:
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            raise ValidationError({param: 'Must be an integer.'})
+        if value < min_value:
+            raise ValidationError({param: f'Must be at least {min_value}.'})
+        return value
 
-    def _params_to_ints(self, qs):
-        return [str(str_id) for str_id in qs.split(',')]
+    def _param_to_decimal(self, param):
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        try:
+            value = Decimal(value)
+        except InvalidOperation:
+            raise ValidationError({param: 'Must be a number.'})
+        if not value.is_finite() or value < 0:
+            raise ValidationError({param: 'Must be a non-negative number.'})
+        return value
+
+    def _filter_range(self, queryset, field, low, high):
+        if low is not None and high is not None and low > high:
+            raise ValidationError({f'min_{field}': f'Must not exceed max_{field}.'})
+        if low is not None:
+            queryset = queryset.filter(**{f'{field}__gte': low})
+        if high is not None:
+            queryset = queryset.filter(**{f'{field}__lte': high})
+        return queryset
+
+    def _ordering(self):
+        ordering = filters.DEFAULT_ORDERING
+        if self.action == 'list':
+            ordering = self.request.query_params.get('ordering') or ordering
+        fields = filters.ordering_fields(ordering)
+        if fields is None:
+            raise ValidationError({'ordering': f'Unknown ordering "{ordering}".'})
+        return fields
 
     def get_queryset(self):
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
+        cookable = self.request.query_params.get('cookable_with')
         queryset = self.queryset
 
         if tags:
-            tag_ids = self._params_to_ints(tags)
+            tag_ids = self._params_to_ints(tags, 'tags')
             queryset = queryset.filter(tags__id__in=tag_ids)
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
+            ingredient_ids = self._params_to_ints(ingredients, 'ingredients')
             queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+        if cookable:
+            queryset = filters.cookable_with(
+                queryset,
+                self._params_to_ints(cookable, 'cookable_with'),
+                self._param_to_int('max_missing', 0),
+            )
+        if self.action == 'list':
+            queryset = self._filter_range(
+                queryset,
+                'time_minutes',
+                self._param_to_int('min_time_minutes', None),
+                self._param_to_int('max_time_minutes', None),
+            )
+            queryset = self._filter_range(
+                queryset, 'price', self._param_to_decimal('min_price'), self._param_to_decimal('max_price'),
+            )
 
-        return queryset.filter(user=self.request.user).order_by('-id').distinct()
+        return queryset.filter(
+            user=self.request.user
+        ).order_by(*self._ordering()).distinct().prefetch_related('tags', 'ingredients')
 
     def get_serializer_class(self):
         if self.action == 'list':
             return serializers.RecipeSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'similar':
+            return serializers.SimilarRecipeSerializer
+        elif self.action == 'batch':
+            return serializers.RecipeBatchSerializer
+        elif self.action == 'bulk_update':
+            return serializers.RecipeBulkUpdateSerializer
+        elif self.action == 'bulk_delete':
+            return serializers.RecipeBulkDeleteSerializer
         return self.serializer_class
 
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        popularity.counter.record(response.data['id'])
+        return response
+
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-    @action(methods=['POST'], detail=True, url_path='upload-image')
+    def perform_destroy(self, instance):
+        with stats.tracking(instance.user_id) as recipe_stats:
+            stats.apply(recipe_stats, stats.snapshot(instance), -1)
+            instance.delete()
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter('limit', OpenApiTypes.INT, description='Number of recipes to return (max 50)'),
+        ],
+        responses=serializers.SimilarRecipeSerializer(many=True),
+    )
+    @action(methods=['GET'], detail=True)
+    def similar(self, request, pk=None):
+        # Imported on first use to keep NumPy out of worker boot.
+        from core.similarity import similar_recipes
+
+        recipe = self.get_object()
+        limit = min(self._param_to_int('limit', 10, min_value=1), 50)
+
+        scores = dict(similar_recipes(request.user.id, recipe.id, limit))
+        recipes = Recipe.objects.filter(id__in=scores).prefetch_related('tags', 'ingredients')
+        recipes = sorted(recipes, key=lambda r: (-scores[r.id], r.id))
+        for similar in recipes:
+            similar.similarity = scores[similar.id]
+        serializer = self.get_serializer(recipes, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(parameters=[
+        OpenApiParameter(
+            'ids',
+            OpenApiTypes.STR,
+            required=True,
+            description='Comma separated list of recipe IDs to retrieve (at most 100)',
+        ),
+    ])
+    @action(methods=['GET'], detail=False)
+    def batch(self, request):
+        """Retrieve several recipes in the order given; unknown or foreign IDs are listed as missing."""
+        ids = request.query_params.get('ids')
+        if not ids:
+            raise ValidationError({'ids': 'This parameter is required.'})
+        ids = list(dict.fromkeys(self._params_to_ints(ids, 'ids')))
+        if len(ids) > self.max_batch_ids:
+            raise ValidationError({'ids': f'At most {self.max_batch_ids} IDs are allowed.'})
+
+        found = {recipe.id: recipe for recipe in self.get_queryset().filter(id__in=ids)}
+        serializer = self.get_serializer({
+            'results': [found[pk] for pk in ids if pk in found],
+            'missing': [pk for pk in ids if pk not in found],
+        })
+        return Response(serializer.data)
+
+    def _bulk_response(self, requested, changed):
+        changed = set(changed)
+        result = serializers.RecipeBulkResultSerializer({
+            'ids': sorted(changed),
+            'missing': [pk for pk in dict.fromkeys(requested) if pk not in changed],
+        })
+        return Response(result.data)
+
+    @extend_schema(responses=serializers.RecipeBulkResultSerializer)
+    @action(methods=['PATCH'], detail=False, url_path='bulk')
+    def bulk_update(self, request):
+        """Apply the same changes to many recipes in one transaction."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        changes = dict(serializer.validated_data)
+        ids = changes.pop('ids')
+        add = {relation: changes.pop(f'add_{relation}', []) for relation in bulk.LINKS}
+        remove = {relation: changes.pop(f'remove_{relation}', []) for relation in bulk.LINKS}
+        return self._bulk_response(ids, bulk.update(request.user, ids, changes, add, remove))
+
+    @extend_schema(responses=serializers.RecipeBulkResultSerializer)
+    @bulk_update.mapping.delete
+    def bulk_delete(self, request):
+        """Delete many recipes in one transaction."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        return self._bulk_response(ids, bulk.delete(request.user, ids))
+
+    @extend_schema(responses={(200, 'application/zip'): OpenApiTypes.BINARY})
+    @action(
+        methods=['GET'], detail=False, throttle_scope='export',
+        renderer_classes=[*api_settings.DEFAULT_RENDERER_CLASSES, ZipRenderer],
+    )
+    def export(self, request):
+        """Download all recipes as recipes.json plus their images in one ZIP archive."""
+        response = StreamingHttpResponse(export.stream_archive(request.user), content_type='application/zip')
+        response['Content-Disposition'] = 'attachment; filename="recipes.zip"'
+        return response
+
+    @action(methods=['POST'], detail=True, url_path='upload-image', throttle_scope='upload')
     def upload_image(self, request, pk=None):
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
@@ -83,6 +285,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
 class BaseRecipeAttrViewSet(mixins.DestroyModelMixin, mixins.UpdateModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = EstimatedCountPagination
 
     def get_queryset(self):
         assigned_only = bool(
@@ -93,12 +296,67 @@ class BaseRecipeAttrViewSet(mixins.DestroyModelMixin, mixins.UpdateModelMixin, m
             queryset = queryset.filter(recipe__isnull=False)
         return queryset.filter(user=self.request.user).order_by('-name').distinct()
 
+    def get_serializer_class(self):
+        if self.action == 'merge':
+            return serializers.MergeSerializer
+        return self.serializer_class
+
+    def perform_destroy(self, instance):
+        with stats.tracking(instance.user_id) as recipe_stats:
+            stats.forget(recipe_stats, self.stats_field, instance.id)
+            instance.delete()
+
+    @extend_schema(responses=serializers.MergeResultSerializer)
+    @action(methods=['POST'], detail=True)
+    def merge(self, request, pk=None):
+        """Move the recipes of the given duplicates onto this one and delete the duplicates."""
+        survivor = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = [pk for pk in dict.fromkeys(serializer.validated_data['ids']) if pk != survivor.id]
+        merged = merge.merge(self.queryset.model, request.user, survivor.id, ids)
+        result = serializers.MergeResultSerializer({
+            'merged': merged,
+            'missing': [pk for pk in ids if pk not in set(merged)],
+        })
+        return Response(result.data)
+
 
 class TagViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.TagSerializer
     queryset = Tag.objects.all()
+    stats_field = 'tag_counts'
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     serializer_class = serializers.IngredientSerializer
-    queryset = Ingredient.objects.all()
\ No newline at end of file
+    queryset = Ingredient.objects.all()
+    stats_field = 'ingredient_counts'
+
+
+class RecipeStatsView(generics.RetrieveAPIView):
+    serializer_class = serializers.RecipeStatsSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_object(self):
+        return stats.get_stats(self.request.user)
+
+
+class RecipeSyncView(generics.GenericAPIView):
+    serializer_class = serializers.SyncSerializer
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(parameters=[
+        OpenApiParameter('since', OpenApiTypes.STR, description='Token returned by the previous sync'),
+    ])
+    def get(self, request):
+        # The token is taken on the primary; a lagging replica could miss
+        # rows committed before it, which no later sync would send.
+        with use_replicas(False):
+            try:
+                changes = sync.changes(request.user, request.query_params.get('since'))
+            except sync.InvalidToken:
+                raise ValidationError({'since': 'Invalid sync token.'})
+            return Response(self.get_serializer(changes).data)
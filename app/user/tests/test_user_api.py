@@ -5,6 +5,8 @@ from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.models import UserDeletion
+
 
 pytestmark = pytest.mark.django_db
 
@@ -114,3 +116,11 @@ class TestPrivateUserAPI:
         assert registered_user.name == payload['name']
         assert registered_user.check_password(payload['password']) == True
         assert res.status_code == status.HTTP_200_OK
+
+    def test_delete_account_is_deferred(self, registered_user, api_client):
+        res = api_client.delete(ME_URL)
+
+        registered_user.refresh_from_db()
+        assert res.status_code == status.HTTP_202_ACCEPTED
+        assert registered_user.is_active is False
+        assert UserDeletion.objects.filter(user_id=registered_user.id, stage='recipes').exists()
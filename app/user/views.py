@@ -1,7 +1,10 @@
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core import deletion
+from core.authentication import TokenAuthentication
 from user.serializers import (
     UserSerializer,
     AuthTokenSerializer,
@@ -14,12 +17,19 @@ class CreateUserView(generics.CreateAPIView):
 class CreateTokenView(ObtainAuthToken):
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+    throttle_scope = 'token'
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [TokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
\ No newline at end of file
+        return self.request.user
+
+    def destroy(self, request, *args, **kwargs):
+        # The account is deactivated now; its data is deleted in the background.
+        deletion.schedule(self.get_object())
+        return Response(status=status.HTTP_202_ACCEPTED)